@@ -32,15 +32,27 @@ as it is built at the point of writing this script needs the program to be able
 to print directly to a file
 """
 
-parser = argparse.ArgumentParser(description=program_description)
-parser.add_argument('-i', '--input', help='The input argument', required=True)
-parser.add_argument('-o', '--output', help='The output argument', required=True)
-parser.add_argument('--fasttree_path', help='The path for FastTree executable', required=True)
-args = parser.parse_args()
 
-out_fh = open(args.output, 'w')
+def main():
 
-process = subprocess.Popen([args.fasttree_path, '-nt', args.input], stdout=out_fh)
-process.wait()
+    args = parse_arguments()
 
-out_fh.close()
+    with open(args.output, 'w') as out_fh:
+        process = subprocess.Popen([args.fasttree_path, '-nt', args.input], stdout=out_fh)
+        process.wait()
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input', help='The input argument', required=True)
+    parser.add_argument('-o', '--output', help='The output argument', required=True)
+    parser.add_argument('--fasttree_path', help='The path for FastTree executable', required=True)
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    main()
@@ -57,7 +57,7 @@ def main():
     add_legend(style, filtered_taxa_color_dict)
 
     # tree.render(args.output + '.png', w=500, units='mm', tree_style=style)
-    tree.render(args.output + '.svg', tree_style=style)
+    tree.render(get_output_fp(args.output, '.svg'), tree_style=style)
 
 
 def parse_arguments():
@@ -66,7 +66,7 @@ def parse_arguments():
 
     parser = argparse.ArgumentParser()
     parser.add_argument('-i', '--input', required=True)
-    parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('-o', '--output', required=True, help='Rendered tree, .svg is added if not given')
     parser.add_argument('-l', '--labels', required=True)
     parser.add_argument('-a', '--abundancies', required=True)
     parser.add_argument('-c', '--color_taxa', required=True)
@@ -74,6 +74,15 @@ def parse_arguments():
     return args
 
 
+def get_output_fp(output, extension):
+
+    """The output path, with the file extension added unless it is already given"""
+
+    if output.endswith(extension):
+        return output
+    return output + extension
+
+
 def get_label_dict(label_file_path):
 
     """Retrieves a dictionary with OTU - label information from a textfile"""
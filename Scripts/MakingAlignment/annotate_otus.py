@@ -23,7 +23,15 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import re
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import otu_table
 
 program_description = """
 Annotates OTU-fasta and OTU-abundancy matrix
@@ -129,12 +137,11 @@ def annotate_otu_abund_matrix(raw_abund_fp, annotated_abund_fp, otu_taxa_dict, f
     according to the taxa found in the otu_taxa_dict
     """
 
-    with open(raw_abund_fp, 'r') as input_fh, open(annotated_abund_fp, 'w') as output_fh:
+    abund_table = otu_table.read_tsv(raw_abund_fp, sample_names=['count'])
 
-        for line in input_fh:
-            line = line.rstrip()
+    with open(annotated_abund_fp, 'w') as output_fh:
 
-            otu, count = line.split('\t')
+        for otu, count in zip(abund_table.get_otu_names(), abund_table.get_otu_totals().tolist()):
             taxa = otu_taxa_dict[otu]
 
             if not fixed_rank_annot_dict:
@@ -23,7 +23,15 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import re
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
 
 program_description = """
 Filter OTUs based on their taxa level
@@ -71,6 +79,9 @@ def main():
         if fh is not None:
             fh.close()
 
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, len(remaining_labels))
+
 
 def parse_arguments():
 
@@ -84,9 +95,19 @@ def parse_arguments():
     parser.add_argument('-a', '--abund_matrix')
     parser.add_argument('-f', '--fixed_rank')
 
-    parser.add_argument('-d', '--output_dir', required=True)
+    parser.add_argument('-d', '--output_dir', help='Directory for the filtered files not given an explicit path')
     parser.add_argument('-s', '--suffix', default='.taxfiltered')
+    parser.add_argument('-o', '--output', help='Filtered OTUs, written to the output directory if not given')
+    parser.add_argument('--output_abund_matrix',
+                        help='Filtered abundancy matrix, written to the output directory if not given')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
     args = parser.parse_args()
+
+    if args.output_dir is None and (args.output is None or
+                                    args.fixed_rank is not None or
+                                    (args.abund_matrix is not None and args.output_abund_matrix is None)):
+        parser.error('--output_dir is required for filtered files not given an explicit path')
+
     return args
 
 
@@ -107,19 +128,19 @@ def open_filehandles(args):
     (7) Filtered fixrank file       (output)
     """
 
-    out_format_string = args.output_dir + '/{}' + args.suffix
+    out_format_string = '{}/{{}}{}'.format(args.output_dir, args.suffix)
 
     otu_name = args.input.split('/')[-1]
     otu_fh = open(args.input, 'r')
     tax_table_fh = open(args.taxa_table, 'r')
-    filtered_otu_fh = open(out_format_string.format(otu_name), 'w')
+    filtered_otu_fh = open(args.output or out_format_string.format(otu_name), 'w')
 
     abund_matrix_fh = None
     filtered_abund_matrix_fh = None
     if args.abund_matrix:
         abund_matrix_name = args.abund_matrix.split('/')[-1]
         abund_matrix_fh = open(args.abund_matrix, 'r')
-        filtered_abund_matrix_fh = open(out_format_string.format(abund_matrix_name), 'w')
+        filtered_abund_matrix_fh = open(args.output_abund_matrix or out_format_string.format(abund_matrix_name), 'w')
 
     fixrank_fh = None
     filtered_fixrank_fh = None
@@ -222,5 +243,6 @@ def get_tax_depth_dict(tax_table_fh):
 
     return tax_depth_dict
 
+
 if __name__ == '__main__':
     main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import cdhit_output_parser
+
+program_description = """
+Benchmarks the regex-free CD-HIT cluster parser against the CDhitEntry based parser
+
+A synthetic .clstr file is generated, with cluster sizes drawn from a long-tailed distribution
+and optionally a few very large clusters. Both parsers write an OTU table and cluster mapping,
+which are checked to be identical, and the parsing times are reported.
+"""
+
+
+def main():
+
+    args = parse_arguments()
+
+    random.seed(args.seed)
+    work_dir = tempfile.mkdtemp(dir=args.temp_dir)
+    clusters_fp = os.path.join(work_dir, 'synthetic.clstr')
+
+    line_count = write_synthetic_clusters(clusters_fp, args.lines, args.large_clusters, args.large_cluster_size)
+    print('Generated {} cluster lines ({:.1f} MB)'.format(line_count, os.path.getsize(clusters_fp) / 1e6))
+
+    cdhit_entry_fps = (os.path.join(work_dir, 'entry.table'), os.path.join(work_dir, 'entry.mapping'))
+    fast_fps = (os.path.join(work_dir, 'fast.table'), os.path.join(work_dir, 'fast.mapping'))
+
+    cdhit_entry_time = get_best_time(parse_with_cdhit_entry, clusters_fp, cdhit_entry_fps, args.repeats)
+    fast_time = get_best_time(cdhit_output_parser.output_clusters, clusters_fp, fast_fps, args.repeats)
+
+    for cdhit_entry_fp, fast_fp in zip(cdhit_entry_fps, fast_fps):
+        if not files_are_equal(cdhit_entry_fp, fast_fp):
+            raise ValueError('The parsers gave different output for {}'.format(os.path.basename(fast_fp)))
+
+    print('CDhitEntry parser: {:.2f} seconds'.format(cdhit_entry_time))
+    print('Regex-free parser: {:.2f} seconds ({:.1f}x faster)'.format(fast_time, cdhit_entry_time / fast_time))
+
+    if not args.keep:
+        for file_fp in (clusters_fp,) + cdhit_entry_fps + fast_fps:
+            os.remove(file_fp)
+        os.rmdir(work_dir)
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-l', '--lines', help='Approximate number of member lines to generate',
+                        type=int, default=1000000)
+    parser.add_argument('--large_clusters', help='Number of very large clusters to include', type=int, default=2)
+    parser.add_argument('--large_cluster_size', help='Number of members in each very large cluster',
+                        type=int, default=200000)
+    parser.add_argument('-r', '--repeats', help='Number of timed runs per parser, the best is reported',
+                        type=int, default=1)
+    parser.add_argument('-s', '--seed', help='Random seed for the synthetic clusters', type=int, default=1)
+    parser.add_argument('--temp_dir', help='Directory where the synthetic files are written')
+    parser.add_argument('--keep', help='Keep the synthetic files', action='store_true')
+    args = parser.parse_args()
+    return args
+
+
+def write_synthetic_clusters(clusters_fp, line_count, large_clusters, large_cluster_size):
+
+    """
+    Writes clusters in the CD-HIT .clstr format until the line count is reached
+    The very large clusters are spread out among the regular ones
+    Returns the number of written member lines
+    """
+
+    large_positions = set(random.sample(range(1, max(line_count // 10, large_clusters + 1)), large_clusters))
+    cluster_sizes = list()
+    total_lines = 0
+    while total_lines < line_count:
+        if len(cluster_sizes) in large_positions:
+            cluster_size = large_cluster_size
+        else:
+            cluster_size = min(int(random.paretovariate(1.2)), 5000)
+        cluster_sizes.append(cluster_size)
+        total_lines += cluster_size
+
+    seq_nbr = 0
+    with open(clusters_fp, 'w') as out_fh:
+        for cluster_nbr, cluster_size in enumerate(cluster_sizes):
+            out_fh.write('>Cluster {}\n'.format(cluster_nbr))
+            representative_pos = random.randrange(cluster_size)
+            for member_pos in range(cluster_size):
+                seq_nbr += 1
+                if member_pos == representative_pos:
+                    mark = '*'
+                else:
+                    mark = 'at +/{:.2f}%'.format(random.uniform(97, 100))
+                out_fh.write('{}\t{}nt, >seq{};size={};... {}\n'
+                             .format(member_pos, random.randint(240, 260), seq_nbr,
+                                     int(random.paretovariate(1.5)), mark))
+    return total_lines
+
+
+def get_best_time(parse_function, clusters_fp, output_fps, repeats):
+
+    best_time = None
+    for _ in range(repeats):
+        start_time = time.perf_counter()
+        parse_function(clusters_fp, *output_fps)
+        run_time = time.perf_counter() - start_time
+        if best_time is None or run_time < best_time:
+            best_time = run_time
+    return best_time
+
+
+def parse_with_cdhit_entry(clusters_fp, table_fp, mapping_fp):
+
+    """The original parsing loop of the CD-HIT output parser"""
+
+    entry = cdhit_output_parser.CDhitEntry()
+    with open(clusters_fp) as input_fh, open(table_fp, 'w') as output_fh, open(mapping_fp, 'w') as seq_matrix_fh:
+        for line in input_fh:
+            if line.startswith('>'):
+                if entry.has_information():
+                    entry.output_information(output_fh, seq_matrix_fh)
+                entry = cdhit_output_parser.CDhitEntry()
+            else:
+                entry.add_line(line)
+        entry.output_information(output_fh, seq_matrix_fh)
+
+
+def files_are_equal(first_fp, second_fp):
+
+    with open(first_fp, 'rb') as first_fh, open(second_fp, 'rb') as second_fh:
+        while True:
+            first_chunk = first_fh.read(1 << 20)
+            if first_chunk != second_fh.read(1 << 20):
+                return False
+            if not first_chunk:
+                return True
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import collections
+import mmap
+
+"""
+Fast parser for CD-HIT cluster files (.clstr)
+
+The file is memory mapped and cut into clusters at the '>Cluster' headers. Each cluster is then
+split with plain byte operations on the whole cluster, without regular expressions or a loop
+over its lines. A member line looks like:
+
+    0	253nt, >seq1;size=12;... *
+    1	250nt, >seq7;size=3;... at +/97.60%
+
+where the representative is marked with '*'. The sequence header is the text between '>' and
+the last '...', as matched by the regular expression of the original parser.
+"""
+
+CLUSTER_START = b'\n>'
+HEADER_START = b'>'
+HEADER_END = b'...'
+REPRESENTATIVE_END = b'... *'
+SIZE_LABEL = b'size='
+
+# The representative and the other members are kept as bytes, the members in file order
+ClusterRecord = collections.namedtuple('ClusterRecord', ['representative', 'read_count', 'members'])
+
+
+def iterate_clusters(clusters_fp):
+
+    """
+    Yields a ClusterRecord for each cluster in the file, in file order
+    The read count is the sum of the size annotations of all members, including the representative
+    Clusters without member lines are skipped
+    """
+
+    with open(clusters_fp, 'rb') as in_fh:
+
+        if in_fh.seek(0, 2) == 0:
+            return
+
+        with mmap.mmap(in_fh.fileno(), 0, access=mmap.ACCESS_READ) as clusters_map:
+
+            cluster_start = clusters_map.find(HEADER_START)
+            while cluster_start != -1:
+
+                next_start = clusters_map.find(CLUSTER_START, cluster_start)
+                if next_start == -1:
+                    record = parse_cluster(clusters_map[cluster_start:])
+                else:
+                    record = parse_cluster(clusters_map[cluster_start:next_start + 1])
+                    next_start += 1
+
+                if record is not None:
+                    yield record
+
+                cluster_start = next_start
+
+
+def parse_cluster(cluster_block):
+
+    """
+    Parses one cluster, from its '>Cluster' header up to the next cluster
+    Each part following a '>' holds a sequence header, ended by the last '...' of the part
+    """
+
+    parts = cluster_block.split(HEADER_START)[2:]
+    if not parts:
+        return None
+
+    seq_headers = [part.rpartition(HEADER_END)[0] for part in parts]
+
+    size_parts = b';'.join(seq_headers).split(SIZE_LABEL)[1:]
+    if len(size_parts) != len(seq_headers):
+        raise ValueError("The input headers doesn't contain size information: {}"
+                         .format(cluster_block.partition(b'\n')[0].decode(errors='replace')))
+    try:
+        read_count = sum(map(int, [size_part.partition(b';')[0] for size_part in size_parts]))
+    except ValueError:
+        read_count = sum([get_size(size_part) for size_part in size_parts])
+
+    representative_end = cluster_block.find(REPRESENTATIVE_END)
+    if representative_end == -1:
+        raise ValueError('No representative sequence found for cluster: {}'
+                         .format(cluster_block.partition(b'\n')[0].decode(errors='replace')))
+    representative_pos = cluster_block.count(HEADER_START, 0, representative_end) - 2
+
+    representative = seq_headers.pop(representative_pos)
+    return ClusterRecord(representative, read_count, seq_headers)
+
+
+def get_size(size_part):
+
+    """Reads the number starting a header part following 'size=', also when not ended by ';'"""
+
+    size_digits = size_part.partition(b';')[0]
+    size_end = 0
+    while size_end < len(size_digits) and 48 <= size_digits[size_end] <= 57:
+        size_end += 1
+    if size_end == 0:
+        raise ValueError('Malformed size annotation: size={}'.format(size_digits.decode(errors='replace')))
+    return int(size_digits[:size_end])
+
+
+def get_mapping_line(record):
+
+    """The clustered sequences of a record as a tab delimited line, representative first"""
+
+    return b'\t'.join([record.representative] + record.members) + b'\n'
@@ -24,12 +24,23 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 
 import sys
 import argparse
+import os
 import re
 
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import cdhit_clusters
+import record_stats
+
 program_description = """
 Parses CD-HIT output matrix, and prints an OTU table
 Optionally also prints a read matrix, with clustered reads
 grouped on the same rows
+
+The clusters are read with the regex-free parser in cdhit_clusters.py. The CDhitEntry
+class is kept as the reference implementation, used by benchmark_cdhit_parser.py.
 """
 
 REG_PATTERN = re.compile(r">(.*)\.\.\.")
@@ -41,22 +52,10 @@ def main():
     # Setup
     args = parse_arguments()
 
-    # Parse CDhit lines
-    entry = CDhitEntry()
-    with open(args.input) as input_fh, open(args.output, 'w') as output_fh, open(args.seq_matrix, 'w') as seq_matrix_fh:
-        for line in input_fh:
-
-            if line.startswith('>'):
-                if entry.has_information():
-                    entry.output_information(output_fh, seq_matrix_fh)
+    cluster_count = output_clusters(args.input, args.output, args.seq_matrix)
 
-                entry = CDhitEntry()
-
-            else:
-                entry.add_line(line)
-
-        # Outputs the last cluster
-        entry.output_information(output_fh, seq_matrix_fh)
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, cluster_count)
 
 
 def parse_arguments():
@@ -74,10 +73,27 @@ def parse_arguments():
                              'includes that in the cluster count.', action='store_true')
     parser.add_argument('--seq_matrix',
                         help='Produce tab delimited file with clustered sequences on single lines.')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
     args = parser.parse_args()
     return args
 
 
+def output_clusters(clusters_fp, table_fp, seq_matrix_fp):
+
+    """
+    Writes the representative and total count of each cluster to the table, and the clustered
+    sequences to the read matrix. Returns the number of clusters.
+    """
+
+    cluster_count = 0
+    with open(table_fp, 'wb') as output_fh, open(seq_matrix_fp, 'wb') as seq_matrix_fh:
+        for record in cdhit_clusters.iterate_clusters(clusters_fp):
+            output_fh.write(b'>' + record.representative + b'\t' + str(record.read_count).encode() + b'\n')
+            seq_matrix_fh.write(cdhit_clusters.get_mapping_line(record))
+            cluster_count += 1
+    return cluster_count
+
+
 class CDhitEntry(object):
 
     """
@@ -185,5 +201,6 @@ def get_seq_header_from_line(line):
     fasta_header = regex_match.group(1)
     return fasta_header
 
+
 if __name__ == "__main__":
     main()
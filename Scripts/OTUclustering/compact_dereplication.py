@@ -0,0 +1,242 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import array
+import itertools
+
+import numpy as np
+
+"""
+Memory-compact dereplication, producing the same output as the dictionary based dereplication
+in script_dereplicator.
+
+Unique sequences are stored as 2-bit packed bytes, prefixed with the sequence length.
+The bases are packed from the first bit, so that the packed bytes sort in the same order
+as the sequences, allowing the output to be ordered without unpacking the sequences.
+Sequences containing other characters than ACGT are stored as they are, with a marker prefix.
+Headers are stored in array-backed columns: the read names in a single byte buffer with offsets,
+and the sample labels as integer IDs into a list of interned labels. For each read only
+the integer ID of its unique sequence is kept, and the reads of each unique sequence
+are grouped first when the output is written.
+"""
+
+LABEL_SEPARATOR = ';label='
+RAW_SEQUENCE_MARKER = b'\xff\xff'
+MAX_PACKED_LENGTH = 0xfffe
+NO_LABEL = 0xffff
+
+ENCODE_TABLE = str.maketrans('ACGT', '0123')
+ACGT_DELETE_TABLE = str.maketrans('', '', 'ACGT')
+DECODE_TABLE = {ord(hex_digit): ''.join(bases) for hex_digit, bases
+                in zip('0123456789abcdef', itertools.product('ACGT', repeat=2))}
+
+
+class CompactDereplicator:
+
+    def __init__(self):
+
+        self._sequence_ids = dict()
+        self._sequence_keys = list()
+        self._first_reads = array.array('Q')
+        self._read_sequence_ids = array.array('Q')
+
+        self._name_buffer = bytearray()
+        self._name_offsets = array.array('Q', [0])
+        self._read_label_ids = array.array('H')
+        self._label_ids = dict()
+        self._labels = list()
+
+    def add_read(self, header, sequence):
+
+        """Registers a read, with the header including the leading '>'"""
+
+        read_nbr = len(self._read_sequence_ids)
+        key = pack_sequence(sequence)
+
+        sequence_id = self._sequence_ids.get(key)
+        if sequence_id is None:
+            sequence_id = len(self._sequence_keys)
+            self._sequence_ids[key] = sequence_id
+            self._sequence_keys.append(key)
+            self._first_reads.append(read_nbr)
+
+        self._read_sequence_ids.append(sequence_id)
+        self._add_header(header[1:])
+
+    def get_unique_count(self):
+        return len(self._sequence_keys)
+
+    def get_header(self, read_nbr):
+
+        """Reconstructs the full header of a read, including the leading '>'"""
+
+        name = self._name_buffer[self._name_offsets[read_nbr]:self._name_offsets[read_nbr + 1]].decode()
+        label_id = self._read_label_ids[read_nbr]
+
+        if label_id == NO_LABEL:
+            return '>' + name
+        return '>{}{}{}'.format(name, LABEL_SEPARATOR, self._labels[label_id])
+
+    def get_sequence_sizes(self):
+        return np.bincount(np.frombuffer(self._read_sequence_ids, dtype=np.uint64).astype(np.int64),
+                           minlength=len(self._sequence_keys))
+
+    def output_dereplicated_data(self, derep_fp):
+
+        """
+        Writes the dereplicated FASTA file with cluster size information
+        Ordered by cluster size and then by sequence, both descending
+        """
+
+        sizes = self.get_sequence_sizes()
+
+        with open(derep_fp, 'w') as out_fh:
+            for sequence_id in get_size_sequence_order(sizes, self._sequence_keys):
+                out_fh.write('{};size={};\n{}\n'.format(self.get_header(self._first_reads[sequence_id]),
+                                                         sizes[sequence_id],
+                                                         unpack_sequence(self._sequence_keys[sequence_id])))
+
+    def output_cluster_file(self, output_fp):
+
+        """
+        Writes the header to cluster mapping, one unique sequence per line in order of first appearance
+        The reads of each line are in input order, with the representant first
+        """
+
+        read_sequence_ids = np.frombuffer(self._read_sequence_ids, dtype=np.uint64)
+        grouped_reads = np.argsort(read_sequence_ids, kind='stable')
+        group_ends = np.cumsum(self.get_sequence_sizes())
+
+        with open(output_fp, 'w') as out_fh:
+            group_start = 0
+            for group_end in group_ends:
+                headers = [self.get_header(read_nbr).replace('>', '')
+                           for read_nbr in grouped_reads[group_start:group_end]]
+                print('\t'.join(headers), file=out_fh)
+                group_start = group_end
+
+    def _add_header(self, header):
+
+        name, separator, label = header.rpartition(LABEL_SEPARATOR)
+
+        if separator == '':
+            name = label
+            label_id = NO_LABEL
+        else:
+            label_id = self._label_ids.get(label)
+            if label_id is None:
+                label_id = len(self._labels)
+                self._label_ids[label] = label_id
+                self._labels.append(label)
+
+        self._name_buffer += name.encode()
+        self._name_offsets.append(len(self._name_buffer))
+        self._read_label_ids.append(label_id)
+
+
+def dereplicate_compact(input_fp):
+
+    """Reads the FASTA file into a compact dereplicator, grouping lines in the same way as the default engine"""
+
+    ishead = lambda x: x.startswith('>')
+    dereplicator = CompactDereplicator()
+
+    with open(input_fp, 'r') as in_fh:
+        head = None
+        for h, lines in itertools.groupby(in_fh, ishead):
+            if h:
+                head = next(lines).rstrip()
+            else:
+                dereplicator.add_read(head, ''.join(lines).rstrip())
+
+    return dereplicator
+
+
+def pack_sequence(sequence):
+
+    """
+    Packs a sequence into 2-bit bytes prefixed by its length, padding the last byte with zero bits
+    Sequences which can't be packed are kept as they are, behind a marker
+    """
+
+    if len(sequence) > MAX_PACKED_LENGTH or len(sequence) == 0 or sequence.translate(ACGT_DELETE_TABLE) != '':
+        return RAW_SEQUENCE_MARKER + sequence.encode()
+
+    padding_bases = -len(sequence) % 4
+    packed_value = int(sequence.translate(ENCODE_TABLE), 4) << (2 * padding_bases)
+    return len(sequence).to_bytes(2, 'big') + packed_value.to_bytes((len(sequence) + 3) // 4, 'big')
+
+
+def unpack_sequence(key):
+
+    """Restores the sequence string from a packed key"""
+
+    if key.startswith(RAW_SEQUENCE_MARKER):
+        return key[len(RAW_SEQUENCE_MARKER):].decode()
+
+    length = int.from_bytes(key[:2], 'big')
+    packed_value = int.from_bytes(key[2:], 'big')
+    sequence = format(packed_value, '0{}x'.format(2 * len(key[2:]))).translate(DECODE_TABLE)
+    return sequence[:length]
+
+
+def get_size_sequence_order(sizes, sequence_keys):
+
+    """Orders the unique sequences by size and then by sequence, both descending"""
+
+    order = list()
+    size_order = np.argsort(-sizes, kind='stable')
+    boundaries = np.flatnonzero(np.diff(sizes[size_order])) + 1
+
+    for size_group in np.split(size_order, boundaries):
+        order += get_sequence_order(size_group.tolist(), sequence_keys)
+
+    return order
+
+
+def get_sequence_order(sequence_ids, sequence_keys):
+
+    """
+    Orders sequences descending
+    Packed sequences are sorted on their packed bytes followed by their length, which gives the
+    same order as the sequences, as a shorter sequence is padded with zero bits ('A').
+    If any sequence isn't packed, the sequences are unpacked and sorted as strings.
+    """
+
+    if any(sequence_keys[sequence_id].startswith(RAW_SEQUENCE_MARKER) for sequence_id in sequence_ids):
+        return sorted(sequence_ids, key=lambda sequence_id: unpack_sequence(sequence_keys[sequence_id]),
+                      reverse=True)
+
+    width = max(len(sequence_keys[sequence_id]) - 2 for sequence_id in sequence_ids)
+    packed_matrix = np.zeros((len(sequence_ids), width), dtype=np.uint8)
+    lengths = np.zeros(len(sequence_ids), dtype=np.int64)
+
+    for row in range(len(sequence_ids)):
+        key = sequence_keys[sequence_ids[row]]
+        packed_matrix[row, :len(key) - 2] = np.frombuffer(key, dtype=np.uint8, offset=2)
+        lengths[row] = int.from_bytes(key[:2], 'big')
+
+    # The last sort key is the primary one
+    sort_keys = [lengths] + [packed_matrix[:, column] for column in reversed(range(width))]
+    ascending_rows = np.lexsort(sort_keys)
+
+    return [sequence_ids[row] for row in reversed(ascending_rows.tolist())]
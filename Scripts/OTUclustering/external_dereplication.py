@@ -0,0 +1,220 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import heapq
+import itertools
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from concurrent import futures
+
+"""
+Out-of-core dereplication, producing the same output as the dictionary based dereplication
+in script_dereplicator while only holding a single partition of the reads in memory.
+
+The reads are spilled into partition files by a hash of their sequence, so all copies of a
+sequence end up in the same partition. Each partition is dereplicated separately, possibly in
+parallel worker processes, and written as two sorted runs: the unique sequences ordered by
+size and sequence, and the mapping lines ordered by the first read of each unique sequence.
+The runs are finally k-way merged into the dereplicated FASTA and the mapping file.
+
+Records in the spill and run files are stored as length-prefixed fields, as headers and
+sequences can contain any characters.
+"""
+
+SPILL_BUFFER_SIZE = 64 * 1024
+READ_FIELDS = 3
+DEREP_FIELDS = 3
+MAPPING_FIELDS = 2
+
+
+def dereplicate_external(input_fp, derep_fp, mapping_fp, partitions, processes=1, temp_dir=None):
+
+    """Dereplicates the reads through partition files on disk, returns the number of unique sequences"""
+
+    spill_dir = tempfile.mkdtemp(prefix='derep_', dir=temp_dir)
+
+    try:
+        partition_fps = [os.path.join(spill_dir, 'partition_{}'.format(pos)) for pos in range(partitions)]
+        spill_partitions(input_fp, partition_fps)
+
+        derep_run_fps = [partition_fp + '.derep' for partition_fp in partition_fps]
+        mapping_run_fps = [partition_fp + '.mapping' for partition_fp in partition_fps]
+
+        if processes > 1:
+            with futures.ProcessPoolExecutor(max_workers=processes) as executor:
+                unique_counts = list(executor.map(dereplicate_partition, partition_fps,
+                                                  derep_run_fps, mapping_run_fps))
+        else:
+            unique_counts = [dereplicate_partition(partition_fp, derep_run_fp, mapping_run_fp)
+                             for partition_fp, derep_run_fp, mapping_run_fp
+                             in zip(partition_fps, derep_run_fps, mapping_run_fps)]
+
+        merge_derep_runs(derep_run_fps, derep_fp)
+        merge_mapping_runs(mapping_run_fps, mapping_fp)
+    finally:
+        shutil.rmtree(spill_dir)
+
+    return sum(unique_counts)
+
+
+def get_partition(sequence, partitions):
+
+    """Partition of a sequence, using a hash which is stable between processes"""
+
+    return zlib.crc32(sequence.encode()) % partitions
+
+
+def read_fasta_entries(in_fh):
+
+    """Yields header and sequence for each FASTA entry, grouping lines in the same way as the default engine"""
+
+    ishead = lambda x: x.startswith('>')
+    head = None
+    for h, lines in itertools.groupby(in_fh, ishead):
+        if h:
+            head = next(lines).rstrip()
+        else:
+            yield head, ''.join(lines).rstrip()
+
+
+def spill_partitions(input_fp, partition_fps):
+
+    """Writes each read with its position in the input to the partition of its sequence"""
+
+    partition_fhs = [open(partition_fp, 'wb', buffering=SPILL_BUFFER_SIZE) for partition_fp in partition_fps]
+
+    try:
+        with open(input_fp, 'r') as in_fh:
+            for read_nbr, (head, seq) in enumerate(read_fasta_entries(in_fh)):
+                partition_fh = partition_fhs[get_partition(seq, len(partition_fps))]
+                write_record(partition_fh, [str(read_nbr), head, seq])
+    finally:
+        for partition_fh in partition_fhs:
+            partition_fh.close()
+
+
+def dereplicate_partition(partition_fp, derep_run_fp, mapping_run_fp):
+
+    """
+    Dereplicates the reads within a partition, writing its sorted runs
+    Returns the number of unique sequences in the partition
+    """
+
+    clustered_dict = dict()
+
+    with open(partition_fp, 'rb', buffering=SPILL_BUFFER_SIZE) as in_fh:
+        for read_nbr, head, seq in read_records(in_fh, READ_FIELDS):
+            cluster = clustered_dict.get(seq)
+            if cluster is None:
+                clustered_dict[seq] = [read_nbr, head]
+            else:
+                cluster.append(head)
+
+    write_partition_runs(clustered_dict, derep_run_fp, mapping_run_fp)
+    return len(clustered_dict)
+
+
+def write_partition_runs(clustered_dict, derep_run_fp, mapping_run_fp):
+
+    """
+    Writes the unique sequences of a partition ordered by size and sequence, both descending,
+    and the mapping lines ordered by the first read of each sequence
+    The clustered dict maps sequences to their first read number followed by their headers
+    """
+
+    ordered_keys = sorted(clustered_dict.keys(), key=lambda k: (len(clustered_dict[k]) - 1, k), reverse=True)
+    with open(derep_run_fp, 'wb', buffering=SPILL_BUFFER_SIZE) as out_fh:
+        for key in ordered_keys:
+            cluster = clustered_dict[key]
+            write_record(out_fh, [str(len(cluster) - 1), key, cluster[1]])
+
+    # Reads are spilled in input order, so the dictionary is ordered by first read
+    with open(mapping_run_fp, 'wb', buffering=SPILL_BUFFER_SIZE) as out_fh:
+        for cluster in clustered_dict.values():
+            header_list_trunc_arrow = [header.replace('>', '') for header in cluster[1:]]
+            write_record(out_fh, [str(cluster[0]), '\t'.join(header_list_trunc_arrow)])
+
+
+def merge_derep_runs(derep_run_fps, derep_fp):
+
+    """Merges the sorted runs into a dereplicated FASTA, ordered by size and sequence as the default engine"""
+
+    run_fhs = [open(run_fp, 'rb', buffering=SPILL_BUFFER_SIZE) for run_fp in derep_run_fps]
+
+    try:
+        runs = [read_records(run_fh, DEREP_FIELDS) for run_fh in run_fhs]
+        with open(derep_fp, 'w') as out_fh:
+            for size, seq, head in heapq.merge(*runs, key=lambda record: (int(record[0]), record[1]), reverse=True):
+                out_fh.write('{};size={};\n{}\n'.format(head, size, seq))
+    finally:
+        for run_fh in run_fhs:
+            run_fh.close()
+
+
+def merge_mapping_runs(mapping_run_fps, mapping_fp):
+
+    """Merges the mapping runs into a mapping file ordered by first appearance of each sequence"""
+
+    run_fhs = [open(run_fp, 'rb', buffering=SPILL_BUFFER_SIZE) for run_fp in mapping_run_fps]
+
+    try:
+        runs = [read_records(run_fh, MAPPING_FIELDS) for run_fh in run_fhs]
+        with open(mapping_fp, 'w') as out_fh:
+            for _, mapping_line in heapq.merge(*runs, key=lambda record: int(record[0])):
+                print(mapping_line, file=out_fh)
+    finally:
+        for run_fh in run_fhs:
+            run_fh.close()
+
+
+def write_record(out_fh, fields):
+
+    """Writes string fields prefixed by their encoded lengths"""
+
+    encoded_fields = [field.encode() for field in fields]
+    out_fh.write(struct.pack('<{}I'.format(len(fields)), *[len(field) for field in encoded_fields]))
+    out_fh.write(b''.join(encoded_fields))
+
+
+def read_records(in_fh, field_count):
+
+    """Yields lists with the string fields of each record written by write_record"""
+
+    length_struct = struct.Struct('<{}I'.format(field_count))
+
+    while True:
+        length_bytes = in_fh.read(length_struct.size)
+        if len(length_bytes) == 0:
+            return
+
+        lengths = length_struct.unpack(length_bytes)
+        data = in_fh.read(sum(lengths))
+
+        fields = list()
+        pos = 0
+        for length in lengths:
+            fields.append(data[pos:pos + length].decode())
+            pos += length
+        yield fields
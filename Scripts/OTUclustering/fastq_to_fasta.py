@@ -24,6 +24,14 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 
 import re
 import argparse
+import os
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
 
 program_description = """Takes a fastq file as input, and outputs a fasta file."""
 SPLITTER_PATTERN = r'( |\|)'
@@ -52,6 +60,9 @@ def main():
                 print(line, file=output_fh)
             row += 1
 
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, (row - 1) // 4)
+
 
 def parse_arguments():
 
@@ -62,6 +73,7 @@ def parse_arguments():
     parser.add_argument('-o', '--output', required=True)
     parser.add_argument('--truncate', help='Truncates fasta headers at first space', action='store_true')
     parser.add_argument('--extract_label', help='Splits on spaces, but saves an optional "|ending" part', action='store_true')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
     args = parser.parse_args()
     return args
 
@@ -23,7 +23,15 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import re
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
 
 program_description = """
 A program that based on mapping counts, filters out OTUs with mapping counts
@@ -38,11 +46,14 @@ def main():
     args = get_parsed_arguments()
 
     otu_count_dict = build_map_count_dict(args.mapping_matrix)
-    output_filtered_otus(args.input, args.output, otu_count_dict, args.threshold)
+    otu_count = output_filtered_otus(args.input, args.output, otu_count_dict, args.threshold)
 
     if args.output_matrix:
         output_filtered_matrix(args.mapping_matrix, args.output_matrix, args.threshold)
 
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, otu_count)
+
 
 def get_parsed_arguments():
 
@@ -54,6 +65,7 @@ def get_parsed_arguments():
     parser.add_argument('-o', '--output', help='Output file - filtered OTU fasta file', required=True)
     parser.add_argument('-O', '--output_matrix', help='Optional output of filtered abundancy matrix')
     parser.add_argument('-t', '--threshold', help='The filter threshold', default=default_filter_threshold, type=int)
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
 
     return parser.parse_args()
 
@@ -101,8 +113,10 @@ def output_filtered_otus(input_otu, output_otu, otu_count_dict, threshold):
     """
     Uses the otu_count_dict to compare the input otus with the given threshold.
     When their count is higher than the threshold, they are written to the output file.
+    Returns the number of written OTUs
     """
 
+    otu_count = 0
     with open(input_otu, 'r') as input_otu_fh, open(output_otu, 'w') as output_otu_fh:
 
         output_flag = False
@@ -111,10 +125,14 @@ def output_filtered_otus(input_otu, output_otu, otu_count_dict, threshold):
             line = line.rstrip()
             if line.startswith('>'):
                 output_flag = evaluate_otu_header(line, otu_count_dict, threshold)
+                if output_flag:
+                    otu_count += 1
 
             if output_flag:
                 print(line, file=output_otu_fh)
 
+    return otu_count
+
 
 def output_filtered_matrix(input_matrix, output_matrix, threshold):
 
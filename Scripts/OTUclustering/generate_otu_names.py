@@ -24,6 +24,8 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 
 import argparse
 
+import otu_database
+
 program_description = """
 Create a name map for all input OTUs
 """
@@ -33,7 +35,16 @@ def main():
 
     args = get_parsed_arguments()
     otu_name_list = get_otu_name_list(args.input)
-    output_name_map(args.output, otu_name_list)
+
+    first_number = 1
+    if args.otu_database is not None:
+        first_number = otu_database.get_next_otu_number(args.otu_database)
+
+    reference_name_dict = dict()
+    if args.reference_names is not None:
+        reference_name_dict = get_reference_name_dict(args.reference_names)
+
+    output_name_map(args.output, otu_name_list, first_number=first_number, reference_name_dict=reference_name_dict)
 
 
 def get_parsed_arguments():
@@ -41,6 +52,9 @@ def get_parsed_arguments():
     parser = argparse.ArgumentParser(description=program_description)
     parser.add_argument('-i', '--input', help='FASTA file with input OTUs')
     parser.add_argument('-o', '--output', help='OTU name mapping table')
+    parser.add_argument('--otu_database', help='OTU database directory, new OTU names continue from its numbering')
+    parser.add_argument('--reference_names', help='Tab delimited map with names of OTUs already present '
+                                                  'in the OTU database')
     return parser.parse_args()
 
 
@@ -57,23 +71,57 @@ def get_otu_name_list(otu_fasta_fp):
     return raw_otu_names
 
 
-def output_name_map(otu_name_list_fp, otu_name_list):
+def get_reference_name_dict(reference_names_fp):
+
+    """Retrieves the OTU headers mapped to names in the OTU database"""
+
+    reference_name_dict = dict()
+    with open(reference_names_fp) as in_fh:
+        for line in in_fh:
+            otu_id, name = line.rstrip().split('\t')
+            reference_name_dict[otu_id] = name
+    return reference_name_dict
+
+
+def output_name_map(otu_name_list_fp, otu_name_list, first_number=1, reference_name_dict=None):
 
-    """Outputs table mapping OTU headers to new names"""
+    """
+    Outputs table mapping OTU headers to new names
+    OTUs present in the reference name dict keep their existing names
+    """
 
-    otu_name_generator = generate_otu_names('OTU')
+    otu_name_dict = get_otu_name_dict(otu_name_list, first_number=first_number,
+                                      reference_name_dict=reference_name_dict)
 
     with open(otu_name_list_fp, 'w') as out_fh:
-        for otu_id in otu_name_list:
-            new_name = next(otu_name_generator)
-            out_fh.write('{}\t{}\n'.format(otu_id.split(';')[0], new_name))
+        for otu_id, new_name in otu_name_dict.items():
+            out_fh.write('{}\t{}\n'.format(otu_id, new_name))
+
+
+def get_otu_name_dict(otu_name_list, first_number=1, reference_name_dict=None):
+
+    """
+    Assigns new names to the OTU headers, in the order of the list
+    The size annotation is removed from the headers used as keys
+    """
+
+    otu_name_generator = generate_otu_names('OTU', first_number=first_number)
+
+    otu_name_dict = dict()
+    for otu_id in otu_name_list:
+        otu_id = otu_id.split(';')[0]
+        if reference_name_dict is not None and otu_id in reference_name_dict:
+            otu_name_dict[otu_id] = reference_name_dict[otu_id]
+        else:
+            otu_name_dict[otu_id] = next(otu_name_generator)
+    return otu_name_dict
 
 
-def generate_otu_names(base_name):
+def generate_otu_names(base_name, first_number=1):
 
-    """Generator creating names 'base_name1', 'base_name2'.."""
+    """Generator creating names 'base_name1', 'base_name2'.., optionally starting from a later number"""
 
-    counter = 1
+    counter = first_number
     while True:
         yield '{}{}'.format(base_name, counter)
         counter += 1
@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import array
+import itertools
+import math
+import multiprocessing
+import os
+import re
+import sys
+
+import numpy as np
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
+
+program_description = """
+Greedy OTU clustering of dereplicated reads, used as an alternative to CD-HIT
+
+The sequences are processed in order of abundance. Each sequence joins the first earlier
+centroid with an identity at or above the threshold, or otherwise becomes a new centroid.
+As with CD-HIT, the identity is the number of identical bases in the alignment divided by
+the length of the shorter sequence.
+
+Candidate centroids are found through an inverted index from k-mers to the centroids
+containing them, keeping only centroids sharing enough k-mers to possibly reach the identity
+threshold. The candidates are then aligned to the sequence using a banded alignment.
+With multiple processes, batches of sequences are evaluated against the existing centroids in
+parallel, while the main process handles centroids created within the batch, giving the
+same clusters as a single process.
+
+The representative sequences are written as FASTA, together with the same OTU table and
+cluster mapping as produced by the CD-HIT output parser.
+"""
+
+SIZE_PATTERN = re.compile(r';size=(\d+)')
+
+MATCH_SCORE = 1
+MISMATCH_SCORE = -2
+GAP_SCORE = -2
+NEG_SCORE = -(1 << 50)
+
+BASE_CODES = np.full(256, 4, dtype=np.uint8)
+for base_code, base in enumerate('ACGT'):
+    BASE_CODES[ord(base)] = base_code
+    BASE_CODES[ord(base.lower())] = base_code
+
+QUERY_BATCH_SIZE = 500
+
+
+def main():
+
+    args = parse_arguments()
+
+    headers, sequences = read_fasta(args.input)
+    sizes = [get_size(header) for header in headers]
+    order = sorted(range(len(sequences)), key=lambda pos: sizes[pos], reverse=True)
+
+    ordered_sequences = [sequences[pos] for pos in order]
+    if args.processes > 1:
+        centroid_assignments = cluster_sequences_parallel(ordered_sequences, args.identity, args.word_size,
+                                                          args.band, args.accurate, args.processes)
+    else:
+        centroid_assignments = cluster_sequences(ordered_sequences, args.identity, args.word_size,
+                                                 args.band, args.accurate)
+
+    clusters = get_clusters(order, centroid_assignments)
+    output_representatives(args.output, clusters, headers, sequences)
+    output_otu_table(args.table, clusters, headers, sizes)
+    if args.seq_matrix is not None:
+        output_cluster_mapping(args.seq_matrix, clusters, headers)
+
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, len(clusters))
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input', help='Dereplicated FASTA file with size annotated headers', required=True)
+    parser.add_argument('-o', '--output', help='FASTA file with the representative sequence of each OTU',
+                        required=True)
+    parser.add_argument('-t', '--table', help='Table with the representatives and their total read counts',
+                        required=True)
+    parser.add_argument('--seq_matrix', help='Produce tab delimited file with clustered sequences on single lines.')
+    parser.add_argument('-c', '--identity', help='Clustering identity threshold', type=float, required=True)
+    parser.add_argument('-n', '--word_size', help='K-mer length used for finding candidate centroids',
+                        type=int, default=8)
+    parser.add_argument('-b', '--band', help='Band width of the alignment, in addition to the length difference',
+                        type=int, default=20)
+    parser.add_argument('-p', '--processes', help='Number of processes evaluating candidate centroids',
+                        type=int, default=1)
+    parser.add_argument('--accurate', help='Joins the most similar centroid instead of the first one reaching '
+                                           'the threshold', action='store_true')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
+    args = parser.parse_args()
+    return args
+
+
+class CentroidIndex:
+
+    """
+    Inverted index from k-mers to the centroids containing them
+    Centroids are numbered in the order they are added
+    """
+
+    def __init__(self, identity, word_size, band, accurate):
+
+        self._identity = identity
+        self._word_size = word_size
+        self._band = band
+        self._accurate = accurate
+
+        self._centroids = list()
+        self._lengths = array.array('q')
+        self._kmer_counts = array.array('q')
+        self._kmer_postings = dict()
+
+    def add_centroid(self, sequence):
+
+        """Adds a centroid, returns its number"""
+
+        centroid_nbr = len(self._centroids)
+        encoded = encode_sequence(sequence)
+        self._centroids.append(encoded)
+        self._lengths.append(len(encoded))
+
+        kmers = get_distinct_kmers(encoded, self._word_size).tolist()
+        self._kmer_counts.append(len(kmers))
+        for kmer in kmers:
+            postings = self._kmer_postings.get(kmer)
+            if postings is None:
+                self._kmer_postings[kmer] = [centroid_nbr]
+            else:
+                postings.append(centroid_nbr)
+
+        return centroid_nbr
+
+    def load_centroids(self, sequences, kmer_postings):
+
+        """Adds centroids together with their already calculated k-mer postings, replacing any existing centroids"""
+
+        self._centroids = [encode_sequence(sequence) for sequence in sequences]
+        self._lengths = array.array('q', [len(sequence) for sequence in sequences])
+        self._kmer_postings = kmer_postings
+
+        posting_centroids = np.fromiter(itertools.chain.from_iterable(kmer_postings.values()), dtype=np.int64)
+        self._kmer_counts = array.array('q', np.bincount(posting_centroids, minlength=len(sequences)).tolist())
+
+    def get_kmer_postings(self):
+
+        """Returns the dictionary from k-mers to the numbers of the centroids containing them"""
+
+        return self._kmer_postings
+
+    def find_match(self, sequence):
+
+        """
+        Finds the centroid the sequence should join
+        Returns a tuple with the centroid number and the identity, or None if no centroid is close enough
+        """
+
+        encoded = encode_sequence(sequence)
+        best_match = None
+
+        for centroid_nbr in self.get_candidates(encoded):
+            identity = get_identity(encoded, self._centroids[centroid_nbr], self._band)
+            if identity >= self._identity:
+                if not self._accurate:
+                    return centroid_nbr, identity
+                if best_match is None or identity > best_match[1]:
+                    best_match = (centroid_nbr, identity)
+
+        return best_match
+
+    def get_candidates(self, encoded):
+
+        """
+        Centroids sharing enough distinct k-mers with the sequence to possibly reach the identity threshold,
+        in centroid order. The identity is relative to the shorter of the two sequences, whose bases not
+        matched in the alignment can each remove at most word size of its k-mers from those shared.
+        At least one shared k-mer is always required.
+        """
+
+        if len(self._centroids) == 0:
+            return list()
+
+        kmers = get_distinct_kmers(encoded, self._word_size).tolist()
+
+        posting_centroids = list()
+        for kmer in kmers:
+            postings = self._kmer_postings.get(kmer)
+            if postings is not None:
+                posting_centroids += postings
+
+        shared = np.bincount(np.array(posting_centroids, dtype=np.int64), minlength=len(self._centroids))
+
+        lengths = np.frombuffer(self._lengths, dtype=np.int64)
+        centroid_kmer_counts = np.frombuffer(self._kmer_counts, dtype=np.int64)
+
+        shorter_lengths = np.minimum(lengths, len(encoded))
+        shorter_kmer_counts = np.where(lengths < len(encoded), centroid_kmer_counts, len(kmers))
+        unmatched = shorter_lengths - np.ceil(self._identity * shorter_lengths)
+        required = np.maximum(shorter_kmer_counts - self._word_size * unmatched, 1)
+
+        return np.flatnonzero(shared >= required).tolist()
+
+
+def read_fasta(input_fp):
+
+    """Reads the headers, including the leading '>', and the sequences of a FASTA file"""
+
+    headers = list()
+    sequences = list()
+    seq_lines = list()
+
+    with open(input_fp) as in_fh:
+        for line in in_fh:
+            line = line.rstrip()
+            if line.startswith('>'):
+                if len(headers) > 0:
+                    sequences.append(''.join(seq_lines))
+                headers.append(line)
+                seq_lines = list()
+            else:
+                seq_lines.append(line)
+
+    if len(headers) > 0:
+        sequences.append(''.join(seq_lines))
+
+    return headers, sequences
+
+
+def get_size(header):
+
+    """Retrieves the dereplicated size from the header, defaulting to one read"""
+
+    size_match = SIZE_PATTERN.search(header)
+    if size_match is None:
+        return 1
+    return int(size_match.group(1))
+
+
+def get_name(header):
+
+    """Name used for a sequence in the table and mapping, as the header up to the first whitespace"""
+
+    return header[1:].split()[0]
+
+
+def encode_sequence(sequence):
+
+    """Encodes the bases as 0-3 for ACGT and 4 for any other character"""
+
+    return BASE_CODES[np.frombuffer(sequence.encode(), dtype=np.uint8)]
+
+
+def get_distinct_kmers(encoded, word_size):
+
+    """Returns the distinct k-mers of a sequence encoded as integers, skipping k-mers with other bases than ACGT"""
+
+    kmer_count = len(encoded) - word_size + 1
+    if kmer_count <= 0:
+        return np.zeros(0, dtype=np.int64)
+
+    kmers = np.zeros(kmer_count, dtype=np.int64)
+    invalid = np.zeros(kmer_count, dtype=bool)
+    for offset in range(word_size):
+        window = encoded[offset:offset + kmer_count]
+        kmers = kmers * 4 + (window & 3)
+        invalid |= window == 4
+
+    return np.unique(kmers[~invalid])
+
+
+def get_identity(encoded_a, encoded_b, band):
+
+    """
+    Aligns two sequences and returns the identical bases divided by the length of the shorter sequence
+
+    The alignment is global with free end gaps, restricted to a band of diagonals covering the length
+    difference and the band width on each side. The substitution scores for the band are calculated
+    up front, after which the dynamic programming is performed one row at a time, with gaps within
+    a row resolved by a cumulative maximum.
+    The score and the number of identical bases are combined into a single value, score * K + identical,
+    so that the alignment with the highest score and the most identical bases among those is found.
+    """
+
+    rows = len(encoded_a)
+    columns = len(encoded_b)
+    shorter_length = min(rows, columns)
+    if shorter_length == 0:
+        return 0.0
+
+    k = shorter_length + 1
+    low_diagonal = min(0, columns - rows) - band
+    high_diagonal = max(0, columns - rows) + band
+    width = high_diagonal - low_diagonal + 1
+
+    # Matrix columns of the band cells, with band position t on row r at column r + low_diagonal + t
+    band_columns = np.arange(rows + 1)[:, np.newaxis] + low_diagonal + np.arange(width)[np.newaxis, :]
+    b_bases = np.full(band_columns.shape, 255, dtype=np.uint8)
+    inside_b = (band_columns >= 1) & (band_columns <= columns)
+    b_bases[inside_b] = encoded_b[band_columns[inside_b] - 1]
+    a_bases = np.concatenate(([4], encoded_a))[:, np.newaxis]
+    substitution = np.where((b_bases == a_bases) & (a_bases != 4), MATCH_SCORE * k + 1, MISMATCH_SCORE * k)
+
+    diagonal_steps = np.arange(width, dtype=np.int64) * (GAP_SCORE * k)
+    scores = np.empty((rows + 1, width), dtype=np.int64)
+    scores[0] = np.where((band_columns[0] >= 0) & (band_columns[0] <= columns), 0, NEG_SCORE)
+
+    for row in range(1, rows + 1):
+
+        previous = scores[row - 1]
+        current = scores[row]
+        np.add(previous, substitution[row], out=current)
+        np.maximum(current[:-1], previous[1:] + GAP_SCORE * k, out=current[:-1])
+
+        # The first column is reached by skipping the start of a, cells left of it are never reached
+        first_column_pos = -(row + low_diagonal)
+        if first_column_pos > 0:
+            current[:first_column_pos] = NEG_SCORE
+        if 0 <= first_column_pos < width:
+            current[first_column_pos] = 0
+
+        current -= diagonal_steps
+        np.maximum.accumulate(current, out=current)
+        current += diagonal_steps
+
+    # Cells right of the last column are never read, the alignment ends on the last row or column
+    last_row_valid = (band_columns[rows] >= 0) & (band_columns[rows] <= columns)
+    last_column_pos = columns - np.arange(rows + 1) - low_diagonal
+    last_column_rows = np.flatnonzero((last_column_pos >= 0) & (last_column_pos < width))
+
+    best = max(scores[rows][last_row_valid].max(),
+               scores[last_column_rows, last_column_pos[last_column_rows]].max(initial=NEG_SCORE))
+    return int(best % k) / shorter_length
+
+
+def cluster_sequences(sequences, identity, word_size, band, accurate):
+
+    """Clusters the sequences in the given order, returns the centroid number assigned to each sequence"""
+
+    centroid_index = CentroidIndex(identity, word_size, band, accurate)
+    centroid_assignments = list()
+
+    for sequence in sequences:
+        match = centroid_index.find_match(sequence)
+        if match is None:
+            centroid_assignments.append(centroid_index.add_centroid(sequence))
+        else:
+            centroid_assignments.append(match[0])
+
+    return centroid_assignments
+
+
+def cluster_sequences_parallel(sequences, identity, word_size, band, accurate, processes):
+
+    """
+    Clusters the sequences in the given order using worker processes, with the same result as cluster_sequences
+    Each worker keeps its own copy of the centroid index, and is sent the new centroids after each batch
+    """
+
+    connections = list()
+    workers = list()
+    for _ in range(processes):
+        parent_connection, child_connection = multiprocessing.Pipe()
+        worker = multiprocessing.Process(target=run_candidate_worker,
+                                         args=(child_connection, identity, word_size, band, accurate))
+        worker.start()
+        connections.append(parent_connection)
+        workers.append(worker)
+
+    centroid_assignments = list()
+    new_centroids = list()
+    centroid_count = 0
+
+    try:
+        for batch_start in range(0, len(sequences), QUERY_BATCH_SIZE):
+
+            batch = sequences[batch_start:batch_start + QUERY_BATCH_SIZE]
+            slice_size = math.ceil(len(batch) / processes)
+            for worker_nbr in range(processes):
+                batch_slice = batch[worker_nbr * slice_size:(worker_nbr + 1) * slice_size]
+                connections[worker_nbr].send((new_centroids, batch_slice))
+
+            existing_matches = list()
+            for connection in connections:
+                existing_matches += connection.recv()
+
+            # Sequences not joining an existing centroid are compared to the centroids created in this batch
+            batch_index = CentroidIndex(identity, word_size, band, accurate)
+            new_centroids = list()
+            for sequence, existing_match in zip(batch, existing_matches):
+
+                if existing_match is not None and not accurate:
+                    centroid_assignments.append(existing_match[0])
+                    continue
+
+                batch_match = batch_index.find_match(sequence)
+                if batch_match is not None and (existing_match is None or batch_match[1] > existing_match[1]):
+                    centroid_assignments.append(centroid_count + batch_match[0])
+                elif existing_match is not None:
+                    centroid_assignments.append(existing_match[0])
+                else:
+                    centroid_assignments.append(centroid_count + batch_index.add_centroid(sequence))
+                    new_centroids.append(sequence)
+
+            centroid_count += len(new_centroids)
+    finally:
+        for connection in connections:
+            connection.send(None)
+        for worker in workers:
+            worker.join()
+
+    return centroid_assignments
+
+
+def run_candidate_worker(connection, identity, word_size, band, accurate):
+
+    """
+    Worker loop, receiving the centroids created since the last batch and a slice of sequences
+    Sends back the best existing centroid match for each sequence
+    """
+
+    centroid_index = CentroidIndex(identity, word_size, band, accurate)
+
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+
+        new_centroids, sequences = message
+        for centroid in new_centroids:
+            centroid_index.add_centroid(centroid)
+        connection.send([centroid_index.find_match(sequence) for sequence in sequences])
+
+
+def get_clusters(order, centroid_assignments):
+
+    """Groups the input positions of the sequences by centroid, with the centroid first"""
+
+    clusters = list()
+    for pos, centroid_nbr in zip(order, centroid_assignments):
+        if centroid_nbr == len(clusters):
+            clusters.append([pos])
+        else:
+            clusters[centroid_nbr].append(pos)
+    return clusters
+
+
+def output_representatives(output_fp, clusters, headers, sequences):
+
+    """Writes the representative sequences in the order the clusters were created"""
+
+    with open(output_fp, 'w') as out_fh:
+        for cluster in clusters:
+            print('{}\n{}'.format(headers[cluster[0]], sequences[cluster[0]]), file=out_fh)
+
+
+def output_otu_table(table_fp, clusters, headers, sizes):
+
+    """Writes the representative names with the total read count of each cluster"""
+
+    with open(table_fp, 'w') as out_fh:
+        for cluster in clusters:
+            print('>{}\t{}'.format(get_name(headers[cluster[0]]), sum(sizes[pos] for pos in cluster)), file=out_fh)
+
+
+def output_cluster_mapping(mapping_fp, clusters, headers):
+
+    """Writes the names in each cluster tab delimited on one line, with the representative first"""
+
+    with open(mapping_fp, 'w') as out_fh:
+        for cluster in clusters:
+            print('\t'.join(get_name(headers[pos]) for pos in cluster), file=out_fh)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+from concurrent import futures
+
+import kmer_clustering
+import otu_database
+
+program_description = """
+Maps dereplicated sequences to the OTUs of a persistent OTU database (closed-reference mapping)
+
+The sequences are compared to the database OTUs in the same way as the k-mer clustering engine
+compares sequences to centroids. Sequences reaching the identity threshold are grouped by OTU,
+with the most abundant sequence as the representative, and written as an OTU FASTA, OTU table
+and cluster mapping in the same formats as the clustering engines. The database name of each
+mapped OTU is written to a name mapping. The remaining sequences are written to a separate FASTA
+file, to be clustered de novo.
+"""
+
+MAPPING_CHUNK_SIZE = 1000
+
+worker_centroid_index = None
+
+
+def main():
+
+    args = parse_arguments()
+
+    database = otu_database.OtuDatabase(args.database, args.word_size)
+    headers, sequences = kmer_clustering.read_fasta(args.input)
+    sizes = [kmer_clustering.get_size(header) for header in headers]
+
+    otu_matches = get_otu_matches(database, sequences, args.identity, args.band, args.accurate, args.processes)
+
+    order = sorted(range(len(sequences)), key=lambda pos: sizes[pos], reverse=True)
+    otu_clusters = get_otu_clusters(order, otu_matches)
+
+    output_mapped_otus(args.mapped_otus, otu_clusters, headers, database.get_sequences())
+    kmer_clustering.output_otu_table(args.mapped_table, list(otu_clusters.values()), headers, sizes)
+    kmer_clustering.output_cluster_mapping(args.mapped_clusters, list(otu_clusters.values()), headers)
+    output_reference_names(args.reference_names, otu_clusters, headers, database.get_names())
+    output_unmapped(args.unmapped, otu_matches, headers, sequences)
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input', help='Dereplicated FASTA file with size annotated headers', required=True)
+    parser.add_argument('-d', '--database', help='OTU database directory, treated as empty if not yet created',
+                        required=True)
+    parser.add_argument('--mapped_otus', help='FASTA with the representative of each mapped OTU', required=True)
+    parser.add_argument('--mapped_table', help='Table with the mapped OTUs and their total read counts',
+                        required=True)
+    parser.add_argument('--mapped_clusters', help='Tab delimited file with the sequences of each mapped OTU',
+                        required=True)
+    parser.add_argument('--reference_names', help='Tab delimited map from representative to database OTU name',
+                        required=True)
+    parser.add_argument('--unmapped', help='FASTA with the sequences not mapped to any OTU', required=True)
+    parser.add_argument('-c', '--identity', help='Mapping identity threshold', type=float, required=True)
+    parser.add_argument('-n', '--word_size', help='K-mer length used when creating a new database',
+                        type=int, default=8)
+    parser.add_argument('-b', '--band', help='Band width of the alignment, in addition to the length difference',
+                        type=int, default=20)
+    parser.add_argument('-p', '--processes', help='Number of processes mapping sequences', type=int, default=1)
+    parser.add_argument('--accurate', help='Maps to the most similar OTU instead of the first one reaching '
+                                           'the threshold', action='store_true')
+    args = parser.parse_args()
+    return args
+
+
+def get_otu_matches(database, sequences, identity, band, accurate, processes):
+
+    """Returns the number of the database OTU matched by each sequence, or None for unmapped sequences"""
+
+    centroid_index = database.get_centroid_index(identity, band, accurate)
+
+    if processes > 1:
+        chunks = [sequences[start:start + MAPPING_CHUNK_SIZE]
+                  for start in range(0, len(sequences), MAPPING_CHUNK_SIZE)]
+        with futures.ProcessPoolExecutor(max_workers=processes, initializer=set_worker_centroid_index,
+                                         initargs=(centroid_index,)) as executor:
+            chunk_matches = list(executor.map(find_chunk_matches, chunks))
+        matches = [match for matches in chunk_matches for match in matches]
+    else:
+        matches = [centroid_index.find_match(sequence) for sequence in sequences]
+
+    return [match[0] if match is not None else None for match in matches]
+
+
+def set_worker_centroid_index(centroid_index):
+
+    """Worker initializer, keeping the index for all chunks handled by the worker"""
+
+    global worker_centroid_index
+    worker_centroid_index = centroid_index
+
+
+def find_chunk_matches(sequences):
+    return [worker_centroid_index.find_match(sequence) for sequence in sequences]
+
+
+def get_otu_clusters(order, otu_matches):
+
+    """
+    Groups the mapped sequence positions by OTU number, in order of abundance
+    The most abundant sequence, first in each group, represents the OTU
+    """
+
+    otu_clusters = dict()
+    for pos in order:
+        otu_nbr = otu_matches[pos]
+        if otu_nbr is not None:
+            otu_clusters.setdefault(otu_nbr, list()).append(pos)
+    return otu_clusters
+
+
+def output_mapped_otus(output_fp, otu_clusters, headers, otu_sequences):
+
+    """Writes the database sequence of each mapped OTU, under the header of its representative"""
+
+    with open(output_fp, 'w') as out_fh:
+        for otu_nbr, cluster in otu_clusters.items():
+            print('{}\n{}'.format(headers[cluster[0]], otu_sequences[otu_nbr]), file=out_fh)
+
+
+def output_reference_names(output_fp, otu_clusters, headers, otu_names):
+
+    """Writes the representative names with the database names of their OTUs, as the OTU name generator"""
+
+    with open(output_fp, 'w') as out_fh:
+        for otu_nbr, cluster in otu_clusters.items():
+            out_fh.write('{}\t{}\n'.format(kmer_clustering.get_name(headers[cluster[0]]).split(';')[0],
+                                           otu_names[otu_nbr]))
+
+
+def output_unmapped(output_fp, otu_matches, headers, sequences):
+
+    """Writes the sequences not mapped to any OTU in input order"""
+
+    with open(output_fp, 'w') as out_fh:
+        for header, sequence, otu_nbr in zip(headers, sequences, otu_matches):
+            if otu_nbr is None:
+                print('{}\n{}'.format(header, sequence), file=out_fh)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
+
+program_description = """
+Merges the OTUs mapped to the OTU database with the OTUs clustered de novo from the remaining
+sequences. The OTU FASTA files, OTU tables and cluster mappings are each concatenated, with the
+database OTUs first.
+"""
+
+
+def main():
+
+    args = parse_arguments()
+
+    otu_count = concatenate_fasta_files([args.reference_otus, args.denovo_otus], args.output_otus)
+    concatenate_files([args.reference_table, args.denovo_table], args.output_table)
+    concatenate_files([args.reference_clusters, args.denovo_clusters], args.output_clusters)
+
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, otu_count)
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('--reference_otus', required=True)
+    parser.add_argument('--reference_table', required=True)
+    parser.add_argument('--reference_clusters', required=True)
+    parser.add_argument('--denovo_otus', required=True)
+    parser.add_argument('--denovo_table', required=True)
+    parser.add_argument('--denovo_clusters', required=True)
+    parser.add_argument('--output_otus', required=True)
+    parser.add_argument('--output_table', required=True)
+    parser.add_argument('--output_clusters', required=True)
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
+    args = parser.parse_args()
+    return args
+
+
+def concatenate_files(files_fp, output_fp):
+
+    """Concatenates the target files in order"""
+
+    with open(output_fp, 'wb') as out_fh:
+        for file_fp in files_fp:
+            with open(file_fp, 'rb') as in_fh:
+                shutil.copyfileobj(in_fh, out_fh)
+
+
+def concatenate_fasta_files(files_fp, output_fp):
+
+    """Concatenates the target FASTA files in order and returns the number of entries written"""
+
+    entry_count = 0
+    with open(output_fp, 'w') as out_fh:
+        for file_fp in files_fp:
+            with open(file_fp) as in_fh:
+                for line in in_fh:
+                    if line.startswith('>'):
+                        entry_count += 1
+                    out_fh.write(line)
+    return entry_count
+
+
+if __name__ == '__main__':
+    main()
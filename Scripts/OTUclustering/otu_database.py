@@ -0,0 +1,210 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+import kmer_clustering
+
+"""
+Persistent OTU reference database, keeping OTU names stable between pipeline runs.
+
+The database is a directory holding three files:
+    - otus.fasta: The representative sequence of each OTU, with the OTU name as header
+    - kmer_index.npz: Inverted index from k-mers to the OTUs containing them, stored as sorted
+      k-mers with offsets into a single array of OTU numbers
+    - otu_database.json: The k-mer word size and the next free OTU number
+
+When the database is saved, the files are written to a temporary directory next to the database,
+which then replaces the database directory. The files of two versions of the database are
+therefore never mixed, also if a save is interrupted. If a save is interrupted while swapping the
+directories, the earlier database is restored before the database is next read.
+"""
+
+OTU_FASTA_NAME = 'otus.fasta'
+KMER_INDEX_NAME = 'kmer_index.npz'
+SETTINGS_NAME = 'otu_database.json'
+
+TEMP_DIR_SUFFIX = '.tmp'
+REPLACED_DIR_SUFFIX = '.old'
+
+OTU_BASE_NAME = 'OTU'
+OTU_NUMBER_PATTERN = re.compile(r'^{}(\d+)$'.format(OTU_BASE_NAME))
+
+
+class OtuDatabase:
+
+    def __init__(self, database_dir, word_size):
+
+        """Loads the database if it exists, otherwise starts an empty database using the given word size"""
+
+        self._database_dir = database_dir
+        self._word_size = word_size
+        self._next_otu_number = 1
+
+        self._names = list()
+        self._name_set = set()
+        self._sequences = list()
+        self._kmer_postings = dict()
+
+        recover_interrupted_save(database_dir)
+        if os.path.isfile(os.path.join(database_dir, SETTINGS_NAME)):
+            self._load()
+
+    def get_next_otu_number(self):
+        return self._next_otu_number
+
+    def get_names(self):
+        return self._names
+
+    def get_sequences(self):
+        return self._sequences
+
+    def get_centroid_index(self, identity, band, accurate):
+
+        """Returns a centroid index with the OTUs as centroids, numbered in database order"""
+
+        centroid_index = kmer_clustering.CentroidIndex(identity, self._word_size, band, accurate)
+        centroid_index.load_centroids(self._sequences, self._kmer_postings)
+        return centroid_index
+
+    def add_otu(self, name, sequence):
+
+        """Adds an OTU, unless an OTU with the same name is already present. Returns whether it was added."""
+
+        if name in self._name_set:
+            return False
+
+        otu_nbr = len(self._names)
+        self._names.append(name)
+        self._name_set.add(name)
+        self._sequences.append(sequence)
+
+        encoded = kmer_clustering.encode_sequence(sequence)
+        for kmer in kmer_clustering.get_distinct_kmers(encoded, self._word_size).tolist():
+            postings = self._kmer_postings.get(kmer)
+            if postings is None:
+                self._kmer_postings[kmer] = [otu_nbr]
+            else:
+                postings.append(otu_nbr)
+
+        self.reserve_otu_name(name)
+        return True
+
+    def reserve_otu_name(self, name):
+
+        """Makes sure a generated OTU name is never handed out again, even if the OTU isn't added"""
+
+        number_match = OTU_NUMBER_PATTERN.match(name)
+        if number_match is not None:
+            self._next_otu_number = max(self._next_otu_number, int(number_match.group(1)) + 1)
+
+    def save(self):
+
+        """Writes the database files to a temporary directory, which then replaces the database directory"""
+
+        database_dir = os.path.normpath(self._database_dir)
+        temp_dir = database_dir + TEMP_DIR_SUFFIX
+        replaced_dir = database_dir + REPLACED_DIR_SUFFIX
+
+        recover_interrupted_save(database_dir)
+        if os.path.isdir(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir)
+
+        with open(os.path.join(temp_dir, OTU_FASTA_NAME), 'w') as out_fh:
+            for name, sequence in zip(self._names, self._sequences):
+                out_fh.write('>{}\n{}\n'.format(name, sequence))
+
+        kmers = sorted(self._kmer_postings.keys())
+        posting_lengths = [len(self._kmer_postings[kmer]) for kmer in kmers]
+        offsets = np.concatenate(([0], np.cumsum(posting_lengths, dtype=np.int64)))
+        otu_numbers = np.fromiter((otu_nbr for kmer in kmers for otu_nbr in self._kmer_postings[kmer]),
+                                  dtype=np.int64, count=int(offsets[-1]))
+
+        with open(os.path.join(temp_dir, KMER_INDEX_NAME), 'wb') as out_fh:
+            np.savez(out_fh, kmers=np.array(kmers, dtype=np.int64), offsets=offsets, otu_numbers=otu_numbers)
+
+        with open(os.path.join(temp_dir, SETTINGS_NAME), 'w') as out_fh:
+            json.dump({'word_size': self._word_size,
+                       'next_otu_number': self._next_otu_number,
+                       'otu_count': len(self._names)}, out_fh, indent=4)
+
+        if os.path.isdir(database_dir):
+            os.rename(database_dir, replaced_dir)
+            os.rename(temp_dir, database_dir)
+            shutil.rmtree(replaced_dir)
+        else:
+            os.rename(temp_dir, database_dir)
+
+    def _load(self):
+
+        with open(os.path.join(self._database_dir, SETTINGS_NAME)) as in_fh:
+            settings = json.load(in_fh)
+        self._word_size = settings['word_size']
+        self._next_otu_number = settings['next_otu_number']
+
+        headers, self._sequences = kmer_clustering.read_fasta(os.path.join(self._database_dir, OTU_FASTA_NAME))
+        self._names = [header[1:] for header in headers]
+        self._name_set = set(self._names)
+
+        with np.load(os.path.join(self._database_dir, KMER_INDEX_NAME)) as kmer_index:
+            kmers = kmer_index['kmers'].tolist()
+            offsets = kmer_index['offsets'].tolist()
+            otu_numbers = kmer_index['otu_numbers'].tolist()
+
+        self._kmer_postings = {kmers[pos]: otu_numbers[offsets[pos]:offsets[pos + 1]] for pos in range(len(kmers))}
+
+
+def get_next_otu_number(database_dir):
+
+    """Reads the next free OTU number without loading the database, starting from one for a new database"""
+
+    recover_interrupted_save(database_dir)
+    settings_fp = os.path.join(database_dir, SETTINGS_NAME)
+    if not os.path.isfile(settings_fp):
+        return 1
+
+    with open(settings_fp) as in_fh:
+        return json.load(in_fh)['next_otu_number']
+
+
+def recover_interrupted_save(database_dir):
+
+    """
+    Restores the earlier database if a save was interrupted after it was moved aside, and
+    removes it if the save was interrupted after the new database was moved into place
+    """
+
+    database_dir = os.path.normpath(database_dir)
+    replaced_dir = database_dir + REPLACED_DIR_SUFFIX
+    if not os.path.isdir(replaced_dir):
+        return
+
+    if os.path.isdir(database_dir):
+        shutil.rmtree(replaced_dir)
+    else:
+        os.rename(replaced_dir, database_dir)
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import cdhit_clusters
+import generate_otu_names
+import otu_database
+import record_stats
+
+program_description = """
+Post-processes clustered OTUs in a single pass, replacing the separate CD-HIT parsing,
+OTU naming, abundance filtering and renaming steps
+
+The OTU counts are read into a cluster table, either by parsing the CD-HIT cluster file
+(writing the cluster mapping in the same pass) or from an existing OTU table. All OTUs in the
+OTU FASTA are then given new names, and the OTUs with counts at or above the threshold are
+written renamed to the output FASTA and OTU table.
+"""
+
+
+def main():
+
+    args = parse_arguments()
+
+    if args.clusters is not None:
+        if args.cluster_mapping is None:
+            raise ValueError('A cluster mapping output (--cluster_mapping) is needed when parsing CD-HIT clusters')
+        cluster_table = parse_cdhit_clusters(args.clusters, args.cluster_mapping)
+        if args.raw_stats is not None:
+            record_stats.write_stats(args.raw_stats, len(cluster_table))
+    else:
+        cluster_table = read_otu_table(args.table)
+
+    first_number = 1
+    if args.otu_database is not None:
+        first_number = otu_database.get_next_otu_number(args.otu_database)
+
+    reference_name_dict = None
+    if args.reference_names is not None:
+        reference_name_dict = generate_otu_names.get_reference_name_dict(args.reference_names)
+
+    otu_headers, otu_sequence_lines = read_otu_fasta(args.input)
+    otu_name_dict = generate_otu_names.get_otu_name_dict(otu_headers, first_number=first_number,
+                                                         reference_name_dict=reference_name_dict)
+    output_name_mapping(args.name_mapping, otu_name_dict)
+
+    otu_count = output_filtered_fasta(args.output_fasta, otu_headers, otu_sequence_lines, cluster_table,
+                                      otu_name_dict, args.threshold)
+    output_filtered_table(args.output_table, cluster_table, otu_name_dict, args.threshold)
+
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, otu_count)
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    default_filter_threshold = 10
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input', help='FASTA file with the raw OTUs', required=True)
+
+    count_source = parser.add_mutually_exclusive_group(required=True)
+    count_source.add_argument('--clusters', help='CD-HIT cluster file (.clstr) with size annotated headers')
+    count_source.add_argument('--table', help='OTU table with raw OTU headers and counts')
+
+    parser.add_argument('--cluster_mapping', help='Tab delimited file with the clustered sequences of each OTU, '
+                                                  'written when parsing CD-HIT clusters')
+    parser.add_argument('--name_mapping', help='Table mapping the raw OTU headers to new names', required=True)
+    parser.add_argument('-o', '--output_fasta', help='Abundance filtered and renamed OTU FASTA', required=True)
+    parser.add_argument('-T', '--output_table', help='Abundance filtered and renamed OTU table', required=True)
+    parser.add_argument('-t', '--threshold', help='The filter threshold', default=default_filter_threshold, type=int)
+    parser.add_argument('--otu_database', help='OTU database directory, new OTU names continue from its numbering')
+    parser.add_argument('--reference_names', help='Tab delimited map with names of OTUs already present '
+                                                  'in the OTU database')
+    parser.add_argument('--raw_stats', help='Optional JSON file where the number of parsed clusters is stored')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
+    args = parser.parse_args()
+    return args
+
+
+def parse_cdhit_clusters(clusters_fp, cluster_mapping_fp):
+
+    """
+    Parses the CD-HIT cluster file into a table from representative header to total read count,
+    in cluster order. The clustered sequences of each OTU are written to the cluster mapping,
+    representative first.
+    """
+
+    cluster_table = dict()
+    with open(cluster_mapping_fp, 'wb') as mapping_fh:
+        for record in cdhit_clusters.iterate_clusters(clusters_fp):
+            cluster_table[record.representative.decode()] = record.read_count
+            mapping_fh.write(cdhit_clusters.get_mapping_line(record))
+    return cluster_table
+
+
+def read_otu_table(table_fp):
+
+    """Reads an OTU table with lines on the format '>header\tcount' into a table from header to count"""
+
+    cluster_table = dict()
+    with open(table_fp) as in_fh:
+        for line in in_fh:
+            otu_header, count = line.rstrip()[1:].split('\t')
+            cluster_table[otu_header] = int(count)
+    return cluster_table
+
+
+def read_otu_fasta(otu_fasta_fp):
+
+    """Reads the OTU headers, without '>', together with the sequence lines of each OTU"""
+
+    otu_headers = list()
+    otu_sequence_lines = list()
+    with open(otu_fasta_fp) as in_fh:
+        for line in in_fh:
+            line = line.rstrip()
+            if line.startswith('>'):
+                otu_headers.append(line[1:])
+                otu_sequence_lines.append(list())
+            elif otu_headers:
+                otu_sequence_lines[-1].append(line)
+    return otu_headers, otu_sequence_lines
+
+
+def output_name_mapping(name_mapping_fp, otu_name_dict):
+
+    with open(name_mapping_fp, 'w') as out_fh:
+        for otu_id, new_name in otu_name_dict.items():
+            out_fh.write('{}\t{}\n'.format(otu_id, new_name))
+
+
+def output_filtered_fasta(output_fp, otu_headers, otu_sequence_lines, cluster_table, otu_name_dict, threshold):
+
+    """
+    Writes the renamed OTUs with counts at or above the threshold, in FASTA order
+    Returns the number of written OTUs
+    """
+
+    otu_count = 0
+    with open(output_fp, 'w') as out_fh:
+        for otu_header, sequence_lines in zip(otu_headers, otu_sequence_lines):
+
+            count = cluster_table.get(otu_header)
+            if count is None:
+                print('WARNING - The key {} was not present in the OTU table'.format(otu_header))
+                continue
+
+            if count >= threshold:
+                out_fh.write('>{}\n'.format(otu_name_dict[otu_header.split(';')[0]]))
+                for sequence_line in sequence_lines:
+                    out_fh.write('{}\n'.format(sequence_line))
+                otu_count += 1
+
+    return otu_count
+
+
+def output_filtered_table(output_fp, cluster_table, otu_name_dict, threshold):
+
+    """Writes the renamed OTU table with counts at or above the threshold, in table order"""
+
+    with open(output_fp, 'w') as out_fh:
+        for otu_header, count in cluster_table.items():
+            if count >= threshold:
+                out_fh.write('{}\t{}\n'.format(otu_name_dict[otu_header.split(';')[0]], count))
+
+
+if __name__ == '__main__':
+    main()
@@ -23,7 +23,15 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import re
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
 
 program_description = """Renames CD-HIT OTU table and OTU list"""
 
@@ -37,9 +45,12 @@ def main():
     args = parse_arguments()
 
     name_dict = get_name_dict(args.name_mapping)
-    output_renamed_fasta(name_dict, args.fasta, args.output_fasta)
+    otu_count = output_renamed_fasta(name_dict, args.fasta, args.output_fasta)
     output_renamed_abundancy_table(name_dict, args.table, args.output_table)
 
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, otu_count)
+
 
 def parse_arguments():
 
@@ -51,6 +62,7 @@ def parse_arguments():
     parser.add_argument('-F', '--output_fasta', required=True)
     parser.add_argument('-T', '--output_table', required=True)
     parser.add_argument('--name_mapping', help='Tab delimited map with old and new OTU names', required=True)
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
     args = parser.parse_args()
     return args
 
@@ -75,13 +87,16 @@ def output_renamed_abundancy_table(naming_dict, raw_abund_table_fp, renamed_abun
 
 def output_renamed_fasta(naming_dict, raw_fasta_fp, renamed_fasta_fp):
 
+    otu_count = 0
     with open(raw_fasta_fp) as raw_fasta_fh, open(renamed_fasta_fp, 'w') as renamed_fasta_fh:
         for line in raw_fasta_fh:
             if line.startswith('>'):
                 otu_header = line.rstrip()[1:]
                 renamed_fasta_fh.write('>{}\n'.format(naming_dict[otu_header.split(';')[0]]))
+                otu_count += 1
             else:
                 renamed_fasta_fh.write(line)
+    return otu_count
 
 
 if __name__ == "__main__":
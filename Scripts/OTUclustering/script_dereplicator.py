@@ -24,15 +24,45 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 
 import itertools
 import argparse
+import os
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import compact_dereplication
+import external_dereplication
+import record_stats
+import sharded_dereplication
 
 
 def main():
 
     args = parse_arguments()
 
-    clustered_dict = retrieve_dereplicate_dict(args.input)
-    output_dereplicated_data(clustered_dict, args.output)
-    output_cluster_file(clustered_dict, args.mapping_file)
+    if args.engine == 'compact':
+        dereplicator = compact_dereplication.dereplicate_compact(args.input)
+        dereplicator.output_dereplicated_data(args.output)
+        dereplicator.output_cluster_file(args.mapping_file)
+        unique_count = dereplicator.get_unique_count()
+    elif args.engine == 'external':
+        temp_dir = args.temp_dir if args.temp_dir is not None else os.path.dirname(os.path.abspath(args.output))
+        unique_count = external_dereplication.dereplicate_external(args.input, args.output, args.mapping_file,
+                                                                   args.partitions, processes=args.processes,
+                                                                   temp_dir=temp_dir)
+    elif args.engine == 'sharded':
+        temp_dir = args.temp_dir if args.temp_dir is not None else os.path.dirname(os.path.abspath(args.output))
+        unique_count = sharded_dereplication.dereplicate_sharded(args.input, args.output, args.mapping_file,
+                                                                 args.processes, temp_dir=temp_dir)
+    else:
+        clustered_dict = retrieve_dereplicate_dict(args.input)
+        output_dereplicated_data(clustered_dict, args.output)
+        output_cluster_file(clustered_dict, args.mapping_file)
+        unique_count = len(clustered_dict)
+
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, unique_count)
 
 
 def parse_arguments():
@@ -41,6 +71,19 @@ def parse_arguments():
     parser.add_argument('-i', '--input')
     parser.add_argument('-o', '--output')
     parser.add_argument('-m', '--mapping_file')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
+    parser.add_argument('--engine', help='The compact engine stores sequences and headers in packed form, '
+                                         'using a fraction of the memory for the same output. '
+                                         'The external engine partitions the reads on disk, only holding '
+                                         'one partition in memory at a time. '
+                                         'The sharded engine parses and dereplicates the reads in parallel, '
+                                         'with each process owning a range of sequence hashes',
+                        choices=['default', 'compact', 'external', 'sharded'], default='default')
+    parser.add_argument('--partitions', help='Number of partitions used by the external engine',
+                        type=int, default=64)
+    parser.add_argument('--processes', help='Number of processes used by the external and sharded engines',
+                        type=int, default=1)
+    parser.add_argument('--temp_dir', help='Directory for the partition and shard files, defaults to the output directory')
     return parser.parse_args()
 
 
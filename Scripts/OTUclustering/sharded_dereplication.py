@@ -0,0 +1,185 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import shutil
+import tempfile
+from concurrent import futures
+
+import external_dereplication
+
+"""
+Multi-process dereplication, producing the same output as the dictionary based dereplication
+in script_dereplicator.
+
+The work is split in two parallel phases. First, the input file is split into byte ranges at
+FASTA entry boundaries, and one worker per range parses its reads and writes each of them to
+the shard owning the hash of its sequence. Second, one worker per shard collects the reads of
+its shard from all ranges and dereplicates them, writing sorted runs in the same way as the
+external engine. The runs are finally merged in the main process, giving a deterministic output
+independent of the number of workers.
+
+The reads are identified by the byte offset of their entry in the input file, which orders
+the reads in the same way as their position in the input without needing a global count.
+"""
+
+
+def dereplicate_sharded(input_fp, derep_fp, mapping_fp, processes, temp_dir=None):
+
+    """Dereplicates the reads using one parse and one shard worker per process, returns the number of unique sequences"""
+
+    spill_dir = tempfile.mkdtemp(prefix='derep_', dir=temp_dir)
+
+    try:
+        byte_ranges = get_entry_byte_ranges(input_fp, processes)
+        range_spill_fps = [[os.path.join(spill_dir, 'range_{}_shard_{}'.format(range_nbr, shard))
+                            for shard in range(processes)]
+                           for range_nbr in range(len(byte_ranges))]
+        shard_spill_fps = [[spill_fps[shard] for spill_fps in range_spill_fps] for shard in range(processes)]
+
+        derep_run_fps = [os.path.join(spill_dir, 'shard_{}.derep'.format(shard)) for shard in range(processes)]
+        mapping_run_fps = [os.path.join(spill_dir, 'shard_{}.mapping'.format(shard)) for shard in range(processes)]
+
+        with futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            list(executor.map(spill_byte_range, [input_fp] * len(byte_ranges), byte_ranges, range_spill_fps))
+            unique_counts = list(executor.map(dereplicate_shard, shard_spill_fps, derep_run_fps, mapping_run_fps))
+
+        external_dereplication.merge_derep_runs(derep_run_fps, derep_fp)
+        external_dereplication.merge_mapping_runs(mapping_run_fps, mapping_fp)
+    finally:
+        shutil.rmtree(spill_dir)
+
+    return sum(unique_counts)
+
+
+def get_entry_byte_ranges(input_fp, range_count):
+
+    """
+    Splits the file into byte ranges of roughly equal size, each starting at a FASTA header line
+    Returns a list of (start, end) tuples, with fewer ranges than requested for small files
+    """
+
+    file_size = os.path.getsize(input_fp)
+    boundaries = [0]
+
+    with open(input_fp, 'rb') as in_fh:
+        for range_nbr in range(1, range_count):
+            position = max(file_size * range_nbr // range_count, boundaries[-1])
+            in_fh.seek(position)
+            if position > 0:
+                # Skip the partial line, unless the position is at the start of a line
+                in_fh.seek(position - 1)
+                in_fh.readline()
+
+            # The range starts at the first header following a sequence line, so that a group
+            # of consecutive headers is never split
+            seen_sequence = False
+            position = in_fh.tell()
+            line = in_fh.readline()
+            while line != b'' and not (seen_sequence and line.startswith(b'>')):
+                seen_sequence = not line.startswith(b'>')
+                position = in_fh.tell()
+                line = in_fh.readline()
+
+            if line == b'':
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+
+    boundaries.append(file_size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def read_byte_range_entries(in_fh, start, end):
+
+    """
+    Yields the byte offset, header and sequence of each FASTA entry starting within the byte range
+    Lines are grouped and stripped in the same way as the default engine
+    """
+
+    in_fh.seek(start)
+    position = start
+
+    head = None
+    head_position = start
+    seq_lines = list()
+    previous_is_head = False
+
+    while position < end:
+        line = in_fh.readline().decode()
+        if line.endswith('\r\n'):
+            line = line[:-2] + '\n'
+
+        is_head = line.startswith('>')
+        if is_head and not previous_is_head:
+            if len(seq_lines) > 0:
+                yield head_position, head, ''.join(seq_lines).rstrip()
+                seq_lines = list()
+            head = line.rstrip()
+            head_position = position
+        elif not is_head:
+            seq_lines.append(line)
+
+        previous_is_head = is_head
+        position = in_fh.tell()
+
+    if len(seq_lines) > 0:
+        yield head_position, head, ''.join(seq_lines).rstrip()
+
+
+def spill_byte_range(input_fp, byte_range, shard_spill_fps):
+
+    """Writes each read in the byte range with its byte offset to the shard of its sequence"""
+
+    spill_fhs = [open(spill_fp, 'wb', buffering=external_dereplication.SPILL_BUFFER_SIZE)
+                 for spill_fp in shard_spill_fps]
+
+    try:
+        with open(input_fp, 'rb') as in_fh:
+            for offset, head, seq in read_byte_range_entries(in_fh, *byte_range):
+                spill_fh = spill_fhs[external_dereplication.get_partition(seq, len(shard_spill_fps))]
+                external_dereplication.write_record(spill_fh, [str(offset), head, seq])
+    finally:
+        for spill_fh in spill_fhs:
+            spill_fh.close()
+
+
+def dereplicate_shard(spill_fps, derep_run_fp, mapping_run_fp):
+
+    """
+    Dereplicates the reads of a shard, read from the spill files of all byte ranges in input order
+    Returns the number of unique sequences in the shard
+    """
+
+    clustered_dict = dict()
+
+    for spill_fp in spill_fps:
+        with open(spill_fp, 'rb', buffering=external_dereplication.SPILL_BUFFER_SIZE) as in_fh:
+            for offset, head, seq in external_dereplication.read_records(in_fh, external_dereplication.READ_FIELDS):
+                cluster = clustered_dict.get(seq)
+                if cluster is None:
+                    clustered_dict[seq] = [offset, head]
+                else:
+                    cluster.append(head)
+
+    external_dereplication.write_partition_runs(clustered_dict, derep_run_fp, mapping_run_fp)
+    return len(clustered_dict)
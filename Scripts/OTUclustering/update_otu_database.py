@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+
+import kmer_clustering
+import otu_database
+
+program_description = """
+Adds the final OTUs of a run to the persistent OTU database, creating the database if needed
+
+OTUs already present in the database are skipped. All names handed out in the run's OTU name
+mapping are reserved, also for OTUs removed by filtering, so that an OTU name always refers to
+the same sequence across runs.
+"""
+
+
+def main():
+
+    args = parse_arguments()
+
+    database = otu_database.OtuDatabase(args.database, args.word_size)
+
+    headers, sequences = kmer_clustering.read_fasta(args.otus)
+    added_count = 0
+    for header, sequence in zip(headers, sequences):
+        if database.add_otu(header[1:], sequence):
+            added_count += 1
+
+    with open(args.name_mapping) as in_fh:
+        for line in in_fh:
+            database.reserve_otu_name(line.rstrip().split('\t')[1])
+
+    database.save()
+    print('Added {} OTUs to the OTU database, now containing {} OTUs'.format(added_count, len(database.get_names())))
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-d', '--database', help='OTU database directory', required=True)
+    parser.add_argument('-i', '--otus', help='FASTA with the final, renamed OTUs', required=True)
+    parser.add_argument('--name_mapping', help='OTU name mapping table of the run', required=True)
+    parser.add_argument('-n', '--word_size', help='K-mer length used when creating a new database',
+                        type=int, default=8)
+    args = parser.parse_args()
+    return args
+
+
+if __name__ == '__main__':
+    main()
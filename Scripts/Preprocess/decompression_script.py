@@ -24,14 +24,18 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 
 import argparse
 import gzip
+import shutil
 import tarfile
 
 program_description = """
 Script able to decompress to .tar.gz and .gz-files
 Takes a string with full compressed file paths as input, and decompress them into
 the target output_base directory
+The .gz-files are decompressed in chunks, using constant memory
 """
 
+DECOMPRESSION_BUFFER_SIZE = 16 * 1024 * 1024
+
 
 def main():
 
@@ -39,7 +43,7 @@ def main():
     if args.decompression_mode == 'gz':
         extract_gz_file(args.input, args.output_base, args.delimiter)
     elif args.decompression_mode == 'targz':
-        extract_tar_gz_archive(args.input, args.output)
+        extract_tar_gz_archive(args.input, args.output_base)
     else:
         raise ValueError('Unknown decompression mode encountered')
 
@@ -59,16 +63,20 @@ def parse_arguments():
 
 def extract_gz_file(input_line, output_base, delim):
 
-    """Takes a .gz file and decompress it into provided output filepath"""
+    """Takes .gz files and decompress them into the output base directory"""
 
     multiple_gz_input_fp = input_line.split(delim)
-
     for input_gz_fp in multiple_gz_input_fp:
+        output_fp = output_base + '.'.join(input_gz_fp.split('/')[-1].split('.')[:-1])
+        extract_single_gz_file(input_gz_fp, output_fp)
+
+
+def extract_single_gz_file(input_gz_fp, output_fp):
+
+    """Decompresses a single .gz file in chunks, keeping memory usage constant regardless of file size"""
 
-        with gzip.open(input_gz_fp, 'rb') as file_in:
-            content = file_in.read()
-            with open(output_base + '.'.join(input_gz_fp.split('/')[-1].split('.')[:-1]), 'wb') as file_out:
-                file_out.write(content)
+    with gzip.open(input_gz_fp, 'rb') as file_in, open(output_fp, 'wb') as file_out:
+        shutil.copyfileobj(file_in, file_out, DECOMPRESSION_BUFFER_SIZE)
 
 
 def extract_tar_gz_archive(input_archive, output_folder):
@@ -23,24 +23,45 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import gzip
+import os
+import shutil
+import sys
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import record_stats
 
 program_description = """
 Merges an arbitrary number of FASTA files after appending labels
 to the header of respective FASTA file
+Gzipped input files can be labelled directly, and already labelled files
+can be concatenated without being parsed
 """
 
+CONCATENATION_BUFFER_SIZE = 16 * 1024 * 1024
+
 
 def main():
 
     args = parse_arguments()
     input_files = args.input_files.split(args.delim)
 
+    if args.concatenate:
+        concatenate_files(input_files, args.output)
+        return
+
     labels = None
     if args.labels is not None:
         labels = args.labels.split(args.delim)
         assert len(input_files) == len(labels), 'Must use same number of labels as files! Labels: {}'.format(labels)
 
-    merge_files(input_files, args.output, labels=labels)
+    read_count = merge_files(input_files, args.output, labels=labels, gzipped_input=args.gzipped_input)
+
+    if args.stats is not None:
+        record_stats.write_stats(args.stats, read_count)
 
 
 def parse_arguments():
@@ -55,13 +76,23 @@ def parse_arguments():
                         help='Accepts labels divided by tabs, must be same length as input files string')
     parser.add_argument('-o', '--output', required=True)
     parser.add_argument('--delim', help='File/label separator', default=',')
+    parser.add_argument('--gzipped_input', help='Decompresses the input files while labelling', action='store_true')
+    parser.add_argument('--concatenate', help='Concatenates the input files as they are, without labelling',
+                        action='store_true')
+    parser.add_argument('--stats', help='Optional JSON file where the number of written records is stored')
     args = parser.parse_args()
     return args
 
 
-def merge_files(files_fp, output_fp, labels=None):
+def merge_files(files_fp, output_fp, labels=None, gzipped_input=False):
+
+    """
+    Merges the target files, attaching either preset or default labels to the header lines
+    Returns the number of merged FASTQ entries
+    """
 
-    """Merges the target files, attaching either preset or default labels to the header lines"""
+    open_input = gzip.open if gzipped_input else open
+    total_line_count = 0
 
     with open(output_fp, 'w') as out_fh:
         for n in range(len(files_fp)):
@@ -72,7 +103,7 @@ def merge_files(files_fp, output_fp, labels=None):
             else:
                 label = labels[n]
 
-            with open(fastq_file) as in_fh:
+            with open_input(fastq_file, 'rt') as in_fh:
                 line_nbr = 1
                 for line in in_fh:
 
@@ -86,6 +117,20 @@ def merge_files(files_fp, output_fp, labels=None):
                     out_fh.write(line)
                     line_nbr += 1
 
+            total_line_count += line_nbr - 1
+
+    return total_line_count // 4
+
+
+def concatenate_files(files_fp, output_fp):
+
+    """Concatenates the target files in order, copying them in chunks"""
+
+    with open(output_fp, 'wb') as out_fh:
+        for file_fp in files_fp:
+            with open(file_fp, 'rb') as in_fh:
+                shutil.copyfileobj(in_fh, out_fh, CONCATENATION_BUFFER_SIZE)
+
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import collections
+import itertools
+import sys
+from concurrent import futures
+
+import numpy as np
+
+program_description = """
+Quality trims and filters FASTQ reads, performing the same filtering as the Prinseq options
+-trim_qual_left, -trim_qual_right, -min_len, -min_qual_mean and -ns_max_p
+
+Reads are processed in large chunks, where the quality strings of all reads in the chunk
+are decoded into a single NumPy array and trimmed and filtered without looping over bases.
+Chunks can be processed in parallel using multiple processes, the output order is kept.
+Only a few chunks per process are read ahead, so memory use doesn't grow with the input size.
+Input and output can be given as '-' to read from stdin and write to stdout.
+"""
+
+PHRED_OFFSET = 33
+CHUNK_READS = 100000
+FASTQ_ENTRY_LINES = 4
+CHUNKS_IN_FLIGHT_PER_PROCESS = 2
+
+
+def main():
+
+    args = parse_arguments()
+
+    in_fh = sys.stdin if args.input == '-' else open(args.input)
+    out_fh = sys.stdout if args.output == '-' else open(args.output, 'w')
+
+    filter_settings = (args.trim_qual, args.min_len, args.min_qual_mean, args.ns_max_p)
+    chunks = read_fastq_chunks(in_fh, CHUNK_READS)
+
+    if args.processes > 1:
+        filter_chunks_parallel(chunks, filter_settings, out_fh, args.processes)
+    else:
+        for chunk in chunks:
+            out_fh.write(filter_chunk(chunk, filter_settings))
+
+    if in_fh is not sys.stdin:
+        in_fh.close()
+    if out_fh is not sys.stdout:
+        out_fh.close()
+
+
+def parse_arguments():
+
+    """Parses command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input', help='Input FASTQ file, or - for stdin', required=True)
+    parser.add_argument('-o', '--output', help='Output FASTQ file with the passing reads, or - for stdout',
+                        required=True)
+    parser.add_argument('--trim_qual', help='Trims bases with lower quality from both ends', type=int, required=True)
+    parser.add_argument('--min_len', help='Filters reads shorter than this after trimming', type=int, required=True)
+    parser.add_argument('--min_qual_mean', help='Filters reads with lower mean quality', type=int, required=True)
+    parser.add_argument('--ns_max_p', help='Filters reads with a higher percentage of Ns', type=int, required=True)
+    parser.add_argument('-p', '--processes', help='Number of processes filtering chunks in parallel',
+                        type=int, default=1)
+    args = parser.parse_args()
+    return args
+
+
+def filter_chunks_parallel(chunks, filter_settings, out_fh, processes):
+
+    """
+    Filters the chunks in a process pool, writing the filtered chunks in input order
+    A new chunk is only read when the oldest submitted chunk is written, keeping a bounded
+    number of chunks in flight
+    """
+
+    max_in_flight = CHUNKS_IN_FLIGHT_PER_PROCESS * processes
+    with futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        in_flight = collections.deque()
+        for chunk in chunks:
+            if len(in_flight) == max_in_flight:
+                out_fh.write(in_flight.popleft().result())
+            in_flight.append(executor.submit(filter_chunk, chunk, filter_settings))
+
+        while len(in_flight) > 0:
+            out_fh.write(in_flight.popleft().result())
+
+
+def read_fastq_chunks(in_fh, chunk_reads):
+
+    """Yields chunks of reads as tuples with lists of headers, sequences and quality strings"""
+
+    while True:
+        lines = list(itertools.islice(in_fh, chunk_reads * FASTQ_ENTRY_LINES))
+        if len(lines) == 0:
+            break
+
+        headers = [line.rstrip('\r\n') for line in lines[0::FASTQ_ENTRY_LINES]]
+        sequences = [line.rstrip('\r\n') for line in lines[1::FASTQ_ENTRY_LINES]]
+        qualities = [line.rstrip('\r\n') for line in lines[3::FASTQ_ENTRY_LINES]]
+        yield headers, sequences, qualities
+
+
+def filter_chunk(chunk, filter_settings):
+
+    """Trims and filters a chunk of reads, returning the passing reads as FASTQ text"""
+
+    headers, sequences, qualities = chunk
+    trim_qual, min_len, min_qual_mean, ns_max_p = filter_settings
+
+    starts, ends, passing = get_trimmed_passing_reads(sequences, qualities, trim_qual, min_len,
+                                                      min_qual_mean, ns_max_p)
+
+    output_lines = list()
+    for pos in np.flatnonzero(passing):
+        start = starts[pos]
+        end = ends[pos]
+        output_lines.append('{}\n{}\n+\n{}\n'.format(headers[pos], sequences[pos][start:end],
+                                                     qualities[pos][start:end]))
+    return ''.join(output_lines)
+
+
+def get_trimmed_passing_reads(sequences, qualities, trim_qual, min_len, min_qual_mean, ns_max_p):
+
+    """
+    Calculates the trimmed region of each read, and whether the trimmed read passes the filters
+    Returns arrays with trimmed start and end positions within each read, and a boolean pass array
+
+    Bases are trimmed from each end as long as their quality is below trim_qual.
+    The trimmed reads are then required to be at least min_len long, to have a mean quality
+    of at least min_qual_mean, and to contain at most ns_max_p percent Ns.
+    """
+
+    lengths = np.array([len(quality) for quality in qualities], dtype=np.int64)
+    read_starts = np.zeros(len(lengths), dtype=np.int64)
+    read_starts[1:] = np.cumsum(lengths)[:-1]
+
+    flat_quals = np.frombuffer(''.join(qualities).encode('ascii'), dtype=np.uint8).astype(np.int64) - PHRED_OFFSET
+    flat_bases = np.frombuffer(''.join(sequences).encode('ascii'), dtype=np.uint8)
+    positions = np.arange(len(flat_quals), dtype=np.int64)
+    above_trim = flat_quals >= trim_qual
+
+    # First and last base above the trimming threshold within each read
+    non_empty = lengths > 0
+    first_kept = np.full(len(lengths), len(flat_quals), dtype=np.int64)
+    last_kept = np.full(len(lengths), -1, dtype=np.int64)
+    if len(flat_quals) > 0:
+        reduce_starts = read_starts[non_empty]
+        first_kept[non_empty] = np.minimum.reduceat(np.where(above_trim, positions, len(flat_quals)), reduce_starts)
+        last_kept[non_empty] = np.maximum.reduceat(np.where(above_trim, positions, -1), reduce_starts)
+
+    has_kept = non_empty & (last_kept >= first_kept)
+    trimmed_starts = np.where(has_kept, first_kept, read_starts)
+    trimmed_ends = np.where(has_kept, last_kept + 1, read_starts)
+    trimmed_lengths = trimmed_ends - trimmed_starts
+
+    # Quality sums and N counts over the trimmed regions
+    quality_cumsum = np.concatenate(([0], np.cumsum(flat_quals)))
+    n_cumsum = np.concatenate(([0], np.cumsum((flat_bases == ord('N')) | (flat_bases == ord('n')))))
+    quality_sums = quality_cumsum[trimmed_ends] - quality_cumsum[trimmed_starts]
+    n_counts = n_cumsum[trimmed_ends] - n_cumsum[trimmed_starts]
+
+    passing = (trimmed_lengths >= min_len) \
+        & (trimmed_lengths > 0) \
+        & (quality_sums >= min_qual_mean * trimmed_lengths) \
+        & (n_counts * 100 <= ns_max_p * trimmed_lengths)
+
+    return trimmed_starts - read_starts, trimmed_ends - read_starts, passing
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import gzip
+import json
+import queue
+import re
+import subprocess
+import sys
+import threading
+
+program_description = """
+Streams gzipped FASTQ samples through decompression, labelling, quality filtering and
+FASTQ to FASTA conversion without writing any intermediate files.
+
+The reads are decompressed and labelled in the same way as the merge script, piped into
+Prinseq or the built-in quality filter, and the reads passing the filter are written as FASTA with the
+sample label extracted into the header, as done by the FASTQ to FASTA script.
+The number of reads in each sample, and the number passing the filter, are written
+to a JSON statistics file.
+"""
+
+SPLITTER_PATTERN = r'( |\|)'
+FASTQ_ENTRY_LINES = 4
+
+
+def main():
+
+    args = parse_arguments()
+    input_files = args.input_files.split(args.delim)
+
+    labels = None
+    if args.labels is not None:
+        labels = args.labels.split(args.delim)
+        assert len(input_files) == len(labels), 'Must use same number of labels as files! Labels: {}'.format(labels)
+
+    if args.qc_engine == 'native':
+        qc_command = get_native_qc_stream_command(args.quality_filter, args.trim_qual, args.min_len,
+                                                  args.min_qual_mean, args.ns_max_p, args.processes)
+    else:
+        qc_command = get_prinseq_stream_command(args.prinseq, args.trim_qual, args.min_len,
+                                                args.min_qual_mean, args.ns_max_p)
+
+    input_counts, filtered_count = stream_reads(input_files, labels, qc_command, args.output)
+    write_stream_stats(args.stats, input_counts, filtered_count)
+
+
+def parse_arguments():
+
+    """Parses command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--input_files', help='Gzipped FASTQ files divided by the delimiter', required=True)
+    parser.add_argument('-l', '--labels', help='Labels divided by the delimiter, must be same length as input files')
+    parser.add_argument('-o', '--output', help='FASTA file with the reads passing the quality filter', required=True)
+    parser.add_argument('-s', '--stats', help='JSON file with read counts', required=True)
+    parser.add_argument('--qc_engine', help='Program performing the quality filtering',
+                        choices=['prinseq', 'native'], default='prinseq')
+    parser.add_argument('--prinseq', help='Path to the Prinseq program')
+    parser.add_argument('--quality_filter', help='Path to the built-in quality filter script')
+    parser.add_argument('--trim_qual', type=int, required=True)
+    parser.add_argument('--min_len', type=int, required=True)
+    parser.add_argument('--min_qual_mean', type=int, required=True)
+    parser.add_argument('--ns_max_p', type=int, required=True)
+    parser.add_argument('-p', '--processes', help='Number of processes used by the built-in quality filter',
+                        type=int, default=1)
+    parser.add_argument('--delim', help='File/label separator', default=',')
+    args = parser.parse_args()
+    return args
+
+
+def get_prinseq_stream_command(prinseq_fp, trim_qual, min_len, min_qual_mean, ns_max_p):
+
+    """Prinseq command reading FASTQ from stdin, writing the good reads to stdout and discarding the bad reads"""
+
+    return [prinseq_fp,
+            '-fastq', 'stdin',
+            '-out_good', 'stdout',
+            '-out_bad', 'null',
+            '-trim_qual_left', str(trim_qual), '-trim_qual_right', str(trim_qual),
+            '-min_len', str(min_len),
+            '-min_qual_mean', str(min_qual_mean),
+            '-ns_max_p', str(ns_max_p)]
+
+
+def get_native_qc_stream_command(quality_filter_fp, trim_qual, min_len, min_qual_mean, ns_max_p, processes=1):
+
+    """Built-in quality filter command reading FASTQ from stdin and writing the good reads to stdout"""
+
+    return [sys.executable, quality_filter_fp,
+            '--input', '-',
+            '--output', '-',
+            '--trim_qual', str(trim_qual),
+            '--min_len', str(min_len),
+            '--min_qual_mean', str(min_qual_mean),
+            '--ns_max_p', str(ns_max_p),
+            '--processes', str(processes)]
+
+
+def stream_reads(files_fp, labels, qc_command, output_fp):
+
+    """
+    Feeds the labelled reads to the quality filter in a separate thread, while the filtered reads
+    are converted to FASTA as they arrive
+    Returns the read count for each input file and the number of reads passing the filter
+
+    An exception in the feeder thread is passed back through a queue and raised here, as the
+    quality filter otherwise finishes normally on the truncated input. A broken pipe is only the
+    consequence of the quality filter exiting, which is then reported instead.
+    """
+
+    process = subprocess.Popen(qc_command, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               universal_newlines=True)
+
+    input_counts = [0] * len(files_fp)
+    feeder_errors = queue.Queue()
+    feeder = threading.Thread(target=run_feeder, args=(feeder_errors, files_fp, labels, process.stdin, input_counts))
+    feeder.start()
+
+    with open(output_fp, 'w') as out_fh:
+        filtered_count = write_fasta_entries(process.stdout, out_fh)
+
+    feeder.join()
+    feeder_error = feeder_errors.get()
+    returncode = process.wait()
+
+    if feeder_error is not None and not (isinstance(feeder_error, BrokenPipeError) and returncode != 0):
+        raise feeder_error
+    if returncode != 0:
+        raise RuntimeError('Quality filter exited with status {}'.format(returncode))
+
+    return input_counts, filtered_count
+
+
+def run_feeder(feeder_errors, *feeder_args):
+
+    """Feeds the labelled reads, putting the raised exception, or None on success, on the queue"""
+
+    try:
+        feed_labelled_reads(*feeder_args)
+    except Exception as error:
+        feeder_errors.put(error)
+    else:
+        feeder_errors.put(None)
+
+
+def feed_labelled_reads(files_fp, labels, out_fh, input_counts):
+
+    """Decompresses the input files, attaching the label of each file to its FASTQ headers"""
+
+    try:
+        for n in range(len(files_fp)):
+
+            label = get_label(labels, n)
+
+            with gzip.open(files_fp[n], 'rt') as in_fh:
+                line_nbr = 0
+                for line in in_fh:
+
+                    if line_nbr % FASTQ_ENTRY_LINES == 0:
+                        line = line.rstrip()
+                        if len(line) > 1:  # Prevent adding labels to empty lines
+                            line = line + '|{}\n'.format(label)
+                        else:
+                            line += '\n'
+
+                    out_fh.write(line)
+                    line_nbr += 1
+
+            input_counts[n] = line_nbr // FASTQ_ENTRY_LINES
+    finally:
+        out_fh.close()
+
+
+def write_fasta_entries(fastq_fh, out_fh):
+
+    """Writes FASTQ entries as FASTA, with the label moved into the header. Returns the entry count."""
+
+    entry_count = 0
+    line_nbr = 0
+    for line in fastq_fh:
+
+        if line_nbr % FASTQ_ENTRY_LINES == 0:
+            print('>' + get_label_extract_name(line.rstrip()[1:]), file=out_fh)
+            entry_count += 1
+        elif line_nbr % FASTQ_ENTRY_LINES == 1:
+            print(line.rstrip(), file=out_fh)
+        line_nbr += 1
+
+    return entry_count
+
+
+def get_label(labels, file_nbr):
+
+    """Retrieves the label for an input file, falling back to a default label"""
+
+    if labels is None or labels[file_nbr] == '':
+        return 'sample{}'.format(file_nbr + 1)
+    else:
+        return labels[file_nbr]
+
+
+def get_label_extract_name(fasta_header):
+
+    """Extracts added label on format '|label' from end"""
+
+    pipe_splits = fasta_header.split('|')
+    assert len(pipe_splits) >= 2, 'Unable to extract label if no label is marked!'
+
+    truncated_splits = re.split(SPLITTER_PATTERN, fasta_header)
+
+    return '{};label={}'.format(truncated_splits[0], pipe_splits[-1])
+
+
+def write_stream_stats(stats_fp, input_counts, filtered_count):
+
+    """Writes the read counts collected while streaming, with the reads passing the filter as the record count"""
+
+    stats = {
+        'records': filtered_count,
+        'sample_records': input_counts
+    }
+
+    with open(stats_fp, 'w') as out_fh:
+        json.dump(stats, out_fh, indent=4)
+
+
+if __name__ == '__main__':
+    main()
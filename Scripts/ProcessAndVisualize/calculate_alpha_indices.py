@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import otu_table
+
+program_description = """
+Calculates a table of alpha diversity indices for each sample of an OTU table
+
+All samples are processed together from the non-zero cells of the table, each index being
+summed per sample in one vectorized pass. The indices follow the default definitions of
+scikit-bio, except that Shannon entropy uses the natural logarithm:
+    - observed_otus: Number of OTUs with reads in the sample
+    - chao1: Bias-corrected Chao1 richness estimate
+    - ace: Abundance-based coverage estimator, with OTUs of at most 10 reads counted as rare
+    - shannon: Shannon entropy, -sum(p * ln(p))
+    - simpson: Gini-Simpson index, 1 - sum(p^2)
+    - pielou_evenness: Shannon entropy divided by ln(observed_otus)
+    - goods_coverage: Good's coverage, 1 - singletons / reads
+Indices that are undefined for a sample, such as ACE when all rare OTUs are singletons or
+evenness for samples with less than two OTUs, are written as NA.
+"""
+
+ACE_RARE_THRESHOLD = 10
+INDEX_COLUMNS = ['reads', 'observed_otus', 'chao1', 'ace', 'shannon', 'simpson', 'pielou_evenness',
+                 'goods_coverage']
+MISSING_VALUE = 'NA'
+
+
+def main():
+
+    args = parse_arguments()
+    sample_table = otu_table.read_table(args.otu_table)
+    index_dict = calculate_indices(sample_table)
+    write_index_table(args.output, sample_table.get_sample_names(), index_dict)
+
+
+def parse_arguments():
+
+    """Parses the command line arguments"""
+
+    parser = argparse.ArgumentParser(description=program_description)
+    parser.add_argument('-i', '--otu_table', required=True,
+                        help='Matrix with OTU/sample counts, tab separated or in the binary OTU table format')
+    parser.add_argument('-o', '--output', required=True, help='Tab separated table with the indices of each sample')
+    args = parser.parse_args()
+    return args
+
+
+def calculate_indices(sample_table):
+
+    """
+    Calculates the alpha diversity indices of all samples
+    Returns a dictionary from index name to an array with one value per sample, NaN when undefined
+    """
+
+    _, sample_indices, counts = sample_table.get_cells()
+    sample_count = sample_table.get_shape()[1]
+
+    def sum_per_sample(weights=None):
+        return np.bincount(sample_indices, weights=weights, minlength=sample_count)
+
+    reads = sample_table.get_sample_totals()
+    observed = sum_per_sample()
+    singletons = sum_per_sample(counts == 1)
+    doubletons = sum_per_sample(counts == 2)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+
+        proportions = counts / reads[sample_indices]
+        shannon = -sum_per_sample(proportions * np.log(proportions))
+        simpson = 1 - sum_per_sample(proportions ** 2)
+
+        is_rare = counts <= ACE_RARE_THRESHOLD
+        ace = get_ace(observed, singletons, sum_per_sample(is_rare), sum_per_sample(counts * is_rare),
+                      sum_per_sample(counts * (counts - 1.0) * is_rare))
+
+        index_dict = {
+            'reads': reads,
+            'observed_otus': observed,
+            'chao1': observed + singletons * (singletons - 1) / (2.0 * (doubletons + 1)),
+            'ace': ace,
+            'shannon': np.where(reads > 0, shannon, np.nan),
+            'simpson': np.where(reads > 0, simpson, np.nan),
+            'pielou_evenness': np.where(observed > 1, shannon / np.log(observed), np.nan),
+            'goods_coverage': 1 - singletons / reads
+        }
+
+    return index_dict
+
+
+def get_ace(observed, singletons, rare_otus, rare_reads, rare_pair_sum):
+
+    """
+    The ACE estimate of each sample, from the number of rare OTUs, the reads in rare OTUs and the
+    sum of count * (count - 1) over rare OTUs. NaN when all rare OTUs are singletons.
+    """
+
+    abundant_otus = observed - rare_otus
+    coverage = 1 - singletons / rare_reads
+    gamma = np.maximum(rare_otus * rare_pair_sum / (coverage * rare_reads * (rare_reads - 1)) - 1, 0)
+    ace = abundant_otus + rare_otus / coverage + singletons / coverage * gamma
+
+    ace = np.where(rare_otus == 0, abundant_otus, ace)
+    return np.where((singletons > 0) & (singletons == rare_otus), np.nan, ace)
+
+
+def write_index_table(output_fp, sample_names, index_dict):
+
+    """Writes one line per sample with its indices, undefined values written as NA"""
+
+    with open(output_fp, 'w') as out_fh:
+        out_fh.write('{}\n'.format('\t'.join(['sample'] + INDEX_COLUMNS)))
+        for sample_pos, sample_name in enumerate(sample_names):
+            values = [get_value_string(index_dict[column][sample_pos]) for column in INDEX_COLUMNS]
+            out_fh.write('{}\n'.format('\t'.join([sample_name] + values)))
+
+
+def get_value_string(value):
+
+    if np.isnan(value):
+        return MISSING_VALUE
+    elif float(value).is_integer():
+        return str(int(value))
+    return '{:.6f}'.format(value)
+
+
+if __name__ == '__main__':
+    main()
@@ -23,10 +23,16 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import os
 import re
-
 import sys
 
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import otu_table
+
 program_description = """
 Creates text files containing data for taxa bar plots
 """
@@ -41,18 +47,11 @@ def main():
     args = parse_arguments()
     otu_taxa_table_file = args.taxa_table
 
-    header, otu_samples_dict = parse_otu_sample_table(args.otu_sample_table)
+    sample_table = otu_table.read_table(args.otu_sample_table)
     taxa_rank_dict = taxa_file_to_dict(otu_taxa_table_file)
 
-    # print('OTU samples dict', file=sys.stderr)
-    # print(otu_samples_dict, file=sys.stderr)
-    # print('Taxa dict')
-    # print(taxa_rank_dict)
-
-    write_barplot_file(taxa_rank_dict, args.barplot_cluster, header, otu_samples_dict, cluster_count_only=True)
-
-    # taxa_rank_dict_abundance = taxa_file_to_dict(otu_taxa_table_file)
-    write_barplot_file(taxa_rank_dict, args.barplot_abund, header, otu_samples_dict)
+    write_barplot_file(taxa_rank_dict, args.barplot_cluster, sample_table, cluster_count_only=True)
+    write_barplot_file(taxa_rank_dict, args.barplot_abund, sample_table)
 
 
 def parse_arguments():
@@ -61,25 +60,13 @@ def parse_arguments():
 
     parser = argparse.ArgumentParser(description=program_description)
     parser.add_argument('--taxa_table', help='otu_taxa_table', required=True)
-    parser.add_argument('--otu_sample_table', help='OTU sample mapping table', required=True)
+    parser.add_argument('--otu_sample_table', help='OTU sample mapping table, tab separated or in the binary '
+                                                   'OTU table format', required=True)
     parser.add_argument('--barplot_cluster', help='Outpath for plotting clusters in barplot', required=True)
     parser.add_argument('--barplot_abund', help='Outpath for plotting abundance in barplot')
     return parser.parse_args()
 
 
-def parse_otu_sample_table(otu_sample_table_fp):
-
-    otu_samples_dict = dict()
-    with open(otu_sample_table_fp) as in_fh:
-        header = in_fh.readline().rstrip('\n')
-        for line in in_fh:
-            line = line.rstrip('\n')
-
-            line_entries = line.split('\t')
-            otu_samples_dict[line_entries[0]] = line_entries[1:]
-    return header, otu_samples_dict
-
-
 def taxa_file_to_dict(otu_taxa_table_file):
 
     """Reads the OTU taxa table file, and parses it into a dictionary"""
@@ -98,18 +85,30 @@ def taxa_file_to_dict(otu_taxa_table_file):
     return taxa_otus_dict
 
 
-def write_barplot_file(taxa_otus_dict, out_path, header, otu_samples_dict, cluster_count_only=False):
+def write_barplot_file(taxa_otus_dict, out_path, sample_table, cluster_count_only=False):
+
+    """
+    Write the taxa-cluster count/cluster abundance to file
+    With cluster_count_only, each OTU present in a sample adds one to its taxon
+    """
+
+    taxa = sorted_alphanumerically(list(taxa_otus_dict.keys()))
+    taxa_table = get_taxa_table(taxa, taxa_otus_dict, sample_table, cluster_count_only)
+    otu_table.write_tsv(taxa_table, out_path)
 
-    """Write the taxa-cluster count/cluster abundance to file"""
 
-    with open(out_path, 'w') as out_fh:
+def get_taxa_table(taxa, taxa_otus_dict, sample_table, cluster_count_only=False):
 
-        out_fh.write('{}\n'.format(header))
+    """Sums the OTUs of each taxon into a taxa x sample table, with taxa in the given order"""
 
-        for taxon in sorted_alphanumerically(list(taxa_otus_dict.keys())):
+    otu_taxa = [-1] * sample_table.get_shape()[0]
+    for taxon_pos, taxon in enumerate(taxa):
+        for otu in taxa_otus_dict[taxon]:
+            otu_taxa[sample_table.get_otu_index(otu)] = taxon_pos
 
-            taxa_samples_line = get_taxa_samples_line(taxon, taxa_otus_dict[taxon], otu_samples_dict, cluster_count_only)
-            out_fh.write('{}\n'.format(taxa_samples_line))
+    if cluster_count_only:
+        sample_table = sample_table.get_presence()
+    return sample_table.get_grouped(taxa, otu_taxa)
 
 
 def sorted_alphanumerically(unsorted_list):
@@ -126,34 +125,5 @@ def sorted_alphanumerically(unsorted_list):
     return sorted(unsorted_list, key=alphanum_key)
 
 
-def get_taxa_samples_line(taxon, otus, otu_samples_dict, get_clusters_only=False):
-
-    tot_sample_counts = [0] * len(next(iter(otu_samples_dict.values())))  # Get number of samples
-
-    for otu in otus:
-
-        pos = 0
-        for sample_count in otu_samples_dict[otu]:
-
-            if sample_count == '':
-                add_count = 0
-            else:
-                if get_clusters_only:
-
-                    count = int(sample_count)
-                    add_count = 0
-
-                    if count > 0:
-                        add_count = 1
-                else:
-                    add_count = int(sample_count)
-
-            tot_sample_counts[pos] += add_count
-            pos += 1
-
-    tot_sample_counts_str = [str(sample_count) for sample_count in tot_sample_counts]
-    return '{}\t{}'.format(taxon, '\t'.join(tot_sample_counts_str))
-
-
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -23,31 +23,54 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
+import array
+import os
 import re
+import sys
+
+import numpy as np
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import otu_table
+
+program_description = """
+Creates an OTU table with the read count of each OTU in each sample
+
+Each read in the dereplication mapping is given a dereplicated sequence index and a sample
+index. The reads of the sequences clustered into each OTU are then counted per sample in a
+single numpy.bincount over combined (OTU, sample) indices.
+"""
+
+# Largest OTU x sample table counted as a dense array, larger tables are aggregated sparsely
+DENSE_COUNT_LIMIT = 1 << 26
 
 
 def main():
 
     args = parse_arguments()
 
-    derep_dict = get_derep_dict(args.derep_mapping)
-    cluster_groups = get_cluster_groups(args.cluster_mapping)
+    derep_index_dict, read_offsets, read_sample_codes, sample_labels = read_derep_mapping(args.derep_mapping)
+    leader_ids, cluster_sizes, member_derep_indices = read_cluster_mapping(args.cluster_mapping, derep_index_dict)
 
-    existing_samples_list = sorted_alphanumerically(retrieve_existing_samples(derep_dict))
+    existing_samples_list = sorted_alphanumerically(sample_labels)
     output_formatted_sample_list = [sample.split('=')[-1] for sample in existing_samples_list]
 
-    for cluster_group in cluster_groups:
-        cluster_group.assign_sample_counts(derep_dict)
+    sample_positions = {sample: pos for pos, sample in enumerate(existing_samples_list)}
+    sample_ranks = np.array([sample_positions[sample] for sample in sample_labels], dtype=np.int64)
 
+    otu_names = leader_ids
     if args.name_mapping:
         name_map_dict = get_name_mapping_dict(args.name_mapping)
-        for cluster_group in cluster_groups:
-            cluster_group.assign_otu_name(name_map_dict)
+        otu_names = [name_map_dict[leader_id] for leader_id in leader_ids]
 
-    with open(args.output, 'w') as out_fh:
-        print('{}\t{}'.format('OTU', '\t'.join(output_formatted_sample_list)), file=out_fh)
-        for cluster_group in cluster_groups:
-            print(cluster_group.output_cluster_string(existing_samples_list), file=out_fh)
+    sample_table = get_otu_table(otu_names, output_formatted_sample_list, cluster_sizes, member_derep_indices,
+                                 read_offsets, sample_ranks[read_sample_codes])
+    otu_table.write_tsv(sample_table, args.output)
+    if args.binary_output:
+        otu_table.save_binary(sample_table, args.binary_output)
 
 
 def sorted_alphanumerically(unsorted_list):
@@ -68,27 +91,17 @@ def parse_arguments():
 
     """ Parses the command line arguments """
 
-    parser = argparse.ArgumentParser()
+    parser = argparse.ArgumentParser(description=program_description)
     parser.add_argument('--cluster_mapping', required=True)
     parser.add_argument('--derep_mapping', required=True)
     parser.add_argument('-o', '--output', required=True)
+    parser.add_argument('--binary_output',
+                        help='Optionally also writes the table in the binary columnar format, for faster loading.')
     parser.add_argument('--name_mapping',
                         help='Allows for renaming the raw OTU name to another name provided in tab delimited table.')
     return parser.parse_args()
 
 
-def retrieve_existing_samples(derep_dict):
-
-    """Retrieves all different sample labels present"""
-
-    existing_samples = list()
-    for sample_dict in derep_dict.values():
-        for key in sample_dict.keys():
-            if key not in existing_samples:
-                existing_samples.append(key)
-    return existing_samples
-
-
 def get_name_mapping_dict(name_mapping_fp):
 
     """Retrieve header-to-new-name mapping dict"""
@@ -101,91 +114,93 @@ def get_name_mapping_dict(name_mapping_fp):
     return name_map_dict
 
 
-def get_derep_dict(derep_map_fp):
+def read_derep_mapping(derep_map_fp):
 
-    """Retrieve dict containing derep leader seq header linked to dict containing counts for the constituting samples"""
+    """
+    Reads the dereplication mapping, where each line holds the headers of the reads of one
+    dereplicated sequence on the format 'read_id;sample'
+    Returns a dict from leader ID to dereplicated sequence index, the start of each sequence in
+    the read arrays, the sample code of each read and the sample labels in order of appearance
+    """
+
+    derep_index_dict = dict()
+    read_offsets = array.array('q', [0])
+    read_sample_codes = array.array('q')
+    sample_code_dict = dict()
+
+    with open(derep_map_fp, 'r') as in_fh:
+        for derep_line in in_fh:
 
-    derep_dict = dict()
-    with open(derep_map_fp, 'r') as in_fp:
-        for derep_line in in_fp:
             derep_line = derep_line.rstrip()
-            leader_id = derep_line.split('\t')[0].split(';')[0]
-            derep_dict[leader_id] = parse_derep_line(derep_line)
-    return derep_dict
+            fields = derep_line.replace('\t', ';').split(';')
+            if len(fields) != 2 * (derep_line.count('\t') + 1):
+                raise ValueError('Expected dereplication headers on the format read_id;sample, found: {}'
+                                 .format(derep_line))
 
+            sample_labels = fields[1::2]
+            new_labels = set(sample_labels).difference(sample_code_dict)
+            for sample in sorted(new_labels, key=sample_labels.index):
+                sample_code_dict[sample] = len(sample_code_dict)
 
-def parse_derep_line(derep_line):
+            derep_index_dict[fields[0]] = len(read_offsets) - 1
+            read_sample_codes.extend(map(sample_code_dict.__getitem__, sample_labels))
+            read_offsets.append(len(read_sample_codes))
 
-    """Retrieves dictionary containing sample headers linked to their respective counts"""
+    return (derep_index_dict, np.frombuffer(read_offsets, dtype=np.int64),
+            np.frombuffer(read_sample_codes, dtype=np.int64), list(sample_code_dict))
 
-    headers = derep_line.split('\t')
-    sample_dict = dict()
-    for header in headers:
-        header_id, sample = header.split(';')
-        if sample not in sample_dict.keys():
-            sample_dict[sample] = 1
-        else:
-            sample_dict[sample] += 1
 
-    return sample_dict
+def read_cluster_mapping(cluster_map_fp, derep_index_dict):
 
+    """
+    Reads the cluster mapping, where each line holds the dereplicated sequences of one OTU with
+    the leader first
+    Returns the leader IDs, the number of sequences in each OTU and their dereplicated sequence indices
+    """
 
-def get_cluster_groups(cluster_map_fp):
+    leader_ids = list()
+    cluster_sizes = list()
+    member_derep_indices = array.array('q')
 
-    """Retrieves a list containing ClusterGroup instances"""
+    with open(cluster_map_fp, 'r') as in_fh:
+        for line in in_fh:
+            member_ids = [header.partition(';')[0] for header in line.rstrip().split('\t')]
+            leader_ids.append(member_ids[0])
+            cluster_sizes.append(len(member_ids))
+            member_derep_indices.extend(map(derep_index_dict.__getitem__, member_ids))
 
-    cluster_groups = list()
-    with open(cluster_map_fp, 'r') as in_fp:
-        for line in in_fp:
-            line = line.rstrip()
-            cluster_groups.append(ClusterGroup(line))
-    return cluster_groups
+    return leader_ids, np.array(cluster_sizes, dtype=np.int64), np.frombuffer(member_derep_indices, dtype=np.int64)
 
 
-class ClusterGroup:
+def get_otu_table(otu_names, sample_names, cluster_sizes, member_derep_indices, read_offsets, read_samples):
 
     """
-    Represents one OTU cluster, and contains information about its leader ID, as well as
-    related derep-ids, ie what dereplication groups the cluster contains.
+    Counts the reads of each OTU in each sample
+    The reads of each dereplicated sequence are a range in the read arrays. These ranges are
+    expanded for all cluster members at once, giving the OTU and sample of every clustered read.
     """
 
-    def __init__(self, cluster_line):
-        self.leader_id, self.related_ids = self._parse_line(cluster_line)
-        self.sample_counts = dict()
-
-    @staticmethod
-    def _parse_line(cluster_line):
-
-        headers = cluster_line.split('\t')
-        leader_id = headers[0].split(';')[0]
-        related_ids = [header.split(';')[0] for header in headers]
-        return leader_id, related_ids
-
-    def assign_sample_counts(self, derep_dict):
-
-        for header_id in self.related_ids:
+    otu_count = len(otu_names)
+    sample_count = len(sample_names)
 
-            sample_dict = derep_dict[header_id]
-            for sample in sample_dict:
-                if sample not in self.sample_counts.keys():
-                    self.sample_counts[sample] = sample_dict[sample]
-                else:
-                    self.sample_counts[sample] += sample_dict[sample]
+    member_otus = np.repeat(np.arange(otu_count, dtype=np.int64), cluster_sizes)
+    range_starts = read_offsets[member_derep_indices]
+    range_lengths = read_offsets[member_derep_indices + 1] - range_starts
 
-    def assign_otu_name(self, otu_mapping_dict):
-        self.leader_id = otu_mapping_dict[self.leader_id]
+    range_shifts = range_starts - (np.cumsum(range_lengths) - range_lengths)
+    read_positions = np.arange(range_lengths.sum(), dtype=np.int64) + np.repeat(range_shifts, range_lengths)
 
-    def output_cluster_string(self, sample_list):
-        output_str = '{}'.format(self.leader_id)
+    read_otus = np.repeat(member_otus, range_lengths)
+    cell_samples = read_samples[read_positions]
 
-        for sample in sample_list:
-            if sample in self.sample_counts.keys():
-                output_str += '\t{}'.format(self.sample_counts[sample])
-            else:
-                output_str += '\t0'
+    if otu_count * sample_count <= DENSE_COUNT_LIMIT:
+        cell_counts = np.bincount(read_otus * sample_count + cell_samples, minlength=otu_count * sample_count)
+        return otu_table.OtuTable.from_dense(otu_names, sample_names,
+                                             cell_counts.reshape(otu_count, sample_count))
 
-        return output_str
+    return otu_table.OtuTable(otu_names, sample_names, read_otus, cell_samples,
+                              np.ones(len(read_otus), dtype=np.int64))
 
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -23,19 +23,30 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import argparse
-import random
+import itertools
+import os
+import sys
+from concurrent import futures
 import matplotlib
 matplotlib.use('Agg')
 import numpy
 import matplotlib.pyplot as plt
 from matplotlib import cm
-import skbio.diversity.alpha as skbio
+
+UTIL_SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.realpath(__file__)), os.pardir, 'UtilScripts')
+if UTIL_SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, UTIL_SCRIPTS_DIR)
+
+import otu_table
+import rarefaction
 
 COLOR_SCALE = cm.nipy_spectral
+BAND_Z_SCORE = 1.96
 
 program_description = """
 Calculates CHAO1 index from abundance table
 Able to visualize both rarefaction curve and chao1 subsampling curve
+The rarefaction curve can also be calculated exactly, as the expected richness at each depth
 """
 
 
@@ -48,13 +59,15 @@ def main():
     nbr_samplepoints = args.samplepoints
     replicates = args.replicates
 
-    id_lists, samples = get_otu_id_list(args.otu_mapping_table)
+    count_lists, samples = get_sample_count_lists(args.otu_mapping_table)
 
-    richness_datapoints = calculate_richness_datapoints_new(nbr_samplepoints, replicates, id_lists) 
-    chao_datapoints = calculate_chao_datapoints(nbr_samplepoints, replicates, id_lists)
+    richness_datapoints, chao_datapoints, richness_bands = calculate_alpha_datapoints(
+        nbr_samplepoints, replicates, count_lists, exact=args.exact, incremental=args.incremental,
+        processes=args.processes, seed=args.seed)
 
     if args.plot_rarefaction:
-        plot_data('Rarefaction curve', richness_datapoints, samples, args.plot_rarefaction, args.plot_linefit)
+        plot_data('Rarefaction curve', richness_datapoints, samples, args.plot_rarefaction, args.plot_linefit,
+                  bands=richness_bands)
 
     if args.plot_chao:
         plot_data('Chao1 curve', chao_datapoints, samples, args.plot_chao, args.plot_linefit)
@@ -66,7 +79,7 @@ def parse_arguments():
 
     parser = argparse.ArgumentParser(description=program_description)
     parser.add_argument('-m', '--otu_mapping_table', required=True,
-                        help='Matrix with OTU/sample counts')
+                        help='Matrix with OTU/sample counts, tab separated or in the binary OTU table format')
     parser.add_argument('--plot_rarefaction',
                         help='Output path for rarefaction plot')
     parser.add_argument('--plot_chao',
@@ -77,126 +90,81 @@ def parse_arguments():
                         help='Number of replicates per sample point')
     parser.add_argument('--plot_linefit', default=False, action='store_true',
                         help='Should linefit be included')
+    parser.add_argument('--exact', default=False, action='store_true',
+                        help='Calculate the rarefaction curve as the exact expected richness, shown with a '
+                             '95%% band, instead of by random subsampling')
+    parser.add_argument('--incremental', default=False, action='store_true',
+                        help='Shuffle the reads once per replicate and calculate all sample points from the '
+                             'shuffled reads, instead of drawing a new subsample for each sample point')
+    parser.add_argument('-p', '--processes', default=1, type=int,
+                        help='Number of processes calculating the curves of separate samples')
+    parser.add_argument('--seed', type=int,
+                        help='Random seed for the subsampling, giving the same curves for any number of processes')
     args = parser.parse_args()
     return args
 
 
-def get_otu_id_list(raw_otu_table):
-
-    """
-    Generates a list where OTUs are represented by their ID and the ID is present the same
-    number of times as the corresponding abundance
-    """
-
-    with open(raw_otu_table, 'r') as input_fh:
-
-        samples = input_fh.readline().rstrip().split('\t')[1:]
-
-        sample_id_lists = list()
-        for _ in range(len(samples)):
-            sample_id_lists.append(list())
-
-        for line in input_fh:
-            line = line.rstrip().split('\t')
-            otu_id = line[0]
-            id_counts = [int(count) for count in line[1:]]
-
-            for pos in range(len(id_counts)):
-
-                count = id_counts[pos]
-
-                for _ in range(count):
-                    sample_id_lists[pos].append(otu_id)
-
-    return sample_id_lists, samples
-
-
-def calculate_chao_datapoints(nbr_samplepoints, replicates, id_lists):
-
-    """Calculates and returns sample count/Chao1 estimate value pairs"""
-
-    datapoint_lists = list()
-    for id_list in id_lists:
-
-        total_read_count = len(id_list)
-        interval = total_read_count // nbr_samplepoints
-
-        datapoints = []
-        for subset_size in range(interval, total_read_count, interval):
-
-            total_value = 0
-            for _ in range(replicates):
+def get_sample_count_lists(otu_table_fp):
 
-                single_chao_estimate = get_chao_subsample(id_list, subset_size)
-                total_value += single_chao_estimate
+    """Retrieves the non-zero OTU counts of each sample, together with the sample names"""
 
-            average_chao_estimate = total_value / replicates
-            datapoints.append((subset_size, average_chao_estimate))
+    sample_table = otu_table.open_table(otu_table_fp)
 
-        datapoint_lists.append(datapoints)
+    count_lists = list()
+    for sample_pos in range(sample_table.get_shape()[1]):
+        sample_counts = sample_table.get_sample_counts(sample_pos)
+        count_lists.append(numpy.asarray(sample_counts[sample_counts > 0]))
 
-    return datapoint_lists
+    return count_lists, sample_table.get_sample_names()
 
 
-def get_chao_subsample(ids_list, subset_size):
+def calculate_alpha_datapoints(nbr_samplepoints, replicates, count_lists, exact=False, incremental=False,
+                               processes=1, seed=None):
 
-    """Calculate a single Chao1 using an id list and a target subset size"""
-
-    id_subset = random.sample(ids_list, subset_size)
-
-    otu_dict = dict()
-    for otu_id in id_subset:
-
-        if otu_id not in otu_dict:
-            otu_dict[otu_id] = 1
-        else:
-            otu_dict[otu_id] += 1
-
-    count_list_subset = list(otu_dict.values())
-    chao_estimate = skbio.chao1(count_list_subset)
-
-    return chao_estimate
-
-
-def calculate_richness_datapoints_new(nbr_samplepoints, replicates, id_lists):
-
-    """Calculates and retrieves sampled-sequence/richness value pairs"""
-
-    datapoint_lists = list()
-    for id_list in id_lists:
-
-        datapoint_list = list()
-        total_read_count = len(id_list)
-        interval = total_read_count // nbr_samplepoints
-
-        for subset_size in range(0, total_read_count, interval):
-
-            total_value = 0
-            for n in range(replicates):
-                sub_value = get_richness_subsample_randomsample(id_list, subset_size)
-                total_value += sub_value
-
-            average_found_otus = total_value / replicates
-            datapoint_list.append((subset_size, average_found_otus))
-
-        datapoint_lists.append(datapoint_list)
+    """
+    Calculates sampled-sequence/richness and sampled-sequence/Chao1 estimate value pairs
+    Both curves are calculated from the same subsamples, the Chao1 curve leaving out depth zero
+    With exact richness, the lower and upper values of a 95% band around each rarefaction curve are
+    returned as well, from the variance of the richness
+    With incremental, the subsamples of each replicate are taken from one shuffling of the reads
+
+    Each sample gets its own seed sequence, spawned from the given seed, so the curves are the
+    same for any number of processes.
+    """
 
-    return datapoint_lists
+    seed_sequences = numpy.random.SeedSequence(seed).spawn(len(count_lists))
+    task_arguments = (count_lists, itertools.repeat(nbr_samplepoints), itertools.repeat(replicates),
+                      seed_sequences, itertools.repeat(exact), itertools.repeat(incremental))
 
+    if processes > 1 and len(count_lists) > 1:
+        with futures.ProcessPoolExecutor(max_workers=processes) as executor:
+            sample_curves = list(executor.map(rarefaction.get_sample_curves, *task_arguments))
+    else:
+        sample_curves = list(map(rarefaction.get_sample_curves, *task_arguments))
 
-def get_richness_subsample_randomsample(id_list, subset_size):
+    richness_datapoint_lists = list()
+    chao_datapoint_lists = list()
+    richness_band_lists = list() if exact else None
+    for depths, richness_means, chao_means, richness_deviations in sample_curves:
 
-    """Calculates the number of found species in a subsample"""
+        depth_list = depths.tolist()
+        richness_datapoint_lists.append(list(zip(depth_list, richness_means.tolist())))
+        chao_datapoint_lists.append(list(zip(depth_list[1:], chao_means[1:].tolist())))
 
-    sample = random.sample(id_list, subset_size)
-    found_species = len(set(sample))
+        if exact:
+            band_width = BAND_Z_SCORE * richness_deviations
+            richness_band_lists.append(((richness_means - band_width).tolist(),
+                                        (richness_means + band_width).tolist()))
 
-    return found_species
+    return richness_datapoint_lists, chao_datapoint_lists, richness_band_lists
 
 
-def plot_data(title, datapoints, samples, plot_path, plot_linefit):
+def plot_data(title, datapoints, samples, plot_path, plot_linefit, bands=None):
 
-    """Generates a scatterplot from given x- and y-values"""
+    """
+    Generates a scatterplot from given x- and y-values
+    Optional bands, given as lists of lower and upper y-values, are shaded around each curve
+    """
 
     fig = plt.figure()
 
@@ -216,6 +184,11 @@ def plot_data(title, datapoints, samples, plot_path, plot_linefit):
 
         plots.append(plot)
 
+        if bands is not None:
+            lower_values, upper_values = bands[current_pos]
+            plt.fill_between(xvalues, lower_values, upper_values, color=color_list[current_pos], alpha=0.2,
+                             linewidth=0)
+
         if plot_linefit:
             max_x = max(xvalues)
             step_x = max_x / curve_steps
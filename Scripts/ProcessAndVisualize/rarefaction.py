@@ -0,0 +1,245 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from scipy.special import gammaln
+
+"""
+Count based rarefaction of OTU samples
+
+A sample is given as the vector of its non-zero OTU counts. Subsampling a number of reads
+without replacement gives a multivariate hypergeometric distribution over the OTUs, which is
+drawn directly from the counts. Memory use and run time therefore depend on the number of OTUs,
+depths and replicates, not on the number of reads in the sample.
+
+The subsamples of a sample are kept in a single array with one row of OTU counts per depth and
+replicate, and the alpha diversity of all subsamples is calculated in one vectorized pass.
+
+Alternatively, the reads of a sample can be shuffled once per replicate, up to the largest depth,
+and the curves read off the growing prefixes of the shuffled reads. The observed OTUs, singletons
+and doubletons only change when an OTU is seen for the first, second or third time, so all depths
+of a replicate are given by one pass over the shuffled reads.
+
+The expected richness at a depth can also be calculated exactly, together with its variance,
+from the probability that an OTU is absent from a subsample of that size (Heck et al. 1975).
+OTUs with the same count share these probabilities, so the calculations are done per distinct
+count rather than per OTU.
+"""
+
+COUNT_DTYPE = np.int64
+
+
+def get_depths(total_count, nbr_samplepoints, include_zero=True):
+
+    """
+    Subsample depths spread evenly up to, but not including, the total read count
+    The interval is the total read count divided by the number of sample points
+    """
+
+    interval = total_count // nbr_samplepoints
+    if interval == 0:
+        raise ValueError('Too few reads ({}) for {} sample points'.format(total_count, nbr_samplepoints))
+
+    first_depth = 0 if include_zero else interval
+    return np.arange(first_depth, total_count, interval, dtype=COUNT_DTYPE)
+
+
+def get_sample_curves(counts, nbr_samplepoints, replicates, seed_sequence, exact=False, incremental=False):
+
+    """
+    Calculates the rarefaction and Chao1 curves of one sample, with one value per depth
+    Returns the depths, the mean richness, the mean Chao1 estimate and the standard deviation of
+    the richness, which is only calculated for the exact richness and None otherwise
+
+    The subsamples are drawn from a generator seeded by the sample's own seed sequence, so that
+    the curves do not depend on the process calculating them or on the other samples. With
+    incremental, the subsamples of a replicate are the prefixes of one shuffling of the reads.
+    With exact, the subsamples are only used for the Chao1 curve, which leaves out depth zero.
+    """
+
+    depths = get_depths(int(np.sum(counts)), nbr_samplepoints)
+    rng = np.random.default_rng(seed_sequence)
+
+    if incremental:
+        richness_values, chao_values = get_incremental_estimates(counts, depths, replicates, rng)
+    elif exact:
+        richness_values = None
+        chao_values = np.zeros((len(depths), replicates))
+        chao_values[1:] = get_chao1(draw_subsamples(counts, depths[1:], replicates, rng))
+    else:
+        subsamples = draw_subsamples(counts, depths, replicates, rng)
+        richness_values, chao_values = get_richness(subsamples), get_chao1(subsamples)
+
+    chao_means = chao_values.mean(axis=1)
+    if exact:
+        richness_means, variances = get_expected_richness(counts, depths)
+        richness_deviations = np.sqrt(variances)
+    else:
+        richness_means = richness_values.mean(axis=1)
+        richness_deviations = None
+
+    return depths, richness_means, chao_means, richness_deviations
+
+
+def draw_subsamples(counts, depths, replicates, rng):
+
+    """
+    Draws the given number of subsamples without replacement at each depth
+    Returns the OTU counts of the subsamples as an array of shape (depths, replicates, OTUs)
+
+    NumPy takes a single subsample size per call, so the replicates of each depth are drawn
+    together and the depths are filled into the shared array.
+    """
+
+    counts = np.asarray(counts, dtype=COUNT_DTYPE)
+    subsamples = np.empty((len(depths), replicates, len(counts)), dtype=COUNT_DTYPE)
+    for depth_pos, depth in enumerate(depths):
+        subsamples[depth_pos] = rng.multivariate_hypergeometric(counts, int(depth), size=replicates)
+    return subsamples
+
+
+def get_richness(subsamples):
+
+    """The number of observed OTUs in each subsample"""
+
+    return np.count_nonzero(subsamples, axis=-1)
+
+
+def get_chao1(subsamples):
+
+    """
+    The bias-corrected Chao1 estimate of each subsample, S_obs + F1 * (F1 - 1) / (2 * (F2 + 1)),
+    where F1 and F2 are the number of singletons and doubletons
+    This is the default estimate of skbio.diversity.alpha.chao1
+    """
+
+    singletons = np.count_nonzero(subsamples == 1, axis=-1)
+    doubletons = np.count_nonzero(subsamples == 2, axis=-1)
+    return get_chao1_estimate(get_richness(subsamples), singletons, doubletons)
+
+
+def get_chao1_estimate(observed, singletons, doubletons):
+    return observed + singletons * (singletons - 1) / (2.0 * (doubletons + 1))
+
+
+def get_incremental_estimates(counts, depths, replicates, rng):
+
+    """
+    The richness and Chao1 estimate at each depth, for the given number of shuffled replicates
+    Returns two arrays of shape (depths, replicates)
+
+    Only the reads up to the largest depth are shuffled into place, by drawing read positions
+    without replacement in random order, and the OTU of each position is found from the
+    cumulative counts. For each drawn read, its occurrence number among the drawn reads of its OTU
+    is found by a stable sort on the OTU index. First occurrences add an observed OTU and a
+    singleton, second occurrences turn a singleton into a doubleton and third occurrences remove a
+    doubleton, so cumulative sums over the reads give the counters after any number of reads.
+    """
+
+    counts = np.asarray(counts, dtype=COUNT_DTYPE)
+    otu_ends = np.cumsum(counts)
+    max_depth = int(np.max(depths))
+    read_ranks = np.arange(max_depth, dtype=COUNT_DTYPE)
+
+    richness = np.empty((len(depths), replicates))
+    chao1 = np.empty((len(depths), replicates))
+    for replicate in range(replicates):
+
+        read_positions = rng.choice(otu_ends[-1], size=max_depth, replace=False)
+        reads = np.searchsorted(otu_ends, read_positions, side='right')
+
+        otu_order = np.argsort(reads, kind='stable')
+        sorted_reads = reads[otu_order]
+        occurrences = np.empty(max_depth, dtype=COUNT_DTYPE)
+        occurrences[otu_order] = read_ranks - np.searchsorted(sorted_reads, sorted_reads, side='left') + 1
+
+        first_seen = occurrences == 1
+        second_seen = occurrences == 2
+        third_seen = occurrences == 3
+
+        observed = get_counts_at_depths(first_seen.astype(COUNT_DTYPE), depths)
+        singletons = get_counts_at_depths(first_seen.astype(COUNT_DTYPE) - second_seen, depths)
+        doubletons = get_counts_at_depths(second_seen.astype(COUNT_DTYPE) - third_seen, depths)
+
+        richness[:, replicate] = observed
+        chao1[:, replicate] = get_chao1_estimate(observed, singletons, doubletons)
+
+    return richness, chao1
+
+
+def get_counts_at_depths(read_changes, depths):
+
+    """The sum of the changes over the first reads, up to each depth"""
+
+    return np.concatenate(([0], np.cumsum(read_changes)))[depths]
+
+
+def get_expected_richness(counts, depths):
+
+    """
+    The expected number of observed OTUs and its variance at each depth, for subsampling without
+    replacement. Returns two arrays with one value per depth.
+
+        E(S_n) = sum_i (1 - q_i)
+        Var(S_n) = sum_i q_i * (1 - q_i) + sum_(i != j) (q_ij - q_i * q_j)
+
+    where q_i = C(N - N_i, n) / C(N, n) is the probability that OTU i is absent from a subsample
+    of n reads, and q_ij the probability that both OTU i and OTU j are absent.
+    """
+
+    counts = np.asarray(counts, dtype=COUNT_DTYPE)
+    total_count = int(counts.sum())
+    class_counts, class_sizes = np.unique(counts[counts > 0], return_counts=True)
+
+    pair_remaining = total_count - class_counts[:, np.newaxis] - class_counts[np.newaxis, :]
+    pair_sizes = np.outer(class_sizes, class_sizes).astype(float)
+
+    expected = np.empty(len(depths))
+    variances = np.empty(len(depths))
+    for depth_pos, depth in enumerate(depths):
+
+        absent = get_absence_probability(total_count - class_counts, total_count, depth)
+        pair_absent = get_absence_probability(pair_remaining, total_count, depth)
+        covariances = pair_absent - np.outer(absent, absent)
+
+        expected[depth_pos] = np.sum(class_sizes * (1 - absent))
+        variances[depth_pos] = (np.sum(class_sizes * absent * (1 - absent))
+                                + np.sum(pair_sizes * covariances)
+                                - np.sum(class_sizes * np.diagonal(covariances)))
+
+    return expected, np.maximum(variances, 0)
+
+
+def get_absence_probability(remaining_count, total_count, depth):
+
+    """
+    The probability C(remaining, n) / C(total, n) that a subsample of n reads only contains reads
+    from a given part of the sample, calculated in log space. Zero when the part is too small.
+    """
+
+    remaining_count = np.asarray(remaining_count)
+    is_possible = remaining_count >= depth
+    possible_count = np.where(is_possible, remaining_count, depth)
+
+    log_probability = (gammaln(possible_count + 1) - gammaln(possible_count - depth + 1)
+                       - gammaln(total_count + 1) + gammaln(total_count - depth + 1))
+    return np.where(is_possible, np.exp(log_probability), 0.0)
@@ -55,7 +55,7 @@ def main():
     else:
         fig, leg = make_plot(taxa_count_dict, args.title, header_entries, args.ylabel, taxa_color_dict)
 
-    fig.savefig(args.output + '.png', format='png', bbox_extra_artists=(leg,), bbox_inches='tight')
+    fig.savefig(get_output_fp(args.output, '.png'), format='png', bbox_extra_artists=(leg,), bbox_inches='tight')
 
 
 def parse_arguments():
@@ -64,7 +64,7 @@ def parse_arguments():
 
     parser = argparse.ArgumentParser(description=program_description)
     parser.add_argument('-i', '--input', help='Input file', required=True)
-    parser.add_argument('-o', '--output', help='Output file', required=True)
+    parser.add_argument('-o', '--output', help='Output file, .png is added if not given', required=True)
     parser.add_argument('--title', help='Title of the plot', default='Default title')
     parser.add_argument('--ylabel', help='Y-axis for the plot', default='Default ylabel')
     parser.add_argument('-c', '--color_table', help='Optional table to specify taxa colors')
@@ -73,6 +73,15 @@ def parse_arguments():
     return args
 
 
+def get_output_fp(output, extension):
+
+    """The output path, with the file extension added unless it is already given"""
+
+    if output.endswith(extension):
+        return output
+    return output + extension
+
+
 def extract_color_dict(taxa_color_table):
 
     """Extracts colors related from taxa from table, and returns the information as a dictionary"""
@@ -0,0 +1,425 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import json
+
+import numpy as np
+
+"""
+Sparse OTU x sample count table shared by the scripts working on OTU tables
+
+The OTU and sample names are kept once, in table order, and each non-zero cell is stored as
+an OTU index, a sample index and a count in three NumPy arrays (coordinate format), sorted by
+OTU and then sample. Memory use and most operations therefore scale with the number of
+non-zero cells rather than with the full table size.
+
+Scripts outside of UtilScripts add this directory to their module search path to import it.
+
+The tab separated format has a header line with a label for the OTU column followed by the
+sample names, and one line per OTU with its name and the count in each sample. A table
+without header, such as the OTU abundance tables, is read by providing the sample names.
+
+The binary format stores the table column by column, so that single samples can be read
+without reading the full table:
+    - The magic bytes 'RASPOTU\\0' and the length of the header as an 8 byte integer
+    - A JSON header with the OTU names, sample names, optional taxonomy columns (one value per
+      OTU) and the location and type of each array
+    - The arrays, each starting at a 64 byte boundary: the start of each sample in the cell
+      arrays (sample count + 1 values), followed by the OTU index and count of each cell, with
+      the cells ordered by sample and then OTU
+"""
+
+OTU_COLUMN_LABEL = 'OTU'
+
+BINARY_MAGIC = b'RASPOTU\x00'
+BINARY_FORMAT_VERSION = 1
+BINARY_ALIGNMENT = 64
+HEADER_LENGTH_BYTES = 8
+
+INDEX_DTYPE = np.int64
+COUNT_DTYPE = np.int64
+
+
+class OtuTable:
+
+    def __init__(self, otu_names, sample_names, otu_indices, sample_indices, counts):
+
+        """
+        Creates a table from cells given in any order, summing cells given more than once
+        Cells with zero counts are dropped
+        """
+
+        self._otu_names = list(otu_names)
+        self._sample_names = list(sample_names)
+        self._otu_index_dict = None
+
+        otu_indices = np.asarray(otu_indices, dtype=INDEX_DTYPE)
+        sample_indices = np.asarray(sample_indices, dtype=INDEX_DTYPE)
+        counts = np.asarray(counts, dtype=COUNT_DTYPE)
+
+        # Cells are identified by a single key, in OTU and then sample order
+        sample_count = max(len(self._sample_names), 1)
+        cell_keys = otu_indices * sample_count + sample_indices
+        if len(cell_keys) > 1 and not np.all(cell_keys[1:] > cell_keys[:-1]):
+            order = np.argsort(cell_keys, kind='stable')
+            cell_keys = cell_keys[order]
+            key_starts = np.flatnonzero(np.concatenate(([True], cell_keys[1:] != cell_keys[:-1])))
+            cell_keys = cell_keys[key_starts]
+            counts = np.add.reduceat(counts[order], key_starts)
+
+        non_zero = counts != 0
+        cell_keys = cell_keys[non_zero]
+        self._counts = counts[non_zero]
+        self._otu_indices = cell_keys // sample_count
+        self._sample_indices = cell_keys % sample_count
+
+    @classmethod
+    def from_dense(cls, otu_names, sample_names, dense_counts):
+
+        """Creates a table from a two-dimensional OTU x sample count array"""
+
+        otu_indices, sample_indices = np.nonzero(dense_counts)
+        return cls(otu_names, sample_names, otu_indices, sample_indices, dense_counts[otu_indices, sample_indices])
+
+    def get_otu_names(self):
+        return self._otu_names
+
+    def get_sample_names(self):
+        return self._sample_names
+
+    def get_shape(self):
+        return len(self._otu_names), len(self._sample_names)
+
+    def get_cells(self):
+
+        """The OTU indices, sample indices and counts of the non-zero cells"""
+
+        return self._otu_indices, self._sample_indices, self._counts
+
+    def get_otu_index(self, otu_name):
+
+        """Position of the OTU in the table, raises a KeyError for unknown OTUs"""
+
+        if self._otu_index_dict is None:
+            self._otu_index_dict = {name: pos for pos, name in enumerate(self._otu_names)}
+        return self._otu_index_dict[otu_name]
+
+    def get_sample_counts(self, sample_index):
+
+        """The counts of all OTUs in one sample, including zeros"""
+
+        in_sample = self._sample_indices == sample_index
+        return sum_by_index(self._otu_indices[in_sample], self._counts[in_sample], len(self._otu_names))
+
+    def get_sample_totals(self):
+        return sum_by_index(self._sample_indices, self._counts, len(self._sample_names))
+
+    def get_otu_totals(self):
+        return sum_by_index(self._otu_indices, self._counts, len(self._otu_names))
+
+    def get_dense(self):
+
+        """The table as a two-dimensional OTU x sample count array"""
+
+        dense_counts = np.zeros(self.get_shape(), dtype=COUNT_DTYPE)
+        dense_counts[self._otu_indices, self._sample_indices] = self._counts
+        return dense_counts
+
+    def get_presence(self):
+
+        """A table with the same cells, where each non-zero count is replaced by one"""
+
+        return OtuTable(self._otu_names, self._sample_names, self._otu_indices, self._sample_indices,
+                        np.ones(len(self._counts), dtype=COUNT_DTYPE))
+
+    def get_grouped(self, group_names, otu_groups):
+
+        """
+        Sums the OTUs into groups, such as taxa. The group of each OTU is given as an index into
+        the group names, with -1 for OTUs not included in any group.
+        """
+
+        otu_groups = np.asarray(otu_groups, dtype=INDEX_DTYPE)
+        cell_groups = otu_groups[self._otu_indices]
+        included = cell_groups >= 0
+        return OtuTable(group_names, self._sample_names, cell_groups[included], self._sample_indices[included],
+                        self._counts[included])
+
+
+def sum_by_index(indices, counts, length):
+
+    """Sums the counts sharing the same index, keeping exact integer counts"""
+
+    totals = np.zeros(length, dtype=COUNT_DTYPE)
+    np.add.at(totals, indices, counts)
+    return totals
+
+
+def read_tsv(table_fp, sample_names=None):
+
+    """
+    Reads a tab separated OTU table
+    If sample names are given, the table is taken to have no header line
+    Empty count fields are read as zero
+    """
+
+    otu_names = list()
+    otu_index_parts = list()
+    sample_index_parts = list()
+    count_parts = list()
+
+    with open(table_fp) as in_fh:
+
+        if sample_names is None:
+            sample_names = in_fh.readline().rstrip('\n').split('\t')[1:]
+
+        for otu_pos, line in enumerate(in_fh):
+
+            otu_name, _, count_fields = line.rstrip('\n').partition('\t')
+            otu_names.append(otu_name)
+
+            counts = get_count_array(count_fields, len(sample_names))
+            sample_indices = np.flatnonzero(counts)
+            otu_index_parts.append(np.full(len(sample_indices), otu_pos, dtype=INDEX_DTYPE))
+            sample_index_parts.append(sample_indices)
+            count_parts.append(counts[sample_indices])
+
+    return OtuTable(otu_names, sample_names, concatenate_parts(otu_index_parts), concatenate_parts(sample_index_parts),
+                    concatenate_parts(count_parts))
+
+
+def get_count_array(count_fields, sample_count):
+
+    count_strings = count_fields.split('\t') if sample_count > 0 else []
+    if len(count_strings) != sample_count:
+        raise ValueError('Expected {} counts, found: {}'.format(sample_count, count_fields))
+    if '' in count_strings:
+        count_strings = [count_string if count_string != '' else '0' for count_string in count_strings]
+    return np.array(count_strings, dtype=COUNT_DTYPE)
+
+
+def concatenate_parts(array_parts):
+    if not array_parts:
+        return np.zeros(0, dtype=INDEX_DTYPE)
+    return np.concatenate(array_parts)
+
+
+def write_tsv(otu_table, table_fp, header=True, otu_column_label=OTU_COLUMN_LABEL):
+
+    """Writes the table as tab separated text, including zero counts, optionally without header line"""
+
+    otu_names = otu_table.get_otu_names()
+    otu_count, sample_count = otu_table.get_shape()
+    otu_indices, sample_indices, counts = otu_table.get_cells()
+
+    # The cells are sorted by OTU, giving the range of cells of each OTU
+    otu_starts = np.searchsorted(otu_indices, np.arange(otu_count + 1)).tolist()
+    sample_indices = sample_indices.tolist()
+    counts = [str(count) for count in counts.tolist()]
+
+    with open(table_fp, 'w') as out_fh:
+
+        if header:
+            out_fh.write('{}\n'.format('\t'.join([otu_column_label] + otu_table.get_sample_names())))
+
+        for otu_pos in range(otu_count):
+            row = ['0'] * sample_count
+            for cell_pos in range(otu_starts[otu_pos], otu_starts[otu_pos + 1]):
+                row[sample_indices[cell_pos]] = counts[cell_pos]
+            out_fh.write('{}\t{}\n'.format(otu_names[otu_pos], '\t'.join(row)))
+
+
+def save_binary(otu_table, table_fp, taxonomy=None):
+
+    """
+    Saves the table in the binary columnar format, optionally with taxonomy columns
+    The taxonomy is given as a dictionary from column name to a list with one entry per OTU
+    """
+
+    otu_count, sample_count = otu_table.get_shape()
+    otu_indices, sample_indices, counts = otu_table.get_cells()
+
+    # Sample (column) order, with the cells of each sample in OTU order
+    column_order = np.lexsort((otu_indices, sample_indices))
+    sample_offsets = np.searchsorted(sample_indices[column_order], np.arange(sample_count + 1)).astype(INDEX_DTYPE)
+
+    index_dtype = '<u4' if otu_count < 2 ** 32 else '<i8'
+    arrays = [('sample_offsets', sample_offsets.astype('<i8')),
+              ('otu_indices', otu_indices[column_order].astype(index_dtype)),
+              ('counts', counts[column_order].astype('<i8'))]
+
+    taxonomy = taxonomy if taxonomy is not None else dict()
+    for column, values in taxonomy.items():
+        if len(values) != otu_count:
+            raise ValueError('The taxonomy column {} has {} values for {} OTUs'.format(column, len(values), otu_count))
+
+    header = {'format_version': BINARY_FORMAT_VERSION,
+              'otu_names': otu_table.get_otu_names(),
+              'sample_names': otu_table.get_sample_names(),
+              'taxonomy': {column: list(values) for column, values in taxonomy.items()},
+              'arrays': dict()}
+
+    # The array offsets are part of the header, so its length is settled before placing the arrays
+    array_offset = 0
+    for name, array in arrays:
+        header['arrays'][name] = {'dtype': array.dtype.str, 'length': len(array), 'offset': array_offset}
+        array_offset = get_aligned(array_offset + array.nbytes)
+
+    header_bytes = json.dumps(header).encode()
+    data_start = get_aligned(len(BINARY_MAGIC) + HEADER_LENGTH_BYTES + len(header_bytes))
+
+    with open(table_fp, 'wb') as out_fh:
+        out_fh.write(BINARY_MAGIC)
+        out_fh.write(len(header_bytes).to_bytes(HEADER_LENGTH_BYTES, 'little'))
+        out_fh.write(header_bytes)
+        for name, array in arrays:
+            out_fh.seek(data_start + header['arrays'][name]['offset'])
+            out_fh.write(array.tobytes())
+        out_fh.truncate(data_start + array_offset)
+
+
+def get_aligned(offset):
+    return -(-offset // BINARY_ALIGNMENT) * BINARY_ALIGNMENT
+
+
+def is_binary(table_fp):
+
+    """Checks whether the file is in the binary columnar format, rather than tab separated"""
+
+    with open(table_fp, 'rb') as in_fh:
+        return in_fh.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+class MappedOtuTable:
+
+    """
+    OTU table in the binary columnar format, read through memory maps
+    The names and taxonomy are read when opening the table, while the count arrays are mapped on
+    first use, reading only the parts of the file needed
+    """
+
+    def __init__(self, table_fp):
+
+        self._table_fp = table_fp
+        self._arrays = dict()
+
+        with open(table_fp, 'rb') as in_fh:
+            if in_fh.read(len(BINARY_MAGIC)) != BINARY_MAGIC:
+                raise ValueError('Not a binary OTU table: {}'.format(table_fp))
+            header_length = int.from_bytes(in_fh.read(HEADER_LENGTH_BYTES), 'little')
+            header = json.loads(in_fh.read(header_length).decode())
+
+        if header['format_version'] != BINARY_FORMAT_VERSION:
+            raise ValueError('Unsupported binary OTU table version {} in {}'
+                             .format(header['format_version'], table_fp))
+
+        self._otu_names = header['otu_names']
+        self._sample_names = header['sample_names']
+        self._taxonomy = header['taxonomy']
+        self._array_info = header['arrays']
+        self._data_start = get_aligned(len(BINARY_MAGIC) + HEADER_LENGTH_BYTES + header_length)
+
+    def get_otu_names(self):
+        return self._otu_names
+
+    def get_sample_names(self):
+        return self._sample_names
+
+    def get_shape(self):
+        return len(self._otu_names), len(self._sample_names)
+
+    def get_taxonomy_columns(self):
+        return list(self._taxonomy.keys())
+
+    def get_taxonomy(self, column):
+        return self._taxonomy[column]
+
+    def get_sample_cells(self, sample_index):
+
+        """The OTU indices and counts of the non-zero cells in one sample"""
+
+        sample_offsets = self._get_array('sample_offsets')
+        start, end = int(sample_offsets[sample_index]), int(sample_offsets[sample_index + 1])
+        return self._get_array('otu_indices')[start:end], self._get_array('counts')[start:end]
+
+    def get_sample_counts(self, sample_index):
+
+        """The counts of all OTUs in one sample, including zeros"""
+
+        otu_indices, counts = self.get_sample_cells(sample_index)
+        sample_counts = np.zeros(len(self._otu_names), dtype=COUNT_DTYPE)
+        sample_counts[otu_indices] = counts
+        return sample_counts
+
+    def get_sample_totals(self):
+        counts = np.concatenate(([0], np.cumsum(self._get_array('counts'), dtype=COUNT_DTYPE)))
+        return np.diff(counts[self._get_array('sample_offsets')])
+
+    def get_otu_table(self):
+
+        """Loads the full table into memory"""
+
+        sample_offsets = self._get_array('sample_offsets')
+        sample_indices = np.repeat(np.arange(len(self._sample_names), dtype=INDEX_DTYPE), np.diff(sample_offsets))
+        return OtuTable(self._otu_names, self._sample_names, self._get_array('otu_indices'), sample_indices,
+                        self._get_array('counts'))
+
+    def _get_array(self, name):
+
+        array = self._arrays.get(name)
+        if array is None:
+            info = self._array_info[name]
+            if info['length'] == 0:
+                array = np.zeros(0, dtype=info['dtype'])
+            else:
+                array = np.memmap(self._table_fp, dtype=info['dtype'], mode='r', shape=(info['length'],),
+                                  offset=self._data_start + info['offset'])
+            self._arrays[name] = array
+        return array
+
+
+def load_binary(table_fp):
+
+    """Loads a full table saved by save_binary"""
+
+    return MappedOtuTable(table_fp).get_otu_table()
+
+
+def open_table(table_fp):
+
+    """
+    Opens a table in either format for reading per sample
+    Binary tables are memory mapped, while tab separated tables are read in full
+    """
+
+    if is_binary(table_fp):
+        return MappedOtuTable(table_fp)
+    return read_tsv(table_fp)
+
+
+def read_table(table_fp):
+
+    """Reads a full table in either format"""
+
+    if is_binary(table_fp):
+        return load_binary(table_fp)
+    return read_tsv(table_fp)
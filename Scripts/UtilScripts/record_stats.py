@@ -0,0 +1,39 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import json
+
+"""
+Statistics sidecar files written next to the outputs of the pipeline scripts
+
+Each script counts the records it writes while writing them, and stores the count in a small
+JSON file read when the run statistics are summarized. Scripts outside of UtilScripts add this
+directory to their module search path to import it.
+"""
+
+
+def write_stats(stats_fp, record_count):
+
+    """Writes the number of output records to a JSON statistics file"""
+
+    with open(stats_fp, 'w') as out_fh:
+        json.dump({'records': record_count}, out_fh)
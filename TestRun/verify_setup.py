@@ -73,13 +73,13 @@ def get_expected_output_counts():
     return_dict = dict()
 
     return_dict['1_prinseq'] = 1
-    return_dict['2_prepare_otus'] = 14
+    return_dict['2_prepare_otus'] = 11
     return_dict['3_rdp_classifier'] = 7
     return_dict['4_pynast'] = 9
     return_dict['5_build_tree'] = 1
-    return_dict['6_indices'] = 3
+    return_dict['6_indices'] = 5
     return_dict['7_visualize_data'] = 3
-    return_dict['output'] = 15
+    return_dict['output'] = 16
 
     return return_dict
 
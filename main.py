@@ -25,10 +25,16 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 import argparse
 import os
 import shutil
+import sys
 import configparser
 
 from src.pipeline_modules import preprocessing
 from src.util_scripts import util_functions
+from src.util_scripts import command_builder
+from src.util_scripts import command_scheduler
+from src.util_scripts import step_cache
+from src.util_scripts import checkpoint
+from src.util_scripts import script_pool
 
 from src.pipeline_modules import a_prinseq
 from src.pipeline_modules import b_prepare_otus_cdhit
@@ -66,8 +72,20 @@ FILE_PATH_DICT = {
     'log': {},
 }
 
+PIPELINE_MODULES = [
+    'prinseq',
+    'prepare_otus',
+    'rdp_classifier',
+    'pynast',
+    'build_tree',
+    'indices',
+    'visualize_data'
+]
+
 TIME_LOG_SUBPATH = 'log/log.txt'
 TIME_MATRIX_SUBPATH = 'log/log_table.txt'
+RESOURCE_LOG_SUBPATH = 'log/resource_log.jsonl'
+CHECKPOINT_SUBDIR = 'checkpoints/'
 
 
 def main():
@@ -84,9 +102,11 @@ def main():
     path_func = get_path_function(tot_base_path)
 
     log_dir = path_func('log')
-    os.makedirs(log_dir)
+    os.makedirs(log_dir, exist_ok=args.resume)
     output_dir = path_func('output')
-    os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=args.resume)
+
+    checkpoints = checkpoint.CheckpointRegistry(log_dir + CHECKPOINT_SUBDIR, resume=args.resume)
 
     FILE_PATH_DICT['input']['multiple_read_files'] = args.input_files
     FILE_PATH_DICT['input']['labels'] = args.input_labels
@@ -97,18 +117,33 @@ def main():
     log_table_fp = tot_base_path + TIME_MATRIX_SUBPATH
     FILE_PATH_DICT['input']['log_file'] = log_fp
     FILE_PATH_DICT['input']['log_table'] = log_table_fp
-
-    run_pipeline_module('preprocessing',    path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-
-    output_program_setup(log_table_fp, FILE_PATH_DICT['preprocessing']['decompressed_input'])
-
-    run_pipeline_module('prinseq',          path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('prepare_otus',     path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('rdp_classifier',   path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('pynast',           path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('build_tree',       path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('indices',          path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
-    run_pipeline_module('visualize_data',   path_func, FILE_PATH_DICT, log_fp, log_table_fp, options_dict, config_obj)
+    resource_log_fp = tot_base_path + RESOURCE_LOG_SUBPATH
+    FILE_PATH_DICT['input']['resource_log'] = resource_log_fp
+
+    run_step_cache = None
+    if args.cache_dir is not None:
+        run_step_cache = step_cache.StepCache(args.cache_dir, tot_base_path)
+
+    run_script_pool = None
+    if args.script_workers > 0:
+        run_script_pool = script_pool.ScriptPool(args.script_workers)
+
+    # The pool workers are shut down also when setting up or running a module fails
+    # A failing command stops the run, the later commands would read its missing or partial output
+    try:
+        run_pipeline_modules(['preprocessing'], path_func, FILE_PATH_DICT, log_fp, log_table_fp, resource_log_fp,
+                             options_dict, config_obj, args.cores, checkpoints, run_step_cache, run_script_pool)
+
+        if not args.resume or not is_log_table_initiated(log_table_fp):
+            output_program_setup(log_table_fp, util_functions.get_initial_read_count(FILE_PATH_DICT))
+
+        run_pipeline_modules(PIPELINE_MODULES, path_func, FILE_PATH_DICT, log_fp, log_table_fp, resource_log_fp,
+                             options_dict, config_obj, args.cores, checkpoints, run_step_cache, run_script_pool)
+    except command_builder.CommandFailedError as error:
+        sys.exit('RASP stopped: {}. See the logs in {}'.format(error, log_dir))
+    finally:
+        if run_script_pool is not None:
+            run_script_pool.shutdown()
 
     output_stats = path_func('output') + 'output_stats.txt'
     util_functions.extract_run_information(FILE_PATH_DICT, output_stats)
@@ -174,6 +209,48 @@ def parse_arguments():
                         help='Filters sequences assigned as chimeric by reference based chimera checking '
                              'performed by Vsearch',
                         choices=['none', 'vsearch'], default='vsearch')
+    parser.add_argument('--cores',
+                        help='Number of cores available to the pipeline. With more than one core, steps not '
+                             'depending on each other are run concurrently',
+                        type=int, default=1)
+    parser.add_argument('--cache_dir',
+                        help='Directory where outputs of finished steps are cached. Steps run again with the same '
+                             'input files and settings are then restored from the cache instead of being re-run')
+    parser.add_argument('--resume',
+                        help='Resumes an interrupted run in an existing output directory. Steps which finished in the '
+                             'earlier run are skipped up until the first step that didn\'t finish',
+                        action='store_true')
+    parser.add_argument('--script_workers',
+                        help='Number of persistent worker processes running the bundled Python scripts in-process, '
+                             'avoiding interpreter startup and imports for each step. '
+                             'With zero, each script is started as a separate process',
+                        type=int, default=0)
+    parser.add_argument('--qc_engine',
+                        help='Program used for quality trimming and filtering of the reads. The native engine is '
+                             'built into RASP and applies the same filters as Prinseq',
+                        choices=['prinseq', 'native'], default='prinseq')
+    parser.add_argument('--derep_engine',
+                        help='Engine used for dereplication. The compact engine stores sequences and read headers '
+                             'in packed form, using less memory for the same output. The external engine partitions '
+                             'the reads on disk, for datasets not fitting in memory. The sharded engine parses and '
+                             'dereplicates the reads in parallel using the available cores',
+                        choices=['default', 'compact', 'external', 'sharded'], default='default')
+    parser.add_argument('--cluster_engine',
+                        help='Engine used for OTU clustering. The k-mer engine is built into RASP, performing greedy '
+                             'clustering by abundance using the available cores, without requiring CD-HIT',
+                        choices=['cdhit', 'kmer'], default='cdhit')
+    parser.add_argument('--otu_database',
+                        help='Directory with a persistent OTU database, created if not present. Sequences are first '
+                             'mapped to the OTUs in the database, keeping their names, and only the remaining '
+                             'sequences are clustered. New OTUs are added to the database after the run')
+    parser.add_argument('--streaming',
+                        help='Streams the reads from the compressed input files through merging, quality filtering '
+                             'and FASTA conversion in a single step, without writing intermediate files',
+                        action='store_true')
+    parser.add_argument('--incremental_rarefaction',
+                        help='Calculates the sampled Chao1 curves from one shuffling of the reads per replicate, '
+                             'instead of drawing a new subsample for each sample point. Faster for deep samples',
+                        action='store_true')
 
     args = parser.parse_args()
     return args
@@ -226,11 +303,51 @@ def get_option_dict(args):
 
     option_dict['tree_software'] = args.tree_software
     option_dict['chimera_checking'] = args.chimera_checking
+    option_dict['streaming'] = args.streaming
+    option_dict['qc_engine'] = args.qc_engine
+    option_dict['derep_engine'] = args.derep_engine
+    option_dict['cluster_engine'] = args.cluster_engine
+    option_dict['otu_database'] = os.path.abspath(args.otu_database) if args.otu_database is not None else None
+    option_dict['cores'] = args.cores
+    option_dict['incremental_rarefaction'] = args.incremental_rarefaction
 
     return option_dict
 
 
-def run_pipeline_module(module_name, path_func, file_path_dict, log_fh, log_table_fh, option_dict, config_file):
+def run_pipeline_modules(module_names, path_func, file_path_dict, log_fp, log_table_fp, resource_log_fp,
+                         option_dict, config_file, cores, checkpoints, run_step_cache=None, run_script_pool=None):
+
+    """
+    Sets up the target modules and executes their commands
+    If more than one core is available, the commands are handed to a scheduler
+    running independent commands concurrently, otherwise they are run in order
+    When resuming, commands completed in the earlier run are skipped
+    """
+
+    modules = [setup_pipeline_module(module_name, path_func, file_path_dict, option_dict, config_file,
+                                     resume=checkpoints.resume)
+               for module_name in module_names]
+
+    for module in modules:
+        module.set_checkpoints(checkpoints)
+        if run_step_cache is not None:
+            module.set_step_cache(run_step_cache)
+        if run_script_pool is not None:
+            module.set_script_pool(run_script_pool)
+
+    checkpoints.find_completed_commands([command for module in modules for command in module.executable_commands])
+
+    if cores > 1:
+        scheduler = command_scheduler.CommandScheduler(cores)
+        for module in modules:
+            scheduler.add_commands(module.executable_commands)
+        scheduler.run(log_fp, log_table_fp, resource_log_fp)
+    else:
+        for module in modules:
+            module.run(log_fp, log_table_fp, resource_log_fp)
+
+
+def setup_pipeline_module(module_name, path_func, file_path_dict, option_dict, config_file, resume=False):
 
     """Creates, initializes and returns the target module"""
 
@@ -246,15 +363,13 @@ def run_pipeline_module(module_name, path_func, file_path_dict, log_fh, log_tabl
     }
 
     base_path = path_func(module_name)
-    os.makedirs(base_path)
+    os.makedirs(base_path, exist_ok=resume)
 
     option_dict = option_dict
 
     module = switch_dict[module_name]
     module.setup_commands(file_path_dict, option_dict)
 
-    module.run(log_fh, log_table_fh)
-
     return module
 
 
@@ -290,33 +405,28 @@ def get_path_function(tot_base_path):
     return get_path
 
 
-def output_program_setup(log_table_fp, decompressed_input_fp):
+def output_program_setup(log_table_fp, read_count):
 
     """
     Writes out the initial settings for the pipeline,
     and initiates the logging
     """
 
-    read_count = get_fastq_read_count(decompressed_input_fp)
-
     setup_text = ['Reads: {}'.format(int(read_count)),
                   '{}\t{}\t{}'.format('Program', 'ElapsedTime', 'Short')]
 
     util_functions.prepend_text_to_file(log_table_fp, setup_text)
 
 
-def get_fastq_read_count(raw_reads_fastq_fh):
+def is_log_table_initiated(log_table_fp):
 
-    """
-    Calculates the read count for a fastq-file,
-    and displays the information to the user
-    """
+    """Evaluates whether the setup information already is written to the log table by an earlier run"""
 
-    format_line_count = 4
+    if not os.path.isfile(log_table_fp):
+        return False
 
-    lines = sum(1 for _ in open(raw_reads_fastq_fh))
-    print('Total sequence count: {}'.format(lines / format_line_count))
-    return lines / format_line_count
+    with open(log_table_fp) as in_fh:
+        return in_fh.readline().startswith('Reads:')
 
 
 def prepare_results_folder(results_folder_path):
@@ -334,6 +444,7 @@ def prepare_results_folder(results_folder_path):
     copy_list.append((FILE_PATH_DICT['visualize_data']['otu_barplot_data'], 'otu_barplot_data.tsv'))
     copy_list.append((FILE_PATH_DICT['indices']['rarefaction_curve'], 'rarefaction.png'))
     copy_list.append((FILE_PATH_DICT['indices']['chao1_curve'], 'chao1.png'))
+    copy_list.append((FILE_PATH_DICT['indices']['alpha_indices'], 'alpha_indices.tsv'))
     copy_list.append((FILE_PATH_DICT['indices']['otu_mapping_table'], 'otu_mapping_table.tsv'))
     copy_list.append((FILE_PATH_DICT['visualize_data']['time_plot'], 'time_plot.pdf'))
 
@@ -32,19 +32,28 @@ class PrinseqWrapper(program_module.ProgramWrapper):
 
     """
     Uses the program Prinseq to clean reads
+    Alternatively the built-in quality filter can be used, applying the same filters
     Outputs cleaned reads
     """
 
     def setup_commands(self, file_path_dict, option_dict=None):
 
+        if option_dict is not None and option_dict.get('streaming'):
+            # Reads are already quality filtered while streamed in the preprocessing module
+            file_path_dict[self._name]['good_output'] = None
+            return
+
         input_fp = file_path_dict['preprocessing']['decompressed_input']
 
         good_output_fp = self.output_dir + 'output_good'
         bad_output_fp = self.output_dir + 'output_bad'
 
-        file_path_dict[self._name]['good_output'] = self.output_dir + 'output_good.fastq'
+        file_path_dict[self._name]['good_output'] = good_output_fp + '.fastq'
 
-        command = get_prinseq_command(self.config_file, input_fp, good_output_fp, bad_output_fp)
+        if option_dict['qc_engine'] == 'native':
+            command = get_native_qc_command(self.config_file, input_fp, good_output_fp, option_dict['cores'])
+        else:
+            command = get_prinseq_command(self.config_file, input_fp, good_output_fp, bad_output_fp)
         self.add_command_entry(command)
 
 
@@ -76,4 +85,31 @@ def get_prinseq_command(config_file, input_file, good_output, bad_output):
     process_command = prinseq + input_command + output_command\
         + trim_command + minlen_command + minqual_command + ns_command  # + derep_command
 
-    return program_module.ProgramCommand(description, short, process_command)
\ No newline at end of file
+    return program_module.ProgramCommand(description, short, process_command,
+                                         inputs=[input_file],
+                                         outputs=[good_output + '.fastq', bad_output + '.fastq'])
+
+
+def get_native_qc_command(config_file, input_file, good_output, processes):
+
+    """
+    Runs the built-in quality filter, performing the same trimming and filtering as Prinseq
+    Only the reads passing the filters are written
+    """
+
+    description = 'Quality filter'
+    short = 'qf'
+
+    command = [config_file['scripts']['quality_filter'],
+               '--input', input_file,
+               '--output', good_output + '.fastq',
+               '--trim_qual', TRIM_QUAL,
+               '--min_len', MIN_LEN,
+               '--min_qual_mean', MIN_QUAL,
+               '--ns_max_p', MAX_NS,
+               '--processes', processes]
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[input_file],
+                                        outputs=[good_output + '.fastq'],
+                                        threads=processes)
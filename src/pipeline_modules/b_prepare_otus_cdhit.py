@@ -20,12 +20,20 @@ You should have received a copy of the GNU General Public License
 along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
+import os
+
 from src.pipeline_modules import program_module
 
 CDHIT_WORD_SIZE = 8
 CDHIT_THREADS = 7
 CDHIT_MEMORY = 8000
 
+KMER_WORD_SIZE = 8
+KMER_BAND_WIDTH = 20
+
+# Files making up an OTU database, as written by Scripts/OTUclustering/otu_database.py
+OTU_DATABASE_FILES = ['otus.fasta', 'kmer_index.npz', 'otu_database.json']
+
 # Development options
 DO_DEREPLICATION = True
 ACCURATE_CLUSTERING = False
@@ -44,76 +52,139 @@ class PrepareOTUsWrapper(program_module.ProgramWrapper):
         clustering_identity = option_dict['otu_cluster_identity']
         chimera_checking = option_dict['chimera_checking']
 
-        # FASTQ to FASTA
-        raw_fastq_fp = file_path_dict['prinseq']['good_output']
-        raw_fasta_fp = self.output_dir + 'raw_reads_fp.fasta'
-        self.add_command_entry(get_fastq_to_fasta_command(self.config_file, raw_fastq_fp, raw_fasta_fp))
+        # FASTQ to FASTA, already performed for streamed reads
+        if option_dict.get('streaming'):
+            raw_fasta_fp = file_path_dict['preprocessing']['streamed_reads']
+            raw_reads_stats_fp = file_path_dict['preprocessing']['stream_stats']
+        else:
+            raw_fastq_fp = file_path_dict['prinseq']['good_output']
+            raw_fasta_fp = self.output_dir + 'raw_reads_fp.fasta'
+            raw_reads_stats_fp = self.get_stats_fp('quality_filtered_reads')
+            self.add_command_entry(get_fastq_to_fasta_command(self.config_file, raw_fastq_fp, raw_fasta_fp,
+                                                              stats_fp=raw_reads_stats_fp))
 
         # Dereplication
         derep_fp = self.output_dir + 'derep_fp.fasta'
         derep_mapping_fp = self.output_dir + 'derep_mapping.txt'
+        derep_stats_fp = None
         if DO_DEREPLICATION:
             # self.add_command_entry(get_derep_command(self.config_file, raw_fasta_fp, derep_fp))
+            derep_stats_fp = self.get_stats_fp('dereplicated_reads')
             self.add_command_entry(get_script_dereplicator_command(self.config_file, raw_fasta_fp, derep_fp,
-                                                                   derep_mapping_fp))
+                                                                   derep_mapping_fp, option_dict['derep_engine'],
+                                                                   option_dict['cores'], stats_fp=derep_stats_fp))
         else:
             self.add_command_entry(get_label_fasta_header_command(self.config_file, raw_fasta_fp, derep_fp))
 
-        # CD-HIT
-        cdhit_out = self.output_dir + 'cdhit'
-        self.add_command_entry(get_run_cdhit_command(self.config_file, derep_fp, cdhit_out,
-                                                     clustering_identity))
+        cluster_mapping_fp = self.output_dir + 'cluster_mapping.txt'
+        raw_otus_stats_fp = self.get_stats_fp('raw_otus')
+        otu_database_dir = option_dict.get('otu_database')
+
+        # Closed-reference mapping against the OTU database, only the remaining sequences are clustered de novo
+        cluster_input_fp = derep_fp
+        reference_names_fp = None
+        if otu_database_dir is not None:
+            reference_otu_fasta = self.output_dir + 'reference_otus.fasta'
+            reference_abund_table = reference_otu_fasta + '.table'
+            reference_mapping_fp = self.output_dir + 'reference_cluster_mapping.txt'
+            reference_names_fp = self.output_dir + 'reference_otu_names.txt'
+            cluster_input_fp = self.output_dir + 'unmapped_derep.fasta'
+            self.add_command_entry(get_map_to_otu_database_command(self.config_file, derep_fp, otu_database_dir,
+                                                                   reference_otu_fasta, reference_abund_table,
+                                                                   reference_mapping_fp, reference_names_fp,
+                                                                   cluster_input_fp, clustering_identity,
+                                                                   option_dict['cores']))
+
+            clustered_mapping_fp = self.output_dir + 'denovo_cluster_mapping.txt'
+            clustered_stats_fp = None
+        else:
+            clustered_mapping_fp = cluster_mapping_fp
+            clustered_stats_fp = raw_otus_stats_fp
+
+        cdhit_clusters = None
+        if option_dict['cluster_engine'] == 'kmer':
+
+            # Built-in clustering, directly writing the abundancy table and cluster mapping
+            clustered_otu_fasta = self.output_dir + 'kmer_otus.fasta'
+            clustered_abund_table = clustered_otu_fasta + '.table'
+            self.add_command_entry(get_kmer_clustering_command(self.config_file, cluster_input_fp,
+                                                               clustered_otu_fasta, clustered_abund_table,
+                                                               clustered_mapping_fp, clustering_identity,
+                                                               option_dict['cores'], stats_fp=clustered_stats_fp))
+        else:
 
-        # Create name mapping
-        name_mapping = self.output_dir + 'otu_name_mapping.txt'
-        self.add_command_entry(get_generate_otu_names_command(self.config_file,
-                                                              cdhit_out, name_mapping))
+            # CD-HIT
+            cdhit_out = self.output_dir + 'cdhit'
+            self.add_command_entry(get_run_cdhit_command(self.config_file, cluster_input_fp, cdhit_out,
+                                                         clustering_identity))
+            clustered_otu_fasta = cdhit_out
+            clustered_abund_table = None
+            cdhit_clusters = cdhit_out + '.clstr'
+
+            # The reference OTUs are merged with tables, otherwise the clusters are parsed in post-processing
+            if otu_database_dir is not None:
+                clustered_abund_table = cdhit_out + '.table'
+                self.add_command_entry(get_cdhit_parser_command(self.config_file, cdhit_clusters,
+                                                                clustered_abund_table, clustered_mapping_fp))
+                cdhit_clusters = None
+
+        if otu_database_dir is not None:
+            raw_otu_fasta = self.output_dir + 'raw_otus.fasta'
+            raw_abund_table = raw_otu_fasta + '.table'
+            self.add_command_entry(get_merge_reference_otus_command(self.config_file,
+                                                                    [reference_otu_fasta, reference_abund_table,
+                                                                     reference_mapping_fp],
+                                                                    [clustered_otu_fasta, clustered_abund_table,
+                                                                     clustered_mapping_fp],
+                                                                    [raw_otu_fasta, raw_abund_table,
+                                                                     cluster_mapping_fp],
+                                                                    stats_fp=raw_otus_stats_fp))
+        else:
+            raw_otu_fasta = clustered_otu_fasta
+            raw_abund_table = clustered_abund_table
 
-        # Extract abundancy table
-        cdhit_clusters = cdhit_out + '.clstr'
-        raw_otu_fasta = cdhit_out
-        raw_abund_table = cdhit_out + '.table'
-        cluster_mapping_fp = self.output_dir + 'cluster_mapping.txt'
-        self.add_command_entry(get_cdhit_parser_command(self.config_file, cdhit_clusters, raw_abund_table,
-                                                        cluster_mapping_fp))
-
-        # Filter OTUs based on abundancy
-        otu_fasta_abund_filtered = self.output_dir + 'otus.fasta'
-        otu_abund_table_abund_filtered = self.output_dir + 'otus_abundancies.fasta.filtered'
-        self.add_command_entry(get_filter_otu_command(self.config_file, raw_otu_fasta,
-                               raw_abund_table,
-                               otu_fasta_abund_filtered,
-                               otu_abund_table_abund_filtered,
-                               filter_threshold))
+        if chimera_checking not in ['vsearch', 'none']:
+            raise Exception('Unknown chimera checking option: {}'.format(chimera_checking))
 
+        # Name, abundance filter and rename the OTUs in a single pass
+        # With chimera checking the renamed OTUs are checked before becoming the final OTUs
+        name_mapping = self.output_dir + 'otu_name_mapping.txt'
+        renamed_otu_abund_table = self.output_dir + 'renamed_otu.table'
+        renamed_otu_fasta = self.output_dir + 'renamed_otu.fasta'
+        if chimera_checking == 'vsearch':
+            otu_fasta_abund_filtered = self.output_dir + 'otus.fasta'
+        else:
+            otu_fasta_abund_filtered = renamed_otu_fasta
+        abund_filtered_stats_fp = self.get_stats_fp('abundance_filtered_otus')
+
+        self.add_command_entry(get_postprocess_otus_command(self.config_file, raw_otu_fasta,
+                                                            otu_fasta_abund_filtered,
+                                                            renamed_otu_abund_table,
+                                                            name_mapping,
+                                                            filter_threshold,
+                                                            cdhit_clusters=cdhit_clusters,
+                                                            cluster_mapping_fp=cluster_mapping_fp,
+                                                            raw_table_fp=raw_abund_table,
+                                                            otu_database_dir=otu_database_dir,
+                                                            reference_names_fp=reference_names_fp,
+                                                            raw_stats_fp=clustered_stats_fp,
+                                                            stats_fp=abund_filtered_stats_fp))
+
+        # Perform chimeric checking, writing the non-chimeric OTUs as the final OTUs
         chimera_checked_otu_fasta = None
         if chimera_checking == 'vsearch':
-
-            # Perform chimeric checking
-            chimera_checked_otu_fasta = self.output_dir + 'non_chimeric_fp.fasta'
+            chimera_checked_otu_fasta = renamed_otu_fasta
             self.add_command_entry(get_chimera_checking_command(self.config_file,
                                                                 otu_fasta_abund_filtered,
                                                                 chimera_checked_otu_fasta))
-            rename_otu_input = chimera_checked_otu_fasta
-        elif chimera_checking == 'none':
 
-            rename_otu_input = otu_fasta_abund_filtered
-        else:
-            raise Exception('Unknown chimera checking option: {}'.format(chimera_checking))
-
-        # Rename OTU fasta and list, filter table to match OTU fasta
-
-        renamed_otu_abund_table = self.output_dir + 'renamed_otu.table'
-        renamed_otu_fasta = self.output_dir + 'renamed_otu.fasta'
-        self.add_command_entry(get_rename_otus_command(self.config_file,
-                                                       rename_otu_input,
-                                                       otu_abund_table_abund_filtered,
-                                                       renamed_otu_fasta,
-                                                       renamed_otu_abund_table,
-                                                       name_mapping))
+        # Add the new OTUs to the OTU database for later runs
+        if otu_database_dir is not None:
+            self.add_command_entry(get_update_otu_database_command(self.config_file, renamed_otu_fasta,
+                                                                   name_mapping, otu_database_dir))
 
         file_path_dict[self._name]['derep_seq'] = derep_fp
-        file_path_dict[self._name]['cdhit_raw_otus'] = cdhit_out
+        file_path_dict[self._name]['cdhit_raw_otus'] = raw_otu_fasta
         file_path_dict[self._name]['raw_otu_table'] = raw_abund_table
         file_path_dict[self._name]['abund_filteted_otus'] = otu_fasta_abund_filtered
         file_path_dict[self._name]['chimera_checked_otus'] = chimera_checked_otu_fasta
@@ -124,8 +195,15 @@ class PrepareOTUsWrapper(program_module.ProgramWrapper):
         file_path_dict[self._name]['cluster_mapping'] = cluster_mapping_fp
         file_path_dict[self._name]['otu_name_mapping'] = name_mapping
 
+        # Vsearch writes no stats, the chimera checked OTUs are counted from the final OTU file
+        file_path_dict[self._name]['quality_filtered_stats'] = raw_reads_stats_fp
+        file_path_dict[self._name]['derep_stats'] = derep_stats_fp
+        file_path_dict[self._name]['raw_otus_stats'] = raw_otus_stats_fp
+        file_path_dict[self._name]['abund_filtered_stats'] = abund_filtered_stats_fp
+        file_path_dict[self._name]['chimera_checked_stats'] = None
+
 
-def get_fastq_to_fasta_command(config, fastq_fp, fasta_fp):
+def get_fastq_to_fasta_command(config, fastq_fp, fasta_fp, stats_fp=None):
 
     """
     Command for converting the input files from fastq to fasta format
@@ -141,7 +219,9 @@ def get_fastq_to_fasta_command(config, fastq_fp, fasta_fp):
                '--extract_label'
                ]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=[fastq_fp],
+                                        outputs=[fasta_fp] + get_stats_outputs(stats_fp))
 
 
 def get_derep_command(config, raw_reads_fp, dereplicated_fp):
@@ -157,13 +237,18 @@ def get_derep_command(config, raw_reads_fp, dereplicated_fp):
 
     command = [config['programs']['dereplicate'], raw_reads_fp, dereplicated_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[raw_reads_fp],
+                                         outputs=[dereplicated_fp])
 
 
-def get_script_dereplicator_command(config, raw_reads_fp, dereplicated_fp, mapping_fp):
+def get_script_dereplicator_command(config, raw_reads_fp, dereplicated_fp, mapping_fp, engine, processes,
+                                    stats_fp=None):
 
     """
     Home-made dereplication script
+    The engine determines how the unique sequences are stored, all engines give the same output
+    Only the external and sharded engines use multiple processes
     """
 
     description = 'Dereplicate script'
@@ -174,9 +259,18 @@ def get_script_dereplicator_command(config, raw_reads_fp, dereplicated_fp, mappi
     command = [config['scripts']['script_dereplicator'],
                '--input', raw_reads_fp,
                '--output', dereplicated_fp,
-               '--mapping_file', mapping_fp]
+               '--mapping_file', mapping_fp,
+               '--engine', engine]
 
-    return program_module.ProgramCommand(description, short, command)
+    threads = 1
+    if engine in ['external', 'sharded']:
+        command += ['--processes', processes]
+        threads = processes
+
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=[raw_reads_fp],
+                                        outputs=[dereplicated_fp, mapping_fp] + get_stats_outputs(stats_fp),
+                                        threads=threads)
 
 
 def get_label_fasta_header_command(config, raw_reads_fp, labelled_fp):
@@ -196,7 +290,9 @@ def get_label_fasta_header_command(config, raw_reads_fp, labelled_fp):
                '-o', labelled_fp,
                '-l', label]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[raw_reads_fp],
+                                        outputs=[labelled_fp])
 
 
 def get_run_cdhit_command(config, input_reads_fp, output_otus_fp, clustering_identity):
@@ -224,24 +320,182 @@ def get_run_cdhit_command(config, input_reads_fp, output_otus_fp, clustering_ide
         command.append(1)
         print('CD-HIT command: {}'.format(command))
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[input_reads_fp],
+                                         outputs=[output_otus_fp, output_otus_fp + '.clstr'],
+                                         threads=CDHIT_THREADS)
+
+
+def get_kmer_clustering_command(config, input_reads_fp, output_otus_fp, output_table_fp, cluster_mapping_fp,
+                                clustering_identity, processes, stats_fp=None):
+
+    """
+    Built-in greedy clustering of sequences into OTUs
+    Writes the OTU abundancy table and the cluster mapping without a CD-HIT parsing step
+    """
+
+    description = 'K-mer clustering'
+    short = 'KC'
+
+    command = [config['scripts']['kmer_clustering'],
+               '--input', input_reads_fp,
+               '--output', output_otus_fp,
+               '--table', output_table_fp,
+               '--seq_matrix', cluster_mapping_fp,
+               '--identity', clustering_identity,
+               '--word_size', KMER_WORD_SIZE,
+               '--band', KMER_BAND_WIDTH,
+               '--processes', processes]
+
+    if ACCURATE_CLUSTERING:
+        command.append('--accurate')
+
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=[input_reads_fp],
+                                        outputs=[output_otus_fp, output_table_fp, cluster_mapping_fp]
+                                        + get_stats_outputs(stats_fp),
+                                        threads=processes)
+
+
+def get_postprocess_otus_command(config, raw_otus_fp, filtered_otus_fp, filtered_table_fp, name_mapping_fp,
+                                 filter_threshold, cdhit_clusters=None, cluster_mapping_fp=None, raw_table_fp=None,
+                                 otu_database_dir=None, reference_names_fp=None, raw_stats_fp=None, stats_fp=None):
 
+    """
+    Names, abundance filters and renames the raw OTUs in a single step
+    The OTU counts are parsed from the CD-HIT clusters, also writing the cluster mapping, or read from the OTU table
+    """
 
-def get_generate_otu_names_command(config, raw_otus, otu_name_map):
+    description = 'Post-process OTUs'
+    short = 'pO'
+
+    command = [config['scripts']['postprocess_otus'],
+               '--input', raw_otus_fp,
+               '--name_mapping', name_mapping_fp,
+               '--output_fasta', filtered_otus_fp,
+               '--output_table', filtered_table_fp,
+               '--threshold', filter_threshold]
+
+    inputs = [raw_otus_fp]
+    outputs = [filtered_otus_fp, filtered_table_fp, name_mapping_fp]
+    if cdhit_clusters is not None:
+        command += ['--clusters', cdhit_clusters,
+                    '--cluster_mapping', cluster_mapping_fp]
+        inputs.append(cdhit_clusters)
+        outputs.append(cluster_mapping_fp)
+        if raw_stats_fp is not None:
+            command += ['--raw_stats', raw_stats_fp]
+            outputs.append(raw_stats_fp)
+    else:
+        command += ['--table', raw_table_fp]
+        inputs.append(raw_table_fp)
+
+    if otu_database_dir is not None:
+        command += ['--otu_database', otu_database_dir,
+                    '--reference_names', reference_names_fp]
+        inputs += [reference_names_fp] + get_existing_otu_database_files(otu_database_dir)
+
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=inputs,
+                                        outputs=outputs + get_stats_outputs(stats_fp))
+
+
+def get_map_to_otu_database_command(config, derep_fp, otu_database_dir, reference_otus_fp, reference_table_fp,
+                                    reference_mapping_fp, reference_names_fp, unmapped_fp, clustering_identity,
+                                    processes):
 
-    """Generates mapping table between old and newly generated OTU names"""
+    """
+    Maps the dereplicated sequences to the OTUs in the OTU database
+    The database files are declared as inputs, so that cached results are only used for the same database
+    """
 
-    description = 'Generate otu names'
-    short = 'GOn'
+    description = 'Map to OTU database'
+    short = 'mOd'
+
+    command = [config['scripts']['map_to_otu_database'],
+               '--input', derep_fp,
+               '--database', otu_database_dir,
+               '--mapped_otus', reference_otus_fp,
+               '--mapped_table', reference_table_fp,
+               '--mapped_clusters', reference_mapping_fp,
+               '--reference_names', reference_names_fp,
+               '--unmapped', unmapped_fp,
+               '--identity', clustering_identity,
+               '--word_size', KMER_WORD_SIZE,
+               '--band', KMER_BAND_WIDTH,
+               '--processes', processes]
 
-    command = [config['scripts']['generate_otu_names'],
-               '--input', raw_otus,
-               '--output', otu_name_map]
+    if ACCURATE_CLUSTERING:
+        command.append('--accurate')
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[derep_fp] + get_existing_otu_database_files(otu_database_dir),
+                                        outputs=[reference_otus_fp, reference_table_fp, reference_mapping_fp,
+                                                 reference_names_fp, unmapped_fp],
+                                        threads=processes)
 
 
-def get_cdhit_parser_command(config, input_mapping_matrix_fp, output_mapping_table_fp, cluster_mapping_fp):
+def get_merge_reference_otus_command(config, reference_fps, denovo_fps, output_fps, stats_fp=None):
+
+    """
+    Merges the OTUs mapped to the OTU database with the de novo clustered OTUs
+    Each file list holds the OTU FASTA, the OTU abundancy table and the cluster mapping
+    """
+
+    description = 'Merge reference OTUs'
+    short = 'mrO'
+
+    command = [config['scripts']['merge_reference_otus'],
+               '--reference_otus', reference_fps[0],
+               '--reference_table', reference_fps[1],
+               '--reference_clusters', reference_fps[2],
+               '--denovo_otus', denovo_fps[0],
+               '--denovo_table', denovo_fps[1],
+               '--denovo_clusters', denovo_fps[2],
+               '--output_otus', output_fps[0],
+               '--output_table', output_fps[1],
+               '--output_clusters', output_fps[2]]
+
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=reference_fps + denovo_fps,
+                                        outputs=output_fps + get_stats_outputs(stats_fp))
+
+
+def get_update_otu_database_command(config, final_otus_fp, name_mapping_fp, otu_database_dir):
+
+    """
+    Adds the final OTUs of the run to the OTU database
+    The database files present when the run is set up are declared as inputs as well as outputs,
+    so a cached update is only restored onto the same earlier database
+    """
+
+    description = 'Update OTU database'
+    short = 'uOd'
+
+    command = [config['scripts']['update_otu_database'],
+               '--database', otu_database_dir,
+               '--otus', final_otus_fp,
+               '--name_mapping', name_mapping_fp,
+               '--word_size', KMER_WORD_SIZE]
+
+    inputs = [final_otus_fp, name_mapping_fp] + get_existing_otu_database_files(otu_database_dir)
+    outputs = [os.path.join(otu_database_dir, file_name) for file_name in OTU_DATABASE_FILES]
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=inputs,
+                                        outputs=outputs)
+
+
+def get_existing_otu_database_files(otu_database_dir):
+
+    """The files of the OTU database present when the run is set up, none for a new database"""
+
+    database_fps = [os.path.join(otu_database_dir, file_name) for file_name in OTU_DATABASE_FILES]
+    return [database_fp for database_fp in database_fps if os.path.isfile(database_fp)]
+
+
+def get_cdhit_parser_command(config, input_mapping_matrix_fp, output_mapping_table_fp, cluster_mapping_fp,
+                             stats_fp=None):
 
     """
     Extracts OTU counts from CDHIT mapping table and outputs them
@@ -257,26 +511,10 @@ def get_cdhit_parser_command(config, input_mapping_matrix_fp, output_mapping_tab
                '--count_dereplicated',
                '--seq_matrix', cluster_mapping_fp]
 
-    return program_module.ProgramCommand(description, short, command)
-
-
-def get_filter_otu_command(config, complete_otu_fp, otu_abundancy_fp, output_fp, abund_filt_fp, filter_threshold):
-
-    """
-    Filters the otus based on mapped read count
-    """
-
-    description = 'Abund. filtering'
-    short = 'af'
-
-    command = [config['scripts']['filter_otus'],
-               '-i', complete_otu_fp,
-               '-m', otu_abundancy_fp,
-               '-o', output_fp,
-               '-t', filter_threshold,
-               '-O', abund_filt_fp]
-
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command + get_stats_option(stats_fp),
+                                        inputs=[input_mapping_matrix_fp],
+                                        outputs=[output_mapping_table_fp, cluster_mapping_fp]
+                                        + get_stats_outputs(stats_fp))
 
 
 def get_chimera_checking_command(config, unchecked_fp, non_chimeric_fp):
@@ -295,25 +533,19 @@ def get_chimera_checking_command(config, unchecked_fp, non_chimeric_fp):
                '-uchimeout', str(non_chimeric_fp + '.OUTPUT'),
                '-nonchimeras', non_chimeric_fp]
 
-    return program_module.ProgramCommand(description, short, command)
-
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[unchecked_fp],
+                                         outputs=[non_chimeric_fp, non_chimeric_fp + '.OUTPUT'])
 
-def get_rename_otus_command(config, input_otus, input_table, renamed_fasta, renamed_table, name_mapping):
 
-    """
-    Renames OTUs in fasta-file and abundancy matrix
-    Outputs then as 'output.fasta' and 'output.table'
-    """
+def get_stats_option(stats_fp):
 
-    description = 'Rename otus'
-    short = 'rO'
+    """Option letting a script write the number of records it outputs to a stats sidecar"""
 
-    command = [config['scripts']['rename_otus'],
-               '--fasta', input_otus,
-               '--table', input_table,
-               '--output_fasta', renamed_fasta,
-               '--output_table', renamed_table,
-               '--name_mapping', name_mapping]
+    if stats_fp is None:
+        return []
+    return ['--stats', stats_fp]
 
-    return program_module.ProgramCommand(description, short, command)
 
+def get_stats_outputs(stats_fp):
+    return [stats_fp] if stats_fp is not None else []
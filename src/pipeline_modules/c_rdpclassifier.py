@@ -90,7 +90,9 @@ def get_rdp_command(config, input_fp, fixed_rank_fp, significant_taxa_fp, signif
     command += train_option
     command += [input_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[input_fp],
+                                         outputs=[fixed_rank_fp, significant_taxa_fp])
 
 
 def get_create_color_tables_command(config, fixed_rdp_output_fp, otu_color_taxa_table, taxa_color_table):
@@ -105,7 +107,9 @@ def get_create_color_tables_command(config, fixed_rdp_output_fp, otu_color_taxa_
                '--otu_color_taxa',  otu_color_taxa_table,
                '--taxa_color',      taxa_color_table]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[fixed_rdp_output_fp],
+                                        outputs=[otu_color_taxa_table, taxa_color_table])
 
 
 def get_extract_otu_tax_rank_command(config, fixed_rank, taxa_otu_rank, otu_taxa_labels, abund_table,
@@ -138,4 +142,6 @@ def get_extract_otu_tax_rank_command(config, fixed_rank, taxa_otu_rank, otu_taxa
     elif rdp_database == '18S':
         command += ['--depth', base_depth + 1]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[fixed_rank, abund_table],
+                                        outputs=[taxa_otu_rank, otu_taxa_labels])
@@ -42,11 +42,13 @@ class PynastWrapper(program_module.ProgramWrapper):
         raw_otus = file_path_dict['prepare_otus']['final_otus']
         otu_taxa_table = file_path_dict['rdp_classifier']['otu_significant_taxa']
         abundancy_matrix = file_path_dict['prepare_otus']['filtered_otu_abundancy']
-        self.add_command_entry(get_filter_bad_taxa_command(self.config_file, raw_otus, abundancy_matrix,
-                                                           otu_taxa_table, self.output_dir))
-
         filtered_otus = self.output_dir + raw_otus.split('/')[-1] + TAX_FILTER_SUFFIX
         filtered_abundance = self.output_dir + abundancy_matrix.split('/')[-1] + TAX_FILTER_SUFFIX
+        taxa_filtered_stats_fp = self.get_stats_fp('taxa_filtered_otus')
+        self.add_command_entry(get_filter_bad_taxa_command(self.config_file, raw_otus, abundancy_matrix,
+                                                           otu_taxa_table, filtered_otus, filtered_abundance,
+                                                           taxa_filtered_stats_fp))
+
         annotated_otus = filtered_otus + '.annotated'
         annotated_abundance = filtered_abundance + '.annotated'
         full_otu_annotation = file_path_dict['rdp_classifier']['rdp_otu_taxa']
@@ -74,13 +76,15 @@ class PynastWrapper(program_module.ProgramWrapper):
                                                          pynast_alignment_phylip_reduced))
 
         file_path_dict['pynast']['taxa_filtered_otus'] = filtered_otus
+        file_path_dict['pynast']['taxa_filtered_stats'] = taxa_filtered_stats_fp
         file_path_dict['pynast']['taxa_filtered_otu_abundancies'] = filtered_abundance
         file_path_dict['pynast']['final_alignment'] = pynast_alignment_phylip_reduced
         file_path_dict['pynast']['annotated_otus'] = annotated_otus
         file_path_dict['pynast']['annotated_abundance'] = annotated_abundance
 
 
-def get_filter_bad_taxa_command(config, raw_otus, abundancy_matrix, otu_taxa_table, output_dir):
+def get_filter_bad_taxa_command(config, raw_otus, abundancy_matrix, otu_taxa_table,
+                                filtered_otus, filtered_abundance, stats_fp):
 
     """
     Filters out OTUs whose taxa is determined with low confidence
@@ -94,11 +98,14 @@ def get_filter_bad_taxa_command(config, raw_otus, abundancy_matrix, otu_taxa_tab
     command = [config['scripts']['filter_poor_taxa'],
                '--input', raw_otus,
                '--taxa_table', otu_taxa_table,
-               '--suffix', TAX_FILTER_SUFFIX,
                '--abund_matrix', abundancy_matrix,
-               '--output_dir', output_dir]
+               '--output', filtered_otus,
+               '--output_abund_matrix', filtered_abundance,
+               '--stats', stats_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[raw_otus, otu_taxa_table, abundancy_matrix],
+                                        outputs=[filtered_otus, filtered_abundance, stats_fp])
 
 
 def get_annotate_otus_command(config, raw_otus, raw_abundance, annotated_otus, annotated_abundance,
@@ -119,7 +126,9 @@ def get_annotate_otus_command(config, raw_otus, raw_abundance, annotated_otus, a
                '--annotated_abundancy', annotated_abundance,
                '--fixed_rank_annotation', fixed_rank_annotation]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[raw_otus, raw_abundance, taxa_otu_rank, fixed_rank_annotation],
+                                        outputs=[annotated_otus, annotated_abundance])
 
 
 def get_pynast_command(config, filtered_otus, pynast_alignment_fasta, pynast_log, pynast_failed,
@@ -147,7 +156,9 @@ def get_pynast_command(config, filtered_otus, pynast_alignment_fasta, pynast_log
                '-g', pynast_log,
                '-f', pynast_failed]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[filtered_otus],
+                                         outputs=[pynast_alignment_fasta, pynast_log, pynast_failed])
 
 
 def get_convert_to_phylip_command(config, pynast_alignment_fasta, pynast_alignment_phylip):
@@ -161,7 +172,9 @@ def get_convert_to_phylip_command(config, pynast_alignment_fasta, pynast_alignme
                '--input_fasta', pynast_alignment_fasta,
                '--output_phylip', pynast_alignment_phylip]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[pynast_alignment_fasta],
+                                        outputs=[pynast_alignment_phylip])
 
 
 def get_reduce_phylip_command(config, phylip_alignment, phylip_alignment_reduced):
@@ -175,4 +188,6 @@ def get_reduce_phylip_command(config, phylip_alignment, phylip_alignment_reduced
                '-i', phylip_alignment,
                '-o', phylip_alignment_reduced]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[phylip_alignment],
+                                        outputs=[phylip_alignment_reduced])
@@ -20,6 +20,8 @@ You should have received a copy of the GNU General Public License
 along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
+import os
+
 from src.pipeline_modules import program_module
 
 
@@ -41,15 +43,18 @@ class BuildTreeModule(program_module.ProgramWrapper):
             tree_fp = self.output_dir + 'fast_tree.tre'
             self.add_command_entry(get_fast_tree_command(self.config_file, pynast_alignment_fp, tree_fp))
         elif tree_software == 'raxml':
-            tree_fp = self.output_dir + 'RAxML_bestTree.raxml_tree.tre'
-            self.add_command_entry(get_raxml_command(self.config_file, pynast_alignment_fp, self.output_dir))
+            # RAxML writes all its files into a working directory of its own
+            raxml_dir = self.output_dir + 'raxml/'
+            os.makedirs(raxml_dir, exist_ok=True)
+            tree_fp = raxml_dir + 'RAxML_bestTree.raxml_tree.tre'
+            self.add_command_entry(get_raxml_command(self.config_file, pynast_alignment_fp, raxml_dir))
         else:
             raise ValueError('Tree software: {} must match either "fasttree" or "raxml"!'.format(tree_software))
 
         otu_color_taxa_table = file_path_dict['rdp_classifier']['otu_color_taxa_table']
 
         # Run ETE to create tree rendering
-        ete_output = self.path_generator('output') + 'fasttree'
+        ete_output = self.path_generator('output') + 'fasttree.svg'
         otu_abundance_information_fp = file_path_dict['pynast']['taxa_filtered_otu_abundancies']
         labels_fp = file_path_dict['rdp_classifier']['itol_labels']
         self.add_command_entry(get_ete_command(self.config_file, tree_fp, ete_output, otu_abundance_information_fp,
@@ -70,12 +75,17 @@ def get_fast_tree_command(config, input_alignment_fp, output_tree_fp):
                '--output', output_tree_fp,
                '--fasttree_path', config['programs']['fasttree']]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[input_alignment_fp],
+                                        outputs=[output_tree_fp])
 
 
 def get_raxml_command(config, input_alignment_fp, output_dir):
 
-    """Produces a tree file from a PyNAST alignment using Fast Tree"""
+    """
+    Produces a tree file from a PyNAST alignment using RAxML
+    The command is a barrier, as RAxML may write further files into its working directory
+    """
 
     description = 'RAxML'
     short = 'Rx'
@@ -91,7 +101,15 @@ def get_raxml_command(config, input_alignment_fp, output_dir):
                '-n', raxml_out_name,
                '-w', output_dir]
 
-    return program_module.ProgramCommand(description, short, command)
+    # Only the files written by every run are declared, as the resume checkpoint requires all of them
+    # RAxML refuses to run if its info file already exists, which is removed before a re-run
+    raxml_outputs = ['{}RAxML_{}.{}'.format(output_dir, output_type, raxml_out_name)
+                     for output_type in ['bestTree', 'info']]
+
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[input_alignment_fp],
+                                         outputs=raxml_outputs,
+                                         barrier=True)
 
 
 def get_ete_command(config, input_tree_fp, output_tree_pic_fp,
@@ -109,4 +127,6 @@ def get_ete_command(config, input_tree_fp, output_tree_pic_fp,
                '--abundancies', otu_abund_fp,
                '--color_taxa', color_strap_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ProgramCommand(description, short, command,
+                                         inputs=[input_tree_fp, otu_abund_fp, color_strap_fp, labels_fp],
+                                         outputs=[output_tree_pic_fp])
@@ -24,6 +24,7 @@ from src.pipeline_modules import program_module
 
 SAMPLE_STEPS = 30
 SAMPLE_REPLICATES = 3
+SAMPLE_SEED = 12345
 
 
 class IndicesWrapper(program_module.ProgramWrapper):
@@ -34,34 +35,46 @@ class IndicesWrapper(program_module.ProgramWrapper):
     Currently calculates:
         - Chao1 index
         - Rarefaction
+        - Table with observed OTUs, Chao1, ACE, Shannon, Simpson, Pielou evenness and Good's coverage
     """
 
     def setup_commands(self, file_path_dict, option_dict=None):
 
         otu_mapping_table = self.output_dir + 'otu_mapping_table.txt'
+        otu_mapping_binary = self.output_dir + 'otu_mapping_table.bin'
 
         derep_mapping_fp = file_path_dict['prepare_otus']['derep_mapping']
         cluster_mapping_fp = file_path_dict['prepare_otus']['cluster_mapping']
         name_mapping_table_fp = file_path_dict['prepare_otus']['otu_name_mapping']
         self.add_command_entry(get_create_otu_table_command(self.config_file, cluster_mapping_fp, derep_mapping_fp,
-                                                            name_mapping_table_fp, otu_mapping_table))
+                                                            name_mapping_table_fp, otu_mapping_table,
+                                                            otu_mapping_binary))
 
         plot_rarefaction_fp = self.output_dir + 'rarefaction.png'
         plot_chao_fp = self.output_dir + 'chao.png'
 
         self.add_command_entry(get_generate_alpha_plots_command(self.config_file, plot_rarefaction_fp,
-                                                                plot_chao_fp, otu_mapping_table))
+                                                                plot_chao_fp, otu_mapping_binary,
+                                                                option_dict['cores'],
+                                                                option_dict['incremental_rarefaction']))
+
+        alpha_indices_fp = self.output_dir + 'alpha_indices.tsv'
+        self.add_command_entry(get_alpha_indices_command(self.config_file, otu_mapping_binary, alpha_indices_fp))
 
         file_path_dict[self._name]['rarefaction_curve'] = plot_rarefaction_fp
         file_path_dict[self._name]['chao1_curve'] = plot_chao_fp
+        file_path_dict[self._name]['alpha_indices'] = alpha_indices_fp
 
         file_path_dict[self._name]['otu_mapping_table'] = otu_mapping_table
+        file_path_dict[self._name]['otu_mapping_binary'] = otu_mapping_binary
 
 
-def get_create_otu_table_command(config, cluster_mapping, derep_mapping, name_mapping_table, otu_table):
+def get_create_otu_table_command(config, cluster_mapping, derep_mapping, name_mapping_table, otu_table,
+                                 otu_table_binary):
 
     """
     Creates OTU table where counts in separate samples are mapped to the different OTUs
+    The table is written both as text and in the binary format read by the later steps
     """
 
     description = 'OTU-table'
@@ -71,14 +84,21 @@ def get_create_otu_table_command(config, cluster_mapping, derep_mapping, name_ma
                '--cluster_mapping', cluster_mapping,
                '--derep_mapping', derep_mapping,
                '--name_mapping', name_mapping_table,
-               '--output', otu_table]
+               '--output', otu_table,
+               '--binary_output', otu_table_binary]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[cluster_mapping, derep_mapping, name_mapping_table],
+                                        outputs=[otu_table, otu_table_binary])
 
 
-def get_generate_alpha_plots_command(config, plot_rar, plot_chao, otu_mapping_table):
+def get_generate_alpha_plots_command(config, plot_rar, plot_chao, otu_mapping_table, processes, incremental=False):
 
-    """Runs the preliminary chao1/rarefaction calculating script"""
+    """
+    Runs the preliminary chao1/rarefaction calculating script
+    The samples are divided between the processes, and a fixed seed keeps the plots reproducible
+    With incremental, the Chao1 curve of each replicate is read off a single shuffling of the reads
+    """
 
     description = 'Chao1'
     short = 'PC'
@@ -88,6 +108,31 @@ def get_generate_alpha_plots_command(config, plot_rar, plot_chao, otu_mapping_ta
                '--plot_chao',           plot_chao,
                '--samplepoints',        SAMPLE_STEPS,
                '--replicates',          SAMPLE_REPLICATES,
+               '--exact',
+               '--processes',           processes,
+               '--seed',                SAMPLE_SEED,
                '--otu_mapping_table',   otu_mapping_table]
 
-    return program_module.ProgramCommand(description, short, command)
+    if incremental:
+        command.append('--incremental')
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[otu_mapping_table],
+                                        outputs=[plot_rar, plot_chao],
+                                        threads=processes)
+
+
+def get_alpha_indices_command(config, otu_mapping_table, alpha_indices):
+
+    """Calculates a table of alpha diversity indices for all samples"""
+
+    description = 'Alpha indices'
+    short = 'AI'
+
+    command = [config['scripts']['alpha_indices'],
+               '--otu_table',   otu_mapping_table,
+               '--output',      alpha_indices]
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[otu_mapping_table],
+                                        outputs=[alpha_indices])
@@ -29,7 +29,7 @@ class CreateBarplotsWrapper(program_module.ProgramWrapper):
 
         out_dir = self.output_dir
 
-        otu_mapping_table_fp = file_path_dict['indices']['otu_mapping_table']
+        otu_mapping_table_fp = file_path_dict['indices']['otu_mapping_binary']
 
         # Create barplot data
         taxa_otu_rank = file_path_dict['rdp_classifier']['otu_significant_taxa']
@@ -41,20 +41,21 @@ class CreateBarplotsWrapper(program_module.ProgramWrapper):
         taxa_color_table = file_path_dict['rdp_classifier']['taxa_color_table']
 
         # Create taxa barplot (clusters)
-        matplotlib_out_fp = self.path_generator('output') + 'otu_barplot'
+        matplotlib_out_fp = self.path_generator('output') + 'otu_barplot.png'
         self.add_command_entry(get_taxa_barplot_command(self.config_file, tax_count_table, matplotlib_out_fp,
                                                         taxa_color_table, plot_relative_abundance=True,
                                                         title='OTU counts (Phylum/Class)', 
                                                         ylabel='OTU count (fraction)'))
 
         # Create taxa barplot (abundance)
-        matplotlib_out_abund = self.path_generator('output') + 'abundance_barplot'
+        matplotlib_out_abund = self.path_generator('output') + 'abundance_barplot.png'
         self.add_command_entry(get_taxa_barplot_command(self.config_file, tax_abund_table, matplotlib_out_abund,
                                                         taxa_color_table, plot_relative_abundance=True,
                                                         title='Read counts (Phylum/Class)',
                                                         ylabel='Read count (fraction)'))
 
         # Create timeplot
+        # Declares no files as it reads the log of all previously run commands
         time_data_fp = file_path_dict['input']['log_table']
         time_visualization_fp = self.output_dir + 'time_plot.pdf'
         self.add_command_entry(get_timeplot_command(self.config_file, time_data_fp, time_visualization_fp))
@@ -77,7 +78,9 @@ def get_create_barplot_data_command(config, taxa_otu_rank, otu_sample_table, tax
                '--barplot_cluster', tax_count_table,
                '--barplot_abund', tax_abund_table]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[taxa_otu_rank, otu_sample_table],
+                                        outputs=[tax_count_table, tax_abund_table])
 
 
 def get_taxa_barplot_command(config, tax_count_table_fp, matlibplot_out_fp, taxa_color_table,
@@ -98,7 +101,9 @@ def get_taxa_barplot_command(config, tax_count_table_fp, matlibplot_out_fp, taxa
     if plot_relative_abundance:
         command.append('--relative_abundance')
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[tax_count_table_fp, taxa_color_table],
+                                        outputs=[matlibplot_out_fp])
 
 
 def get_timeplot_command(config, log_table_fp, timeplot_fp):
@@ -112,4 +117,4 @@ def get_timeplot_command(config, log_table_fp, timeplot_fp):
                '-i', log_table_fp,
                '-o', timeplot_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command)
@@ -21,12 +21,15 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 from src.pipeline_modules import program_module
+from src.pipeline_modules import a_prinseq
 
 
 class PreprocessingWrapper(program_module.ProgramWrapper):
 
     """
     Data processing performed before the processing steps
+    In streaming mode, decompression, merging, quality filtering and FASTQ to FASTA conversion
+    are performed by a single command without intermediate files
     """
 
     def setup_commands(self, file_path_dict, option_dict=None, delim=','):
@@ -34,46 +37,124 @@ class PreprocessingWrapper(program_module.ProgramWrapper):
         compressed_input_fp = file_path_dict['input']['multiple_read_files']
         labels = file_path_dict['input']['labels']
 
-        self.add_command_entry(
-            get_decompression_command(self.config_file, compressed_input_fp, self.output_dir))
-
-        decompressed_filepaths \
-            = [self.output_dir + '.'.join(fp.split('/')[-1].split('.')[:-1]) for fp in compressed_input_fp.split(delim)]
+        if option_dict is not None and option_dict.get('streaming'):
+            streamed_reads_fp = self.output_dir + 'filtered_reads.fasta'
+            stream_stats_fp = self.get_stats_fp('stream')
+            self.add_command_entry(get_streaming_command(self.config_file, compressed_input_fp, labels,
+                                                         streamed_reads_fp, stream_stats_fp,
+                                                         option_dict['qc_engine'], option_dict['cores'],
+                                                         delim=delim))
+
+            file_path_dict[self._name]['decompressed_input'] = None
+            file_path_dict[self._name]['sample_stats'] = None
+            file_path_dict[self._name]['streamed_reads'] = streamed_reads_fp
+            file_path_dict[self._name]['stream_stats'] = stream_stats_fp
+            return
+
+        # Each sample is decompressed and labelled separately, allowing the samples to be processed concurrently
+        compressed_filepaths = compressed_input_fp.split(delim)
+        sample_labels = labels.split(delim)
+        labelled_filepaths = list()
+        sample_stats_filepaths = list()
+
+        for n in range(len(compressed_filepaths)):
+            labelled_fp = self.output_dir + '.'.join(compressed_filepaths[n].split('/')[-1].split('.')[:-1])
+            sample_stats_fp = self.get_stats_fp('sample_{}'.format(n + 1))
+            self.add_command_entry(get_label_sample_command(self.config_file, compressed_filepaths[n],
+                                                            labelled_fp, get_sample_label(sample_labels, n),
+                                                            stats_fp=sample_stats_fp))
+            labelled_filepaths.append(labelled_fp)
+            sample_stats_filepaths.append(sample_stats_fp)
 
         merged_output = self.output_dir + 'merged_output.fastq'
-        self.add_command_entry(get_merge_command(self.config_file, delim.join(decompressed_filepaths),
-                                                 merged_output, labels))
+        self.add_command_entry(get_concatenate_command(self.config_file, labelled_filepaths,
+                                                       merged_output, delim=delim))
 
         file_path_dict[self._name]['decompressed_input'] = merged_output
+        file_path_dict[self._name]['sample_stats'] = sample_stats_filepaths
+        file_path_dict[self._name]['stream_stats'] = None
+
+
+def get_sample_label(labels, sample_nbr):
+
+    """Retrieves the label for a sample, falling back to a default label"""
 
+    if sample_nbr >= len(labels) or labels[sample_nbr] == '':
+        return 'sample{}'.format(sample_nbr + 1)
+    else:
+        return labels[sample_nbr]
 
-def get_decompression_command(config_file, compressed_input_fp, decompressed_output_base):
 
-    """Runs the decompression script, targetting .gz files only"""
+def get_label_sample_command(config_file, compressed_input_fp, labelled_output_fp, label, stats_fp):
 
-    description = 'decompress'
-    short = 'dc'
+    """
+    Decompresses a single gzipped sample, attaching its label to the read headers
+    The read count of the sample is written to the stats file
+    """
 
-    command = [config_file['scripts']['decompression_script'],
-               '--input', compressed_input_fp,
-               '--output_base', decompressed_output_base,
-               '--decompression_mode', 'gz']
+    description = 'label sample'
+    short = 'ls'
+
+    command = [config_file['scripts']['merge'],
+               '--input_files', compressed_input_fp,
+               '--output', labelled_output_fp,
+               '--labels', label,
+               '--gzipped_input',
+               '--stats', stats_fp]
 
-    return program_module.ProgramCommand(description, short, command)
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=[compressed_input_fp],
+                                        outputs=[labelled_output_fp, stats_fp])
 
 
-def get_merge_command(config_file, input_fastq_files_fp, merged_output_fp, labels):
+def get_concatenate_command(config_file, labelled_fastq_files, merged_output_fp, delim=','):
 
-    """Runs the decompression script, targetting .gz files only"""
+    """Concatenates the labelled samples into a single file"""
 
     description = 'merge'
     short = 'mr'
 
-    print('DEBUG input labels {}'.format(labels))
-
     command = [config_file['scripts']['merge'],
-               '--input_files', input_fastq_files_fp,
+               '--input_files', delim.join(labelled_fastq_files),
                '--output', merged_output_fp,
-               '--labels', labels]
+               '--concatenate']
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=labelled_fastq_files,
+                                        outputs=[merged_output_fp])
+
+
+def get_streaming_command(config_file, compressed_input_fp, labels, streamed_reads_fp, stream_stats_fp, qc_engine,
+                          processes, delim=','):
+
+    """
+    Streams the compressed reads through labelling and Prinseq into a FASTA file
+    Uses the same quality settings and quality control engine as the Prinseq module
+    The built-in quality filter uses the given number of processes, Prinseq runs on a single core
+    """
 
-    return program_module.ProgramCommand(description, short, command)
+    if qc_engine != 'native':
+        processes = 1
+
+    description = 'Stream reads'
+    short = 'sr'
+
+    command = [config_file['scripts']['stream_reads'],
+               '--input_files', compressed_input_fp,
+               '--labels', labels,
+               '--output', streamed_reads_fp,
+               '--stats', stream_stats_fp,
+               '--qc_engine', qc_engine,
+               '--prinseq', config_file['programs']['prinseq'],
+               '--quality_filter', config_file['scripts']['quality_filter'],
+               '--trim_qual', a_prinseq.TRIM_QUAL,
+               '--min_len', a_prinseq.MIN_LEN,
+               '--min_qual_mean', a_prinseq.MIN_QUAL,
+               '--ns_max_p', a_prinseq.MAX_NS,
+               '--processes', processes,
+               '--delim', delim]
+
+    return program_module.ScriptCommand(description, short, command,
+                                        inputs=compressed_input_fp.split(delim),
+                                        outputs=[streamed_reads_fp, stream_stats_fp],
+                                        threads=processes)
@@ -20,8 +20,12 @@ You should have received a copy of the GNU General Public License
 along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
+import os
+
 from src.util_scripts import command_builder
 
+STATS_SUBDIR = 'stats/'
+
 
 class ProgramWrapper:
 
@@ -50,22 +54,36 @@ class ProgramWrapper:
 
         raise NotImplementedError
 
+    def get_stats_fp(self, stats_name):
+
+        """
+        Path to a JSON sidecar where a command stores the number of records it wrote
+        The sidecars are collected in a shared folder within the log directory
+        """
+
+        stats_dir = self.path_generator('log') + STATS_SUBDIR
+        os.makedirs(stats_dir, exist_ok=True)
+        return stats_dir + stats_name + '.json'
+
     def is_setup(self):
 
         """Evaluate if commands are added to the module"""
 
         return len(self.executable_commands) is not None
 
-    def run(self, log_fp, log_table_fp):
+    def run(self, log_fp, log_table_fp, resource_log_fp=None):
 
         """Main method, rigs the program call and executes it"""
 
         if self.is_setup():
 
             with open(log_fp, 'a') as log_fh, open(log_table_fp, 'a') as log_table_fh:
+                resource_log_fh = open(resource_log_fp, 'a') if resource_log_fp is not None else None
                 log_fh.write('{} wrapper initiated\n'.format(self._name))
-                self._execute_commands(log_fh, log_table_fh)
+                self._execute_commands(log_fh, log_table_fh, resource_log_fh)
                 log_fh.write('\n')
+                if resource_log_fh is not None:
+                    resource_log_fh.close()
         else:
             raise Exception('The program-module is not setup. Call "setup_commands" before running')
 
@@ -83,19 +101,61 @@ class ProgramWrapper:
 
         cb = command_builder.CommandBuilder(command_class.description, command_class.short)
         cb.add_commands(command_class.command)
+        cb.add_file_dependencies(command_class.inputs, command_class.outputs)
+        cb.set_threads(command_class.threads)
+        cb.set_barrier(command_class.barrier)
+        cb.set_in_process(command_class.in_process)
         self.executable_commands.append(cb)
 
-    def _execute_commands(self, log_fh, log_table_fh):
+    def set_step_cache(self, step_cache):
+
+        """Lets the commands restore their outputs from the step cache instead of re-running"""
+
+        for command in self.executable_commands:
+            command.set_step_cache(step_cache)
+
+    def set_checkpoints(self, checkpoints):
+
+        """Lets the commands record their completion, allowing interrupted runs to be resumed"""
+
+        for command in self.executable_commands:
+            command.set_checkpoints(checkpoints)
+
+    def set_script_pool(self, script_pool):
+
+        """Lets the bundled Python scripts run in-process within the worker pool"""
 
-        """Executes the commands stored in the list executable_commands"""
+        for command in self.executable_commands:
+            command.set_script_pool(script_pool)
+
+    def _execute_commands(self, log_fh, log_table_fh, resource_log_fh=None):
+
+        """
+        Executes the commands stored in the list executable_commands
+        Stops at the first failing command, as the later commands depend on its output
+        """
 
         for command in self.executable_commands:
-            command.execute_command_verbose(log_fh, log_table_fh)
+            returncode = command.execute_command_verbose(log_fh, log_table_fh, resource_log_fh)
+            if returncode != 0:
+                raise command_builder.CommandFailedError(command.get_name(), returncode)
 
 
 class ProgramCommand:
 
-    def __init__(self, description, short, command):
+    """
+    A single command together with the files it reads and writes
+    The input and output paths are used to work out which commands depend on each other,
+    commands declaring neither are treated as depending on everything run before them
+
+    Commands also writing files that can't be listed up front, such as into a working directory,
+    are marked as barriers. They are ordered against all other commands like commands without
+    declared files, and are never restored from the step cache.
+    """
+
+    in_process = False
+
+    def __init__(self, description, short, command, inputs=None, outputs=None, threads=1, barrier=False):
         self.description = description
         self.short = short
 
@@ -103,3 +163,17 @@ class ProgramCommand:
             command[n] = str(command[n])
 
         self.command = command
+        self.inputs = [str(path) for path in inputs] if inputs is not None else []
+        self.outputs = [str(path) for path in outputs] if outputs is not None else []
+        self.threads = threads
+        self.barrier = barrier
+
+
+class ScriptCommand(ProgramCommand):
+
+    """
+    Command running one of the bundled Python scripts, with the script path as first element
+    The script can be executed in-process by calling its main() function within a worker pool
+    """
+
+    in_process = True
@@ -0,0 +1,107 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import hashlib
+import json
+import os
+
+from src.util_scripts import util_functions
+
+"""
+Keeps track of which commands that have finished within a run directory,
+allowing an interrupted run to be resumed.
+
+When a command finishes successfully a marker is written, containing the command line
+and the checksums of its declared output files. When resuming, commands are skipped
+as long as their marker is present and their outputs are unchanged. From the first
+command failing this check, all following commands are run again.
+"""
+
+
+class CheckpointRegistry:
+
+    def __init__(self, checkpoint_dir, resume=False):
+        self.resume = resume
+        self._checkpoint_dir = checkpoint_dir
+        self._resume_point_found = not resume
+
+        os.makedirs(self._checkpoint_dir, exist_ok=True)
+
+    def find_completed_commands(self, commands):
+
+        """
+        Flags the commands completed in an earlier run, up to the first incomplete command
+        Commands following the first incomplete command are always re-run
+        """
+
+        for command in commands:
+
+            if self._resume_point_found:
+                break
+
+            if self.is_complete(command):
+                command.set_completed_in_earlier_run()
+            else:
+                self._resume_point_found = True
+
+    def is_complete(self, command):
+
+        """Evaluates whether the command has a marker and its outputs are unchanged"""
+
+        marker_fp = self._get_marker_path(command)
+        if len(command.get_output_files()) == 0 or not os.path.isfile(marker_fp):
+            return False
+
+        with open(marker_fp) as in_fh:
+            marker = json.load(in_fh)
+
+        if marker['command'] != command.get_commands():
+            return False
+
+        for output_fp in command.get_output_files():
+            if not os.path.isfile(output_fp) or marker['outputs'].get(output_fp) != \
+                    util_functions.get_file_checksum(output_fp):
+                return False
+
+        return True
+
+    def mark_complete(self, command):
+
+        """Writes a marker with the output checksums for a successfully finished command"""
+
+        if not all(os.path.isfile(output_fp) for output_fp in command.get_output_files()):
+            return
+
+        marker = {
+            'command': command.get_commands(),
+            'outputs': {output_fp: util_functions.get_file_checksum(output_fp)
+                        for output_fp in command.get_output_files()}
+        }
+
+        marker_fp = self._get_marker_path(command)
+        with open(marker_fp + '.tmp', 'w') as out_fh:
+            json.dump(marker, out_fh, indent=4)
+        os.replace(marker_fp + '.tmp', marker_fp)
+
+    def _get_marker_path(self, command):
+        command_id = hashlib.sha256('\0'.join(command.get_commands()).encode()).hexdigest()
+        return os.path.join(self._checkpoint_dir, command_id + '.json')
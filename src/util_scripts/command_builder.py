@@ -21,6 +21,8 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 from src.util_scripts import timer
+import json
+import os
 import subprocess
 
 """
@@ -34,9 +36,32 @@ where the command simply is ran.
 It can also be executed using the more extensive "execute_command_verbose",
 where information about the process and the running time is printed to the terminal,
 and logged to the provided file handle.
+If a step cache is assigned, outputs are restored from the cache instead of re-running
+the command when the same command already has been run on the same input.
+If checkpoints are assigned, successfully finished commands are recorded, and commands
+completed in an earlier run are skipped when resuming.
+Commands running bundled Python scripts can be executed in-process by an assigned
+script pool instead of in a new interpreter.
+
+If a resource log handle is provided, CPU time, peak memory, block I/O and the exit status
+of each command are written to it as JSON lines.
 """
 
 
+class CommandFailedError(Exception):
+
+    """Raised when a command exits with a non-zero exit code, stopping the pipeline"""
+
+    def __init__(self, command_name, returncode):
+        super().__init__('Command "{}" failed with exit code {}'.format(command_name, returncode))
+        self.command_name = command_name
+        self.returncode = returncode
+
+
+# Block I/O counts reported by getrusage are in 512 byte units
+RUSAGE_BLOCK_SIZE = 512
+
+
 class CommandBuilder:
 
     def __init__(self, name, short_description):
@@ -44,6 +69,15 @@ class CommandBuilder:
         self._command_name = name
         self._command_name_short = short_description
         self._simple_timer = timer.Timer()
+        self._input_files = []
+        self._output_files = []
+        self._threads = 1
+        self._barrier = False
+        self._step_cache = None
+        self._checkpoints = None
+        self._completed_in_earlier_run = False
+        self._in_process = False
+        self._script_pool = None
 
     def add_commands(self, commands):
 
@@ -61,26 +95,117 @@ class CommandBuilder:
     def get_commands(self):
         return self._command_list
 
+    def get_name(self):
+        return self._command_name
+
+    def add_file_dependencies(self, input_files, output_files):
+        self._input_files += input_files
+        self._output_files += output_files
+
+    def get_input_files(self):
+        return self._input_files
+
+    def get_output_files(self):
+        return self._output_files
+
+    def has_file_dependencies(self):
+        return not self._barrier and (len(self._input_files) > 0 or len(self._output_files) > 0)
+
+    def set_barrier(self, barrier):
+        self._barrier = barrier
+
+    def is_barrier(self):
+        return self._barrier
+
+    def set_threads(self, threads):
+        self._threads = threads
+
+    def get_threads(self):
+        return self._threads
+
+    def set_step_cache(self, step_cache):
+        self._step_cache = step_cache
+
+    def set_checkpoints(self, checkpoints):
+        self._checkpoints = checkpoints
+
+    def set_completed_in_earlier_run(self):
+        self._completed_in_earlier_run = True
+
+    def set_in_process(self, in_process):
+        self._in_process = in_process
+
+    def set_script_pool(self, script_pool):
+        self._script_pool = script_pool
+
     def execute_command_simple(self):
 
         process = subprocess.Popen(self._command_list)
         process.wait()
 
-    def execute_command_verbose(self, log_fh, log_table_fh=None):
+    def execute_command_verbose(self, log_fh, log_table_fh=None, resource_log_fh=None):
 
         time_format_digits = 2
         self._simple_timer.reset()
 
         print(self._command_list)
 
-        process = subprocess.Popen(self._command_list)
-        print(">>> Command: {} is running".format(self._command_name))
-        process.wait()
+        if self._completed_in_earlier_run:
+            print(">>> Command: {} completed in earlier run, skipping".format(self._command_name))
+            log_fh.write('Command: {}, completed in earlier run\n'.format(self._command_name))
+            self._print_resource_information(0, 0, 'skipped', dict(), resource_log_fh)
+            return 0
+
+        if self._checkpoints is not None and self._checkpoints.resume:
+            self._remove_output_files()
+
+        cache_key = None
+        restored = False
+        if self._step_cache is not None and self._step_cache.is_cacheable(self):
+            cache_key = self._step_cache.get_key(self)
+            restored = self._step_cache.restore(cache_key, self._output_files)
+
+        if restored:
+            execution = 'cache'
+            returncode = 0
+            resource_usage = dict()
+            print(">>> Command: {} restored from cache".format(self._command_name))
+            log_fh.write('Command: {}, restored from step cache\n'.format(self._command_name))
+        else:
+            if self._in_process and self._script_pool is not None:
+                execution = 'in_process'
+                print(">>> Command: {} is running in-process".format(self._command_name))
+                returncode, resource_usage = self._script_pool.run_script(self._command_list)
+            else:
+                execution = 'subprocess'
+                process = subprocess.Popen(self._command_list)
+                print(">>> Command: {} is running".format(self._command_name))
+                returncode, resource_usage = wait_for_process(process)
+
+            if cache_key is not None and returncode == 0:
+                self._step_cache.store(cache_key, self._output_files)
 
         runtime = self._simple_timer.get_formatted_time(time_format_digits)
         print(">>> Command finished after {} seconds".format(runtime))
 
+        if self._checkpoints is not None and returncode == 0:
+            self._checkpoints.mark_complete(self)
+
         self._print_log_information(runtime, log_fh, log_table_fh)
+        self._print_resource_information(self._simple_timer.get_raw_time(), returncode, execution, resource_usage,
+                                         resource_log_fh)
+        return returncode
+
+    def _remove_output_files(self):
+
+        """
+        Removes outputs left by an interrupted earlier run, as some programs refuse to overwrite files
+        Files also declared as inputs are updated in place by the command, and are kept
+        """
+
+        for output_fp in self._output_files:
+            if os.path.isfile(output_fp) and output_fp not in self._input_files:
+                os.remove(output_fp)
 
     def _print_log_information(self, runtime, log_fh, log_table_fh):
 
@@ -88,3 +213,52 @@ class CommandBuilder:
 
         if log_table_fh is not None:
             log_table_fh.write('{}\t{}\t{}\n'.format(self._command_name, runtime, self._command_name_short))
+
+    def _print_resource_information(self, wall_time, returncode, execution, resource_usage, resource_log_fh):
+
+        """Writes the resource usage of the command as a JSON line"""
+
+        if resource_log_fh is None:
+            return
+
+        resource_entry = {
+            'command': self._command_name,
+            'short': self._command_name_short,
+            'execution': execution,
+            'exit_status': returncode,
+            'wall_time': round(wall_time, 3)
+        }
+        resource_entry.update(resource_usage)
+
+        resource_log_fh.write('{}\n'.format(json.dumps(resource_entry)))
+
+
+def wait_for_process(process):
+
+    """
+    Waits for the process to finish using wait4, which also retrieves its resource usage
+    Returns the exit code and a dictionary with the resource usage
+    """
+
+    _, status, rusage = os.wait4(process.pid, 0)
+
+    if os.WIFSIGNALED(status):
+        process.returncode = -os.WTERMSIG(status)
+    else:
+        process.returncode = os.WEXITSTATUS(status)
+
+    return process.returncode, get_resource_usage_dict(rusage.ru_utime, rusage.ru_stime, rusage.ru_maxrss,
+                                                       rusage.ru_inblock, rusage.ru_oublock)
+
+
+def get_resource_usage_dict(user_time, sys_time, max_rss_kb, input_blocks, output_blocks):
+
+    """Collects resource usage values into the format written to the resource log"""
+
+    return {
+        'user_time': round(user_time, 3),
+        'sys_time': round(sys_time, 3),
+        'max_rss_kb': max_rss_kb,
+        'read_bytes': input_blocks * RUSAGE_BLOCK_SIZE,
+        'written_bytes': output_blocks * RUSAGE_BLOCK_SIZE
+    }
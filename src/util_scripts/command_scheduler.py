@@ -0,0 +1,157 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import io
+from concurrent import futures
+
+from src.util_scripts import command_builder
+
+"""
+Runs CommandBuilder instances concurrently, respecting the order between them.
+
+A dependency graph is built from the input and output files declared for each command.
+A command has to wait for an earlier command if it reads a file the earlier command writes,
+writes a file the earlier command reads or writes, or if either of the two commands
+doesn't declare any files at all or is marked as a barrier.
+
+Commands are started as soon as their dependencies have finished and there are enough
+free cores left in the core budget to cover their thread count.
+
+When a command fails, no further commands are started. The commands already running are
+allowed to finish, after which the failure is raised as a CommandFailedError.
+"""
+
+
+class CommandScheduler:
+
+    def __init__(self, core_budget):
+
+        if core_budget < 1:
+            raise ValueError('At least one core is needed to run commands, got: {}'.format(core_budget))
+
+        self._core_budget = core_budget
+        self._commands = []
+
+    def add_commands(self, commands):
+        self._commands += commands
+
+    def get_dependencies(self):
+
+        """Returns a list with the set of earlier command positions each command must wait for"""
+
+        dependencies = list()
+        for pos in range(len(self._commands)):
+            command = self._commands[pos]
+            dependencies.append({earlier_pos for earlier_pos in range(pos)
+                                 if is_dependent(self._commands[earlier_pos], command)})
+        return dependencies
+
+    def run(self, log_fp, log_table_fp, resource_log_fp=None):
+
+        """
+        Executes all added commands, running independent commands concurrently
+        Raises a CommandFailedError for the first command exiting with a non-zero exit code
+        """
+
+        dependencies = self.get_dependencies()
+
+        waiting = list(range(len(self._commands)))
+        finished = set()
+        running = dict()
+        free_cores = self._core_budget
+        failed_command = None
+
+        resource_log_fh = open(resource_log_fp, 'a') if resource_log_fp is not None else None
+
+        with open(log_fp, 'a') as log_fh, open(log_table_fp, 'a') as log_table_fh, \
+                futures.ThreadPoolExecutor(max_workers=self._core_budget) as executor:
+
+            while len(waiting) > 0 or len(running) > 0:
+
+                for pos in list(waiting):
+                    if failed_command is not None:
+                        break
+                    cores = self._get_core_cost(pos)
+                    if dependencies[pos] <= finished and cores <= free_cores:
+                        waiting.remove(pos)
+                        free_cores -= cores
+                        running[executor.submit(run_buffered_command, self._commands[pos])] = pos
+
+                if len(running) == 0:
+                    break
+
+                done, _ = futures.wait(running, return_when=futures.FIRST_COMPLETED)
+
+                for future in done:
+                    pos = running.pop(future)
+                    returncode, log_text, log_table_text, resource_log_text = future.result()
+                    log_fh.write(log_text)
+                    log_table_fh.write(log_table_text)
+                    if resource_log_fh is not None:
+                        resource_log_fh.write(resource_log_text)
+
+                    free_cores += self._get_core_cost(pos)
+                    if returncode == 0:
+                        finished.add(pos)
+                    elif failed_command is None:
+                        failed_command = (self._commands[pos].get_name(), returncode)
+
+        if resource_log_fh is not None:
+            resource_log_fh.close()
+
+        if failed_command is not None:
+            raise command_builder.CommandFailedError(*failed_command)
+
+    def _get_core_cost(self, pos):
+
+        """Cores reserved while running a command, never more than the total budget"""
+
+        return max(1, min(self._commands[pos].get_threads(), self._core_budget))
+
+
+def is_dependent(earlier_command, later_command):
+
+    """Evaluates whether the later command has to wait for the earlier command to finish"""
+
+    if not earlier_command.has_file_dependencies() or not later_command.has_file_dependencies():
+        return True
+
+    earlier_inputs = set(earlier_command.get_input_files())
+    earlier_outputs = set(earlier_command.get_output_files())
+    later_inputs = set(later_command.get_input_files())
+    later_outputs = set(later_command.get_output_files())
+
+    return len(earlier_outputs & (later_inputs | later_outputs)) > 0 or len(earlier_inputs & later_outputs) > 0
+
+
+def run_buffered_command(command):
+
+    """
+    Runs a command, collecting its log output in memory, and returns its exit code and log output
+    The log lines are written by the scheduler thread to avoid interleaved writes
+    """
+
+    log_buffer = io.StringIO()
+    log_table_buffer = io.StringIO()
+    resource_log_buffer = io.StringIO()
+    returncode = command.execute_command_verbose(log_buffer, log_table_buffer, resource_log_buffer)
+    return returncode, log_buffer.getvalue(), log_table_buffer.getvalue(), resource_log_buffer.getvalue()
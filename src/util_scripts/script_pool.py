@@ -0,0 +1,176 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import importlib.util
+import multiprocessing
+import os
+import resource
+import sys
+import traceback
+from concurrent import futures
+
+from src.util_scripts import command_builder
+
+"""
+Persistent pool of worker processes running the bundled Python scripts in-process.
+
+Instead of starting a new interpreter for every script, the main() function of the script
+is called within a worker, with sys.argv set to the command line. Each worker loads a script
+only once, so interpreter startup and heavy imports (matplotlib, skbio, Bio) are paid once
+per worker rather than once per pipeline step.
+"""
+
+LOADED_SCRIPTS = dict()
+
+
+class ScriptPool:
+
+    def __init__(self, workers):
+        self._executor = futures.ProcessPoolExecutor(max_workers=workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+
+    def run_script(self, command):
+
+        """Runs the script in the command in a worker process, returns its exit code and resource usage"""
+
+        return self._executor.submit(run_script_main, command).result()
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+
+def run_script_main(command):
+
+    """
+    Calls main() of the script found first in the command, with the remaining command as arguments
+    Executed within the worker process
+    """
+
+    script_fp = command[0]
+    original_argv = sys.argv
+    sys.argv = list(command)
+
+    self_usage_before = resource.getrusage(resource.RUSAGE_SELF)
+    children_usage_before = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    try:
+        get_script_module(script_fp).main()
+        exit_code = 0
+    except SystemExit as exit_exception:
+        exit_code = get_exit_code(exit_exception)
+    except Exception:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.argv = original_argv
+        close_open_figures()
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    resource_usage = get_resource_usage_delta(self_usage_before, resource.getrusage(resource.RUSAGE_SELF),
+                                              children_usage_before, resource.getrusage(resource.RUSAGE_CHILDREN))
+    return exit_code, resource_usage
+
+
+def get_resource_usage_delta(self_before, self_after, children_before, children_after):
+
+    """
+    Resource usage of a script run within the worker, including programs it started
+    The peak memory is the peak of the worker process, which is reused between scripts
+    """
+
+    return command_builder.get_resource_usage_dict(
+        (self_after.ru_utime - self_before.ru_utime) + (children_after.ru_utime - children_before.ru_utime),
+        (self_after.ru_stime - self_before.ru_stime) + (children_after.ru_stime - children_before.ru_stime),
+        max(self_after.ru_maxrss, children_after.ru_maxrss),
+        (self_after.ru_inblock - self_before.ru_inblock) + (children_after.ru_inblock - children_before.ru_inblock),
+        (self_after.ru_oublock - self_before.ru_oublock) + (children_after.ru_oublock - children_before.ru_oublock))
+
+
+def get_script_module(script_fp):
+
+    """
+    Loads the script as a module the first time it is requested in this worker
+    The script directory is added to the module search path, as when running the script directly
+
+    The module is registered in sys.modules under the name of the script file. Functions of the
+    script can then be pickled when the script starts its own process pool, as the (spawned)
+    processes of that pool import the script by name from the inherited module search path.
+    A script already imported as a helper module by another script is reused.
+    """
+
+    script_module = LOADED_SCRIPTS.get(script_fp)
+
+    if script_module is None:
+        real_script_fp = os.path.realpath(script_fp)
+        script_dir = os.path.dirname(real_script_fp)
+        if script_dir not in sys.path:
+            sys.path.insert(0, script_dir)
+
+        module_name = os.path.splitext(os.path.basename(real_script_fp))[0]
+        script_module = sys.modules.get(module_name)
+        if script_module is None or os.path.realpath(getattr(script_module, '__file__', '')) != real_script_fp:
+            script_module = load_script_module(module_name, real_script_fp)
+        LOADED_SCRIPTS[script_fp] = script_module
+
+    return script_module
+
+
+def load_script_module(module_name, script_fp):
+
+    """Executes the script as a module registered in sys.modules, replacing any module of the same name"""
+
+    spec = importlib.util.spec_from_file_location(module_name, script_fp)
+    script_module = importlib.util.module_from_spec(spec)
+    previous_module = sys.modules.get(module_name)
+    sys.modules[module_name] = script_module
+    try:
+        spec.loader.exec_module(script_module)
+    except BaseException:
+        if previous_module is None:
+            del sys.modules[module_name]
+        else:
+            sys.modules[module_name] = previous_module
+        raise
+    return script_module
+
+
+def get_exit_code(exit_exception):
+
+    """Translates a SystemExit to a process exit code in the same way as the interpreter"""
+
+    if exit_exception.code is None:
+        return 0
+    elif isinstance(exit_exception.code, int):
+        return exit_exception.code
+    else:
+        print(exit_exception.code, file=sys.stderr)
+        return 1
+
+
+def close_open_figures():
+
+    """Releases matplotlib figures left open by plotting scripts, as the worker is reused"""
+
+    pyplot = sys.modules.get('matplotlib.pyplot')
+    if pyplot is not None:
+        pyplot.close('all')
@@ -0,0 +1,190 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import ast
+import hashlib
+import os
+import shutil
+import tempfile
+
+from src.util_scripts import util_functions
+
+"""
+Content-addressed cache for the output files of pipeline commands.
+
+A command is identified by a key built from:
+    - The command line, where the declared input files and the run output directory
+      are replaced by placeholders, making the key independent of where the run is placed
+    - The contents of the declared input files
+    - The size and modification time of other files referenced on the command line,
+      such as the scripts, programs and databases used
+    - The size and modification time of the helper modules imported by the Python scripts
+      on the command line, found next to the script or in the shared UtilScripts directory
+
+Outputs of successful commands are stored under their key, and are copied back
+into the run output directory instead of re-running the command on later runs.
+"""
+
+COMPLETE_MARKER = 'complete'
+OUTPUT_NAME = 'output_{}'
+SHARED_MODULE_DIR = 'UtilScripts'
+
+
+class StepCache:
+
+    def __init__(self, cache_dir, run_base_path):
+        self._cache_dir = cache_dir
+        self._run_base_path = run_base_path
+        self._helper_modules = dict()
+
+        if not os.path.exists(self._cache_dir):
+            os.makedirs(self._cache_dir)
+
+    @staticmethod
+    def is_cacheable(command):
+
+        """Only commands declaring all of their output files can be restored from the cache"""
+
+        return len(command.get_output_files()) > 0 and not command.is_barrier()
+
+    def get_key(self, command):
+
+        """Calculates the cache key for a command, hashing the content of its input files"""
+
+        input_files = command.get_input_files()
+        output_files = command.get_output_files()
+        key_hash = hashlib.sha256()
+
+        for token in command.get_commands():
+            key_hash.update(self._get_normalized_token(token, input_files).encode())
+            key_hash.update(b'\0')
+
+        for input_fp in input_files:
+            key_hash.update(util_functions.get_file_checksum(input_fp).encode())
+
+        for token in command.get_commands():
+            if os.path.isfile(token) and token not in input_files and token not in output_files:
+                file_stat = os.stat(token)
+                key_hash.update('{}:{}:{}'.format(token, file_stat.st_size, file_stat.st_mtime_ns).encode())
+
+                for module_fp in self._get_helper_modules(token):
+                    module_stat = os.stat(module_fp)
+                    key_hash.update('{}:{}:{}'.format(module_fp, module_stat.st_size,
+                                                      module_stat.st_mtime_ns).encode())
+
+        return key_hash.hexdigest()
+
+    def restore(self, key, output_files):
+
+        """Copies cached outputs to the target paths, returns False if the key isn't present in the cache"""
+
+        entry_dir = self._get_entry_dir(key)
+        if not os.path.isfile(os.path.join(entry_dir, COMPLETE_MARKER)):
+            return False
+
+        for pos in range(len(output_files)):
+            shutil.copyfile(os.path.join(entry_dir, OUTPUT_NAME.format(pos)), output_files[pos])
+        return True
+
+    def store(self, key, output_files):
+
+        """
+        Stores the outputs of a finished command under its key
+        Nothing is stored if any of the outputs is missing
+        """
+
+        entry_dir = self._get_entry_dir(key)
+        if os.path.exists(entry_dir) or not all(os.path.isfile(output_fp) for output_fp in output_files):
+            return
+
+        os.makedirs(os.path.dirname(entry_dir), exist_ok=True)
+        temp_dir = tempfile.mkdtemp(dir=self._cache_dir)
+
+        for pos in range(len(output_files)):
+            shutil.copyfile(output_files[pos], os.path.join(temp_dir, OUTPUT_NAME.format(pos)))
+        open(os.path.join(temp_dir, COMPLETE_MARKER), 'w').close()
+
+        try:
+            os.rename(temp_dir, entry_dir)
+        except OSError:
+            # Another command with the same key finished first
+            shutil.rmtree(temp_dir)
+
+    def _get_helper_modules(self, script_fp):
+
+        """
+        Returns the local modules a Python script imports, directly or through other local modules,
+        in a fixed order. Modules are looked up in the directory of the script and in the shared
+        UtilScripts directory next to it, as the scripts add these to their import path.
+        """
+
+        if not script_fp.endswith('.py'):
+            return []
+
+        if script_fp not in self._helper_modules:
+            script_dir = os.path.dirname(os.path.realpath(script_fp))
+            module_dirs = [script_dir, os.path.join(os.path.dirname(script_dir), SHARED_MODULE_DIR)]
+
+            found_modules = set()
+            unparsed = [script_fp]
+            while len(unparsed) > 0:
+                for module_name in get_imported_names(unparsed.pop()):
+                    for module_dir in module_dirs:
+                        module_fp = os.path.join(module_dir, module_name + '.py')
+                        if os.path.isfile(module_fp):
+                            if module_fp not in found_modules:
+                                found_modules.add(module_fp)
+                                unparsed.append(module_fp)
+                            break
+
+            self._helper_modules[script_fp] = sorted(found_modules)
+        return self._helper_modules[script_fp]
+
+    def _get_entry_dir(self, key):
+        return os.path.join(self._cache_dir, key[:2], key)
+
+    def _get_normalized_token(self, token, input_files):
+
+        """Replaces run specific paths in a command line token with placeholders"""
+
+        for pos in sorted(range(len(input_files)), key=lambda input_pos: -len(input_files[input_pos])):
+            token = token.replace(input_files[pos], '<input{}>'.format(pos))
+        return token.replace(self._run_base_path, '<run>/')
+
+
+def get_imported_names(module_fp):
+
+    """Returns the top level names of the absolute imports in a Python file"""
+
+    with open(module_fp) as module_fh:
+        try:
+            tree = ast.parse(module_fh.read(), filename=module_fp)
+        except SyntaxError:
+            return []
+
+    imported_names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported_names += [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            imported_names.append(node.module.split('.')[0])
+    return imported_names
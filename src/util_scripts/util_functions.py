@@ -21,31 +21,47 @@ along with RASP.  If not, <http://www.gnu.org/licenses/>.
 """
 
 import gzip
+import hashlib
+import json
+import os
 
 
 def extract_input_information(file_path_dict, output_path, delim=','):
 
     """
     Reads the input strings with filepaths and labels and outputs
-    line-counts for each file to target path
+    read counts for each file to target path
     """
 
-    compressed_input_fp = file_path_dict['input']['multiple_read_files']
     label_string = file_path_dict['input']['labels']
-
-    filepaths = compressed_input_fp.split(delim)
     labels = label_string.split(delim)
 
-    linecounts = list()
-
-    for filepath in filepaths:
-        num_lines = sum(1 for _ in gzip.open(filepath, 'rb'))
-        linecounts.append(num_lines)
+    read_counts = get_sample_read_counts(file_path_dict, delim=delim)
 
     with open(output_path, 'w') as output_fh:
         output_fh.write('Label:Initial number of sequences\n')
         for pos in range(len(labels)):
-            output_fh.write('{}:{}\n'.format(labels[pos], int(linecounts[pos] / 4)))
+            output_fh.write('{}:{}\n'.format(labels[pos], int(read_counts[pos])))
+
+
+def get_sample_read_counts(file_path_dict, delim=','):
+
+    """
+    Retrieves the number of reads in each input file
+    The counts are taken from the stats sidecars written during preprocessing,
+    the compressed input files are only read if the sidecars are missing
+    """
+
+    sample_stats_fps = file_path_dict['preprocessing'].get('sample_stats')
+    stream_stats_fp = file_path_dict['preprocessing'].get('stream_stats')
+
+    if sample_stats_fps is not None and all(os.path.isfile(stats_fp) for stats_fp in sample_stats_fps):
+        return [read_stats_sidecar(stats_fp)['records'] for stats_fp in sample_stats_fps]
+    elif stream_stats_fp is not None and os.path.isfile(stream_stats_fp):
+        return read_stats_sidecar(stream_stats_fp)['sample_records']
+
+    compressed_input_fp = file_path_dict['input']['multiple_read_files']
+    return [sum(1 for _ in gzip.open(filepath, 'rb')) / 4 for filepath in compressed_input_fp.split(delim)]
 
 
 def extract_run_information(file_path_dict, output_path):
@@ -58,7 +74,6 @@ def extract_run_information(file_path_dict, output_path):
 
     with open(output_path, 'w') as output_fh:
 
-        raw_reads_fp = file_path_dict['preprocessing']['decompressed_input']
         prinseq_cleaned_reads_fp = file_path_dict['prinseq']['good_output']
         derep_reads_fp = file_path_dict['prepare_otus']['derep_seq']
         raw_otus_fp = file_path_dict['prepare_otus']['cdhit_raw_otus']
@@ -68,19 +83,50 @@ def extract_run_information(file_path_dict, output_path):
 
         # tree_fp = file_path_dict['build_tree']['tree_file']
 
-        output_fh.write('Initial read count: {} reads\n'.format(int(_get_fastq_count_for_file(raw_reads_fp))))
-        output_fh.write('After quality filtering: {} reads\n'.format(int(_get_fastq_count_for_file(prinseq_cleaned_reads_fp))))
-        output_fh.write('After dereplication: {} unique sequences\n'.format(_get_fasta_count_for_file(derep_reads_fp)))
-        output_fh.write('Initial number of OTUs: {} OTUs\n'.format(_get_fasta_count_for_file(raw_otus_fp)))
-        output_fh.write('After abundance filtering: {} OTUs\n'.format(_get_fasta_count_for_file(abundance_filtered_otus_fp)))
+        otu_stats = file_path_dict['prepare_otus']
+        initial_read_count = sum(get_sample_read_counts(file_path_dict))
+        filtered_read_count = _get_record_count(otu_stats.get('quality_filtered_stats'),
+                                                _get_fastq_count_for_file, prinseq_cleaned_reads_fp)
+        derep_count = _get_record_count(otu_stats.get('derep_stats'), _get_fasta_count_for_file, derep_reads_fp)
+        raw_otu_count = _get_record_count(otu_stats.get('raw_otus_stats'), _get_fasta_count_for_file, raw_otus_fp)
+        abundance_filtered_otu_count = _get_record_count(otu_stats.get('abund_filtered_stats'),
+                                                         _get_fasta_count_for_file, abundance_filtered_otus_fp)
+        taxa_filtered_otu_count = _get_record_count(file_path_dict['pynast'].get('taxa_filtered_stats'),
+                                                    _get_fasta_count_for_file, taxa_filtered_otus_fp)
+
+        output_fh.write('Initial read count: {} reads\n'.format(int(initial_read_count)))
+        output_fh.write('After quality filtering: {} reads\n'.format(int(filtered_read_count)))
+        output_fh.write('After dereplication: {} unique sequences\n'.format(derep_count))
+        output_fh.write('Initial number of OTUs: {} OTUs\n'.format(raw_otu_count))
+        output_fh.write('After abundance filtering: {} OTUs\n'.format(abundance_filtered_otu_count))
 
         if chimera_checked_otus is not None:
-            output_fh.write('After chimera checking: {} OTUs\n'.format(_get_fasta_count_for_file(chimera_checked_otus)))
-        output_fh.write('After filtering uncertain taxa: {} OTUs\n'.format(_get_fasta_count_for_file(taxa_filtered_otus_fp)))
+            chimera_checked_otu_count = _get_record_count(otu_stats.get('chimera_checked_stats'),
+                                                          _get_fasta_count_for_file, chimera_checked_otus)
+            output_fh.write('After chimera checking: {} OTUs\n'.format(chimera_checked_otu_count))
+        output_fh.write('After filtering uncertain taxa: {} OTUs\n'.format(taxa_filtered_otu_count))
 
         output_fh.write('\n')
 
 
+def get_initial_read_count(file_path_dict):
+
+    """Retrieves the total number of input reads, and displays the information to the user"""
+
+    read_count = sum(get_sample_read_counts(file_path_dict))
+
+    print('Total sequence count: {}'.format(read_count))
+    return read_count
+
+
+def read_stats_sidecar(stats_fp):
+
+    """Loads the record counts written to a stats sidecar by a pipeline step"""
+
+    with open(stats_fp) as in_fh:
+        return json.load(in_fh)
+
+
 def write_output_readme(output_path):
 
     """Writes a description of the various output files to a README file"""
@@ -123,6 +169,10 @@ The number of OTUs of certain taxa found in the different samples. This data is
 abundance_barplot_data.tsv
 Similar to otu_barplot_data.tsv, using read counts instead of OTU counts.
 
+alpha_indices.tsv
+Alpha diversity indices for each sample: number of reads, observed OTUs, Chao1, ACE, Shannon entropy (natural
+logarithm), Gini-Simpson index, Pielou evenness and Good's coverage. Undefined values are written as NA.
+
 fasttree.tre
 The tree-file visualized in fasttree.svg
 
@@ -141,6 +191,18 @@ Visualization of the tree-file fasttree.tre
         output_fh.write(readme_text)
 
 
+def _get_record_count(stats_fp, count_function, filepath):
+
+    """
+    Retrieves the number of records written to a file from the stats sidecar of the step writing it
+    The file itself is only scanned if no sidecar is present
+    """
+
+    if stats_fp is not None and os.path.isfile(stats_fp):
+        return read_stats_sidecar(stats_fp)['records']
+    return count_function(filepath)
+
+
 def _get_fastq_count_for_file(filepath):
 
     """
@@ -188,3 +250,14 @@ def prepend_text_to_file(filepath, text_list):
 
     with open(filepath, 'w') as write_fh:
         write_fh.write(file_text)
+
+
+def get_file_checksum(filepath, block_size=1024 * 1024):
+
+    """Calculates the SHA-256 checksum of the file content, reading it in blocks"""
+
+    checksum = hashlib.sha256()
+    with open(filepath, 'rb') as in_fh:
+        for block in iter(lambda: in_fh.read(block_size), b''):
+            checksum.update(block)
+    return checksum.hexdigest()
@@ -0,0 +1,58 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import sys
+
+"""
+Shared setup for the tests, which are run from the repository root with 'python3 -m pytest tests'
+
+The repository root is added to the module search path, so that the pipeline is imported as
+src.* in the same way as from main.py. The bundled scripts are reached through SCRIPTS_DIR.
+Outputs are compared against copies of the scripts as they were before the reworked versions,
+kept under BASELINE_SCRIPTS_DIR.
+"""
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_DIR, 'Scripts')
+DATA_DIR = os.path.join(REPO_DIR, 'tests', 'data')
+BASELINE_SCRIPTS_DIR = os.path.join(DATA_DIR, 'baseline_scripts')
+
+if REPO_DIR not in sys.path:
+    sys.path.insert(0, REPO_DIR)
+
+
+def get_script_fp(*path_parts):
+    return os.path.join(SCRIPTS_DIR, *path_parts)
+
+
+def add_script_dir(*path_parts):
+
+    """Makes the modules of a script directory importable, as when running its scripts"""
+
+    script_dir = get_script_fp(*path_parts)
+    if script_dir not in sys.path:
+        sys.path.insert(0, script_dir)
+
+
+def get_baseline_script_fp(script_name):
+    return os.path.join(BASELINE_SCRIPTS_DIR, script_name)
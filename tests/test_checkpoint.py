@@ -0,0 +1,105 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+
+import os
+import stat
+
+from src.pipeline_modules import e_build_tree
+from src.pipeline_modules import program_module
+from src.util_scripts import checkpoint
+from src.util_scripts import command_builder
+
+# Writes the files of a single RAxML tree search, refusing to run over an earlier info file like RAxML does
+FAKE_RAXML = """#!/bin/sh
+run_name=$8
+work_dir=${10}
+if [ -e "${work_dir}RAxML_info.${run_name}" ]; then exit 1; fi
+echo run >> "${work_dir}runs"
+for output_type in bestTree info log result; do
+    echo "(a,b);" > "${work_dir}RAxML_${output_type}.${run_name}"
+done
+"""
+
+
+def get_raxml_module(tmp_path, checkpoints):
+
+    raxml_fp = str(tmp_path / 'raxml')
+    with open(raxml_fp, 'w') as out_fh:
+        out_fh.write(FAKE_RAXML)
+    os.chmod(raxml_fp, os.stat(raxml_fp).st_mode | stat.S_IXUSR)
+
+    config = {'basepaths': {'programs': '', 'scripts': ''}, 'programs': {'raxml': raxml_fp}}
+    module = program_module.ProgramWrapper('tree', lambda name: str(tmp_path) + '/', config)
+    module.add_command_entry(e_build_tree.get_raxml_command(config, str(tmp_path / 'alignment.fasta'),
+                                                            str(tmp_path) + '/'))
+    module.set_checkpoints(checkpoints)
+    checkpoints.find_completed_commands(module.executable_commands)
+    return module
+
+
+def test_completed_barrier_command_is_skipped_on_resume(tmp_path):
+
+    checkpoint_dir = str(tmp_path / 'checkpoints')
+    log_fp, log_table_fp = str(tmp_path / 'log'), str(tmp_path / 'log_table')
+
+    module = get_raxml_module(tmp_path, checkpoint.CheckpointRegistry(checkpoint_dir))
+    assert module.executable_commands[0].is_barrier()
+    module.run(log_fp, log_table_fp)
+    assert len(os.listdir(checkpoint_dir)) == 1
+
+    resumed_module = get_raxml_module(tmp_path, checkpoint.CheckpointRegistry(checkpoint_dir, resume=True))
+    resumed_module.run(log_fp, log_table_fp)
+
+    assert (tmp_path / 'runs').read_text() == 'run\n'
+
+
+def test_changed_barrier_output_is_run_again_on_resume(tmp_path):
+
+    checkpoint_dir = str(tmp_path / 'checkpoints')
+    log_fp, log_table_fp = str(tmp_path / 'log'), str(tmp_path / 'log_table')
+
+    get_raxml_module(tmp_path, checkpoint.CheckpointRegistry(checkpoint_dir)).run(log_fp, log_table_fp)
+    (tmp_path / 'RAxML_bestTree.raxml_tree.tre').write_text('(b,a);\n')
+
+    resumed_module = get_raxml_module(tmp_path, checkpoint.CheckpointRegistry(checkpoint_dir, resume=True))
+    resumed_module.run(log_fp, log_table_fp)
+
+    assert (tmp_path / 'runs').read_text() == 'run\nrun\n'
+    assert (tmp_path / 'RAxML_bestTree.raxml_tree.tre').read_text() == '(a,b);\n'
+
+
+def test_outputs_updated_in_place_are_kept_on_resume(tmp_path):
+
+    database_fp, otus_fp = str(tmp_path / 'database'), str(tmp_path / 'otus')
+    (tmp_path / 'database').write_text('earlier\n')
+    (tmp_path / 'otus').write_text('new\n')
+
+    command = command_builder.CommandBuilder('update', 'upd')
+    command.add_commands(['sh', '-c', 'cat {} >> {}'.format(otus_fp, database_fp)])
+    command.add_file_dependencies([otus_fp, database_fp], [database_fp])
+    command.set_checkpoints(checkpoint.CheckpointRegistry(str(tmp_path / 'checkpoints'), resume=True))
+
+    with open(str(tmp_path / 'log'), 'w') as log_fh:
+        assert command.execute_command_verbose(log_fh) == 0
+    assert (tmp_path / 'database').read_text() == 'earlier\nnew\n'
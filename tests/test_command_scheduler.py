@@ -0,0 +1,86 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import pytest
+
+from src.pipeline_modules import program_module
+from src.util_scripts import command_builder
+from src.util_scripts import command_scheduler
+
+
+def get_shell_command(name, shell_text, inputs, outputs):
+
+    command = command_builder.CommandBuilder(name, name)
+    command.add_commands(['sh', '-c', shell_text])
+    command.add_file_dependencies(inputs, outputs)
+    return command
+
+
+def get_failing_commands(work_dir):
+
+    """An independent command, a failing command and a command depending on the failing one"""
+
+    first_fp, failed_fp, dependent_fp = [str(work_dir / name) for name in ['first', 'failed', 'dependent']]
+    return [get_shell_command('first', 'echo first > {}'.format(first_fp), [], [first_fp]),
+            get_shell_command('failing', 'exit 3', [], [failed_fp]),
+            get_shell_command('dependent', 'cat {} > {}'.format(failed_fp, dependent_fp),
+                              [failed_fp], [dependent_fp])]
+
+
+def test_scheduler_stops_at_failed_command(tmp_path):
+
+    commands = get_failing_commands(tmp_path)
+    scheduler = command_scheduler.CommandScheduler(2)
+    scheduler.add_commands(commands)
+
+    with pytest.raises(command_builder.CommandFailedError) as error_info:
+        scheduler.run(str(tmp_path / 'log'), str(tmp_path / 'log_table'))
+
+    assert error_info.value.command_name == 'failing'
+    assert error_info.value.returncode == 3
+    assert not (tmp_path / 'dependent').exists()
+
+
+def test_scheduler_runs_all_commands(tmp_path):
+
+    first_fp, second_fp = str(tmp_path / 'first'), str(tmp_path / 'second')
+    scheduler = command_scheduler.CommandScheduler(2)
+    scheduler.add_commands([get_shell_command('first', 'echo first > {}'.format(first_fp), [], [first_fp]),
+                            get_shell_command('second', 'cat {} > {}'.format(first_fp, second_fp),
+                                              [first_fp], [second_fp])])
+    scheduler.run(str(tmp_path / 'log'), str(tmp_path / 'log_table'))
+
+    assert (tmp_path / 'second').read_text() == 'first\n'
+
+
+def test_sequential_run_stops_at_failed_command(tmp_path):
+
+    module = program_module.ProgramWrapper('test', lambda name: str(tmp_path) + '/',
+                                           {'basepaths': {'programs': '', 'scripts': ''}})
+    module.executable_commands = get_failing_commands(tmp_path)
+
+    with pytest.raises(command_builder.CommandFailedError):
+        module.run(str(tmp_path / 'log'), str(tmp_path / 'log_table'))
+
+    assert (tmp_path / 'first').exists()
+    assert not (tmp_path / 'dependent').exists()
@@ -0,0 +1,86 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import filecmp
+import random
+import subprocess
+import sys
+
+import pytest
+
+import conftest
+
+"""
+Compares the dereplication engines with the baseline dereplication script
+
+Labelled reads are generated from a set of template sequences, with some of them shortened,
+and dereplicated by each engine. The dereplicated reads and the mapping are compared byte for byte.
+"""
+
+SAMPLES = ['sample1', 'sample2', 'sample10']
+
+
+def run_script(script_fp, *arguments):
+    subprocess.check_call([sys.executable, script_fp] + [str(argument) for argument in arguments])
+
+
+def assert_same_files(first_fp, second_fp):
+    assert filecmp.cmp(first_fp, second_fp, shallow=False), '{} differs from {}'.format(first_fp, second_fp)
+
+
+def write_reads(reads_fp, read_count, seed):
+
+    """Writes FASTA reads labelled with their sample, as written by the FASTQ to FASTA step"""
+
+    rng = random.Random(seed)
+    templates = [''.join(rng.choice('ACGT') for _ in range(rng.randrange(30, 60))) for _ in range(60)]
+
+    with open(reads_fp, 'w') as out_fh:
+        for read_nbr in range(read_count):
+            sequence = rng.choice(templates[:rng.randrange(1, len(templates) + 1)])
+            if rng.random() < 0.2:
+                sequence = sequence[:-rng.randrange(1, 4)]
+            out_fh.write('>read{};label={}\n{}\n'.format(read_nbr, rng.choice(SAMPLES), sequence))
+
+
+@pytest.fixture(scope='module')
+def reads_fp(tmp_path_factory):
+
+    reads_fp = str(tmp_path_factory.mktemp('reads') / 'reads.fasta')
+    write_reads(reads_fp, 3000, seed=1)
+    return reads_fp
+
+
+@pytest.mark.parametrize('engine', ['default', 'compact', 'external', 'sharded'])
+def test_dereplication_engines(tmp_path, reads_fp, engine):
+
+    baseline_script = conftest.get_baseline_script_fp('script_dereplicator.py')
+    run_script(baseline_script, '--input', reads_fp, '--output', tmp_path / 'baseline.fasta',
+               '--mapping_file', tmp_path / 'baseline.mapping')
+
+    run_script(conftest.get_script_fp('OTUclustering', 'script_dereplicator.py'),
+               '--input', reads_fp, '--output', tmp_path / 'derep.fasta', '--mapping_file', tmp_path / 'derep.mapping',
+               '--engine', engine, '--partitions', 4, '--processes', 3, '--temp_dir', tmp_path)
+
+    assert_same_files(tmp_path / 'baseline.fasta', tmp_path / 'derep.fasta')
+    assert_same_files(tmp_path / 'baseline.mapping', tmp_path / 'derep.mapping')
@@ -0,0 +1,77 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import random
+
+import conftest
+
+conftest.add_script_dir('OTUclustering')
+
+import kmer_clustering
+
+IDENTITY = 0.97
+WORD_SIZE = 8
+BAND = 10
+
+
+def get_mutated(rng, sequence, changes):
+
+    bases = list(sequence)
+    for _ in range(changes):
+        bases[rng.randrange(len(bases))] = rng.choice('ACGT')
+    return ''.join(bases)
+
+
+def test_short_centroid_requires_shared_kmers():
+
+    rng = random.Random(1)
+    long_sequence = ''.join(rng.choice('ACGT') for _ in range(400))
+
+    centroid_index = kmer_clustering.CentroidIndex(IDENTITY, WORD_SIZE, BAND, accurate=True)
+    centroid_index.add_centroid(long_sequence[100:160])
+    centroid_index.add_centroid(''.join(rng.choice('ACGT') for _ in range(60)))
+
+    encoded = kmer_clustering.encode_sequence(long_sequence)
+    assert centroid_index.get_candidates(encoded) == [0]
+
+
+def test_candidates_include_all_matching_centroids():
+
+    rng = random.Random(2)
+    sequences = list()
+    for _ in range(20):
+        template = ''.join(rng.choice('ACGT') for _ in range(rng.randrange(40, 300)))
+        sequences.append(template)
+        sequences.append(get_mutated(rng, template, 3))
+        sequences.append(template[rng.randrange(20):])
+
+    centroid_index = kmer_clustering.CentroidIndex(IDENTITY, WORD_SIZE, BAND, accurate=True)
+    centroids = sequences[::2]
+    for centroid in centroids:
+        centroid_index.add_centroid(centroid)
+
+    for sequence in sequences[1::2]:
+        encoded = kmer_clustering.encode_sequence(sequence)
+        matching = [centroid_nbr for centroid_nbr, centroid in enumerate(centroids)
+                    if kmer_clustering.get_identity(encoded, kmer_clustering.encode_sequence(centroid), BAND) >= IDENTITY]
+        assert set(matching) <= set(centroid_index.get_candidates(encoded))
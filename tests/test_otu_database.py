@@ -0,0 +1,78 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+
+import os
+
+import conftest
+
+conftest.add_script_dir('OTUclustering')
+
+import otu_database
+
+WORD_SIZE = 8
+SEQUENCES = ['ACGTACGTTGCAGGCTAACGTTAGC', 'TTGACCAGTGCAAGTCCATGGACTA']
+
+
+def get_saved_database(database_dir):
+
+    database = otu_database.OtuDatabase(database_dir, WORD_SIZE)
+    for otu_nbr, sequence in enumerate(SEQUENCES, start=1):
+        database.add_otu('OTU{}'.format(otu_nbr), sequence)
+    database.save()
+    return database
+
+
+def test_saved_database_is_loaded(tmp_path):
+
+    database_dir = str(tmp_path / 'database')
+    get_saved_database(database_dir)
+
+    loaded_database = otu_database.OtuDatabase(database_dir, WORD_SIZE)
+    assert loaded_database.get_names() == ['OTU1', 'OTU2']
+    assert loaded_database.get_sequences() == SEQUENCES
+    assert loaded_database.get_next_otu_number() == 3
+    assert sorted(os.listdir(str(tmp_path))) == ['database']
+
+
+def test_save_replaces_the_whole_database(tmp_path):
+
+    database_dir = str(tmp_path / 'database')
+    database = get_saved_database(database_dir)
+    database.add_otu('OTU3', SEQUENCES[0][::-1])
+    database.save()
+
+    assert otu_database.get_next_otu_number(database_dir) == 4
+    assert otu_database.OtuDatabase(database_dir, WORD_SIZE).get_names() == ['OTU1', 'OTU2', 'OTU3']
+    assert sorted(os.listdir(str(tmp_path))) == ['database']
+
+
+def test_database_moved_aside_by_an_interrupted_save_is_restored(tmp_path):
+
+    database_dir = str(tmp_path / 'database')
+    get_saved_database(database_dir)
+    os.rename(database_dir, database_dir + otu_database.REPLACED_DIR_SUFFIX)
+
+    assert otu_database.get_next_otu_number(database_dir) == 3
+    assert otu_database.OtuDatabase(database_dir, WORD_SIZE).get_names() == ['OTU1', 'OTU2']
+    assert sorted(os.listdir(str(tmp_path))) == ['database']
@@ -0,0 +1,121 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import random
+
+import numpy as np
+
+import conftest
+from test_dereplication import assert_same_files, run_script, write_reads
+
+conftest.add_script_dir('UtilScripts')
+
+import otu_table
+
+"""
+Compares the OTU post-processing and the OTU table with the baseline scripts
+
+Dereplicated reads are grouped into clusters written in the CD-HIT format. The single
+post-processing step is compared with the baseline chain of cluster parsing, OTU naming,
+abundance filtering and renaming, after which the OTU table is created from its outputs.
+Every output file is compared byte for byte.
+"""
+
+FILTER_THRESHOLD = 4
+
+
+def write_clusters(derep_fp, otus_fp, clusters_fp, seed):
+
+    """Groups the dereplicated sequences into clusters, written as CD-HIT representatives and .clstr file"""
+
+    rng = random.Random(seed)
+    with open(derep_fp) as in_fh:
+        lines = in_fh.read().splitlines()
+    entries = list(zip(lines[::2], lines[1::2]))
+
+    clusters = list()
+    for entry in entries:
+        if len(clusters) == 0 or rng.random() < 0.4:
+            clusters.append([entry])
+        else:
+            rng.choice(clusters).append(entry)
+
+    with open(otus_fp, 'w') as otus_fh, open(clusters_fp, 'w') as clusters_fh:
+        for cluster_nbr, members in enumerate(clusters):
+            representative_pos = rng.randrange(len(members))
+            otus_fh.write('{}\n{}\n'.format(*members[representative_pos]))
+            clusters_fh.write('>Cluster {}\n'.format(cluster_nbr))
+            for member_pos, (header, sequence) in enumerate(members):
+                mark = '*' if member_pos == representative_pos else 'at +/{:.2f}%'.format(rng.uniform(97, 100))
+                clusters_fh.write('{}\t{}nt, {}... {}\n'.format(member_pos, len(sequence), header, mark))
+
+
+def test_postprocessing_and_otu_table(tmp_path):
+
+    reads_fp = str(tmp_path / 'reads.fasta')
+    write_reads(reads_fp, 3000, seed=1)
+
+    baseline_dir = tmp_path / 'baseline'
+    baseline_dir.mkdir()
+    baseline_scripts = {script_name: conftest.get_baseline_script_fp(script_name + '.py')
+                        for script_name in ['cdhit_output_parser', 'generate_otu_names', 'filter_low_count_otus',
+                                            'rename_otus_fasta_and_table', 'create_otu_table']}
+
+    derep_fp = str(tmp_path / 'derep.fasta')
+    derep_mapping_fp = str(tmp_path / 'derep.mapping')
+    otus_fp = str(tmp_path / 'cdhit')
+    clusters_fp = str(tmp_path / 'cdhit.clstr')
+    run_script(conftest.get_script_fp('OTUclustering', 'script_dereplicator.py'),
+               '--input', reads_fp, '--output', derep_fp, '--mapping_file', derep_mapping_fp)
+    write_clusters(derep_fp, otus_fp, clusters_fp, seed=2)
+
+    # The baseline chain of parsing, naming, abundance filtering and renaming
+    run_script(baseline_scripts['cdhit_output_parser'], '-i', clusters_fp, '-o', baseline_dir / 'cdhit.table',
+               '--count_dereplicated', '--seq_matrix', baseline_dir / 'cluster.mapping')
+    run_script(baseline_scripts['generate_otu_names'], '--input', otus_fp, '--output', baseline_dir / 'names.txt')
+    run_script(baseline_scripts['filter_low_count_otus'], '-i', otus_fp, '-m', baseline_dir / 'cdhit.table',
+               '-o', baseline_dir / 'otus.fasta', '-t', FILTER_THRESHOLD, '-O', baseline_dir / 'otus.table')
+    run_script(baseline_scripts['rename_otus_fasta_and_table'], '--fasta', baseline_dir / 'otus.fasta',
+               '--table', baseline_dir / 'otus.table', '--output_fasta', baseline_dir / 'renamed_otu.fasta',
+               '--output_table', baseline_dir / 'renamed_otu.table', '--name_mapping', baseline_dir / 'names.txt')
+    run_script(baseline_scripts['create_otu_table'], '--cluster_mapping', baseline_dir / 'cluster.mapping',
+               '--derep_mapping', derep_mapping_fp, '--name_mapping', baseline_dir / 'names.txt',
+               '--output', baseline_dir / 'otu_table.tsv')
+
+    run_script(conftest.get_script_fp('OTUclustering', 'postprocess_otus.py'), '--input', otus_fp,
+               '--clusters', clusters_fp, '--cluster_mapping', tmp_path / 'cluster.mapping',
+               '--name_mapping', tmp_path / 'names.txt', '--threshold', FILTER_THRESHOLD,
+               '--output_fasta', tmp_path / 'renamed_otu.fasta', '--output_table', tmp_path / 'renamed_otu.table')
+    run_script(conftest.get_script_fp('ProcessAndVisualize', 'create_otu_table.py'),
+               '--cluster_mapping', tmp_path / 'cluster.mapping', '--derep_mapping', derep_mapping_fp,
+               '--name_mapping', tmp_path / 'names.txt', '--output', tmp_path / 'otu_table.tsv',
+               '--binary_output', tmp_path / 'otu_table.bin')
+
+    for file_name in ['cluster.mapping', 'names.txt', 'renamed_otu.fasta', 'renamed_otu.table', 'otu_table.tsv']:
+        assert_same_files(baseline_dir / file_name, tmp_path / file_name)
+
+    text_table = otu_table.read_table(str(tmp_path / 'otu_table.tsv'))
+    binary_table = otu_table.read_table(str(tmp_path / 'otu_table.bin'))
+    assert binary_table.get_otu_names() == text_table.get_otu_names()
+    assert binary_table.get_sample_names() == text_table.get_sample_names()
+    assert np.array_equal(binary_table.get_dense(), text_table.get_dense())
@@ -0,0 +1,123 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import copy
+import itertools
+import os
+
+import pytest
+
+import main
+
+"""
+Sets up the pipeline modules for the combinations of the run options, without running any commands
+
+The commands of a run are checked to form a complete chain of declared files: every file of the
+run directory read by a command is written by an earlier command, and no file is written by two
+commands. The scheduler, the checkpoints and the step cache all rely on these declarations.
+"""
+
+OPTION_COMBINATIONS = list(itertools.product(
+    ['fasttree', 'raxml'],                              # tree_software
+    [False, True],                                      # streaming
+    ['prinseq', 'native'],                              # qc_engine
+    ['default', 'compact', 'external', 'sharded'],      # derep_engine
+    ['cdhit', 'kmer'],                                  # cluster_engine
+    ['none', 'vsearch'],                                # chimera_checking
+    [False, True]                                       # otu_database
+))
+
+
+def get_option_dict(tree_software, streaming, qc_engine, derep_engine, cluster_engine, chimera_checking,
+                    otu_database_dir):
+
+    return {
+        'otu_filter_threshold': 5,
+        'otu_cluster_identity': 0.97,
+        'rdp_identity': 0.8,
+        'rdp_database': '16S',
+        'rdp_depth': 'phylum',
+        'pynast_identity': 0,
+        'tree_software': tree_software,
+        'chimera_checking': chimera_checking,
+        'streaming': streaming,
+        'qc_engine': qc_engine,
+        'derep_engine': derep_engine,
+        'cluster_engine': cluster_engine,
+        'otu_database': otu_database_dir,
+        'cores': 4,
+        'incremental_rarefaction': False
+    }
+
+
+def setup_commands(run_dir, option_dict):
+
+    """Sets up all pipeline modules in the run directory, returns their commands in pipeline order"""
+
+    path_func = main.get_path_function(run_dir)
+    config = main.get_config_settings('settings_template.conf')
+
+    file_path_dict = copy.deepcopy(main.FILE_PATH_DICT)
+    file_path_dict['input']['multiple_read_files'] = 'sample1.fastq.gz,sample2.fastq.gz'
+    file_path_dict['input']['labels'] = 'sample1,sample2'
+    file_path_dict['input']['log_file'] = run_dir + main.TIME_LOG_SUBPATH
+    file_path_dict['input']['log_table'] = run_dir + main.TIME_MATRIX_SUBPATH
+    file_path_dict['input']['resource_log'] = run_dir + main.RESOURCE_LOG_SUBPATH
+
+    commands = list()
+    for module_name in ['preprocessing'] + main.PIPELINE_MODULES:
+        module = main.setup_pipeline_module(module_name, path_func, file_path_dict, option_dict, config)
+        commands += module.executable_commands
+    return commands
+
+
+@pytest.mark.parametrize('options', OPTION_COMBINATIONS)
+def test_commands_declare_a_complete_chain_of_files(tmp_path, options):
+
+    run_dir = str(tmp_path / 'run') + '/'
+    otu_database_dir = str(tmp_path / 'otu_database') if options[-1] else None
+    commands = setup_commands(run_dir, get_option_dict(*options[:-1], otu_database_dir))
+
+    written_files = set()
+    for command in commands:
+
+        assert len(command.get_commands()) > 0
+        for input_fp in command.get_input_files():
+            if input_fp.startswith(run_dir):
+                assert input_fp in written_files, '{} reads {} before it is written'.format(command.get_name(),
+                                                                                         input_fp)
+
+        for output_fp in command.get_output_files():
+            assert output_fp not in written_files, '{} is written by two commands'.format(output_fp)
+            written_files.add(output_fp)
+
+
+@pytest.mark.parametrize('incremental', [False, True])
+def test_incremental_rarefaction_is_passed_to_the_alpha_plots(tmp_path, incremental):
+
+    option_dict = get_option_dict('fasttree', False, 'prinseq', 'default', 'cdhit', 'vsearch', None)
+    option_dict['incremental_rarefaction'] = incremental
+    commands = setup_commands(str(tmp_path / 'run') + '/', option_dict)
+
+    alpha_plots_command = next(command for command in commands if command.get_name() == 'Chao1')
+    assert ('--incremental' in alpha_plots_command.get_commands()) == incremental
@@ -0,0 +1,92 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import filecmp
+import os
+import subprocess
+import sys
+
+import pytest
+
+import conftest
+
+conftest.add_script_dir('Preprocess')
+
+import quality_filter
+
+"""
+Compares the native quality filter with the reads kept by Prinseq
+
+The fixture reads each exercise one of the filters: quality trimming of both ends, the minimum
+length after trimming, the mean quality and the percentage of Ns, at and across each threshold.
+prinseq_good.fastq holds the output_good.fastq expected from Prinseq 0.20.4 with the options
+-trim_qual_left 15 -trim_qual_right 15 -min_len 10 -min_qual_mean 20 -ns_max_p 10
+Each read is written out by hand following the Prinseq rules: trimming is done before filtering,
+reads with a mean quality below min_qual_mean or more than ns_max_p percent Ns are removed.
+"""
+
+DATA_DIR = os.path.join(conftest.DATA_DIR, 'quality_filter')
+FILTER_OPTIONS = ['--trim_qual', 15, '--min_len', 10, '--min_qual_mean', 20, '--ns_max_p', 10]
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_native_filter_keeps_the_prinseq_reads(tmp_path, processes):
+
+    output_fp = str(tmp_path / 'output_good.fastq')
+    subprocess.check_call([sys.executable, conftest.get_script_fp('Preprocess', 'quality_filter.py'),
+                           '--input', os.path.join(DATA_DIR, 'reads.fastq'), '--output', output_fp,
+                           '--processes', str(processes)] + [str(option) for option in FILTER_OPTIONS])
+
+    assert filecmp.cmp(output_fp, os.path.join(DATA_DIR, 'prinseq_good.fastq'), shallow=False)
+
+
+class ChunkOutput:
+
+    """Collects the written chunks, recording how many chunks were read ahead of each write"""
+
+    def __init__(self):
+        self.read_chunks = 0
+        self.written = list()
+        self.max_read_ahead = 0
+
+    def get_chunks(self, chunks):
+        for chunk in chunks:
+            self.read_chunks += 1
+            yield chunk
+
+    def write(self, text):
+        self.written.append(text)
+        self.max_read_ahead = max(self.max_read_ahead, self.read_chunks - len(self.written))
+
+
+def test_parallel_filter_reads_a_bounded_number_of_chunks_ahead():
+
+    processes = 2
+    chunks = [(['@read{}'.format(chunk_nbr)], ['ACGTACGTACGT'], ['IIIIIIIIIIII']) for chunk_nbr in range(40)]
+    filter_settings = (15, 10, 20, 10)
+
+    chunk_output = ChunkOutput()
+    quality_filter.filter_chunks_parallel(chunk_output.get_chunks(chunks), filter_settings, chunk_output, processes)
+
+    assert chunk_output.written == [quality_filter.filter_chunk(chunk, filter_settings) for chunk in chunks]
+    assert chunk_output.max_read_ahead <= quality_filter.CHUNKS_IN_FLIGHT_PER_PROCESS * processes
@@ -0,0 +1,102 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import numpy as np
+
+import conftest
+
+conftest.add_script_dir('ProcessAndVisualize')
+
+import rarefaction
+
+"""
+Checks the exact rarefaction curves against sampled subsamples drawn with a fixed seed
+
+With many replicates, the mean and variance of the sampled richness are compared with the
+exact expectation and variance, allowing a few standard errors of difference.
+"""
+
+SEED = 12345
+COUNTS = np.array([120, 60, 30, 30, 12, 8, 5, 3, 2, 2, 1, 1, 1, 1])
+SAMPLEPOINTS = 10
+REPLICATES = 4000
+
+
+def get_sampled_richness(incremental):
+
+    rng = np.random.default_rng(SEED)
+    depths = rarefaction.get_depths(int(COUNTS.sum()), SAMPLEPOINTS)
+    if incremental:
+        richness, _ = rarefaction.get_incremental_estimates(COUNTS, depths, REPLICATES, rng)
+    else:
+        richness = rarefaction.get_richness(rarefaction.draw_subsamples(COUNTS, depths, REPLICATES, rng))
+    return depths, richness
+
+
+def test_exact_richness_matches_sampled_richness():
+
+    depths, sampled_richness = get_sampled_richness(incremental=False)
+    expected, variances = rarefaction.get_expected_richness(COUNTS, depths)
+
+    standard_errors = np.sqrt(variances / REPLICATES)
+    assert np.all(np.abs(sampled_richness.mean(axis=1) - expected) <= 4 * standard_errors + 1e-9)
+    assert np.allclose(sampled_richness.var(axis=1), variances, rtol=0.15, atol=1e-9)
+
+
+def test_incremental_richness_matches_exact_richness():
+
+    depths, sampled_richness = get_sampled_richness(incremental=True)
+    expected, variances = rarefaction.get_expected_richness(COUNTS, depths)
+
+    standard_errors = np.sqrt(variances / REPLICATES)
+    assert np.all(np.abs(sampled_richness.mean(axis=1) - expected) <= 4 * standard_errors + 1e-9)
+
+
+def test_exact_richness_at_the_boundaries():
+
+    expected, variances = rarefaction.get_expected_richness(COUNTS, np.array([0, 1, COUNTS.sum()]))
+    assert np.allclose(expected, [0, 1, len(COUNTS)])
+    assert np.allclose(variances, 0)
+
+
+def test_curves_are_reproducible_with_a_fixed_seed():
+
+    first_curves = rarefaction.get_sample_curves(COUNTS, SAMPLEPOINTS, 10, np.random.SeedSequence(SEED))
+    second_curves = rarefaction.get_sample_curves(COUNTS, SAMPLEPOINTS, 10, np.random.SeedSequence(SEED))
+
+    for first_values, second_values in zip(first_curves[:3], second_curves[:3]):
+        assert np.array_equal(first_values, second_values)
+
+
+def test_exact_curves_only_subsample_for_chao1():
+
+    depths, richness_means, chao_means, richness_deviations = rarefaction.get_sample_curves(
+        COUNTS, SAMPLEPOINTS, 10, np.random.SeedSequence(SEED), exact=True)
+
+    rng = np.random.default_rng(np.random.SeedSequence(SEED))
+    sampled_chao = rarefaction.get_chao1(rarefaction.draw_subsamples(COUNTS, depths[1:], 10, rng))
+    expected, variances = rarefaction.get_expected_richness(COUNTS, depths)
+
+    assert np.array_equal(chao_means, np.concatenate(([0], sampled_chao.mean(axis=1))))
+    assert np.array_equal(richness_means, expected)
+    assert np.array_equal(richness_deviations, np.sqrt(variances))
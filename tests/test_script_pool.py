@@ -0,0 +1,74 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+import random
+import subprocess
+import sys
+
+import pytest
+
+from conftest import get_script_fp
+from src.util_scripts import script_pool
+
+pytest.importorskip('numpy')
+
+QUALITY_FILTER_FP = get_script_fp('Preprocess', 'quality_filter.py')
+
+
+def write_fastq(fastq_fp, read_count, seed=1):
+
+    rng = random.Random(seed)
+    with open(fastq_fp, 'w') as out_fh:
+        for read_nbr in range(read_count):
+            length = rng.randint(150, 300)
+            sequence = ''.join(rng.choice('ACGTN') for _ in range(length))
+            quality = ''.join(chr(33 + rng.randint(2, 40)) for _ in range(length))
+            out_fh.write('@read{}\n{}\n+\n{}\n'.format(read_nbr, sequence, quality))
+
+
+def get_quality_filter_command(input_fp, output_fp, processes):
+    return [QUALITY_FILTER_FP, '--input', input_fp, '--output', output_fp, '--trim_qual', '20', '--min_len', '100',
+            '--min_qual_mean', '20', '--ns_max_p', '10', '--processes', str(processes)]
+
+
+def test_pooled_script_with_own_process_pool(tmp_path):
+
+    """A script run in the pool can hand its own functions to a process pool of its own"""
+
+    input_fp = str(tmp_path / 'reads.fastq')
+    write_fastq(input_fp, 25000)
+
+    expected_fp = str(tmp_path / 'expected.fastq')
+    subprocess.check_call([sys.executable] + get_quality_filter_command(input_fp, expected_fp, 1))
+
+    pooled_fp = str(tmp_path / 'pooled.fastq')
+    pool = script_pool.ScriptPool(1)
+    try:
+        exit_code, _ = pool.run_script(get_quality_filter_command(input_fp, pooled_fp, 2))
+    finally:
+        pool.shutdown()
+
+    assert exit_code == 0
+    with open(expected_fp) as expected_fh, open(pooled_fp) as pooled_fh:
+        expected_reads = expected_fh.read()
+        assert expected_reads != ''
+        assert pooled_fh.read() == expected_reads
@@ -0,0 +1,74 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import os
+
+from src.util_scripts import command_builder
+from src.util_scripts import step_cache
+
+
+def write_file(file_fp, text):
+    with open(file_fp, 'w') as out_fh:
+        out_fh.write(text)
+
+
+def get_script_tree(base_dir):
+
+    """A script importing a helper next to it, which in turn imports a shared module"""
+
+    script_dir = os.path.join(base_dir, 'Scripts', 'OTUclustering')
+    shared_dir = os.path.join(base_dir, 'Scripts', 'UtilScripts')
+    os.makedirs(script_dir)
+    os.makedirs(shared_dir)
+
+    script_fp = os.path.join(script_dir, 'script.py')
+    write_file(script_fp, 'import os\nimport helper\n')
+    write_file(os.path.join(script_dir, 'helper.py'), 'from otu_table import read_table\n')
+    write_file(os.path.join(shared_dir, 'otu_table.py'), 'def read_table():\n    pass\n')
+    return script_fp, os.path.join(shared_dir, 'otu_table.py')
+
+
+def get_key(cache_dir, run_dir, script_fp, input_fp, output_fp):
+
+    command = command_builder.CommandBuilder('Script', 'sc')
+    command.add_commands(['python3', script_fp, '--input', input_fp, '--output', output_fp])
+    command.add_file_dependencies([input_fp], [output_fp])
+    return step_cache.StepCache(cache_dir, run_dir).get_key(command)
+
+
+def test_key_changes_with_imported_helper_modules(tmp_path):
+
+    script_fp, shared_module_fp = get_script_tree(str(tmp_path))
+    run_dir = str(tmp_path / 'run') + '/'
+    os.makedirs(run_dir)
+    input_fp = run_dir + 'input.txt'
+    write_file(input_fp, 'reads\n')
+
+    def get_current_key():
+        return get_key(str(tmp_path / 'cache'), run_dir, script_fp, input_fp, run_dir + 'output.txt')
+
+    first_key = get_current_key()
+    assert get_current_key() == first_key
+
+    write_file(shared_module_fp, 'def read_table():\n    return None\n')
+    assert get_current_key() != first_key
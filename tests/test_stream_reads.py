@@ -0,0 +1,81 @@
+"""
+RASP: Rapid Amplicon Sequence Pipeline
+
+Copyright (C) 2016, Jakob Willforss and Björn Canbäck
+All rights reserved.
+
+This file is part of RASP.
+
+RASP is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+RASP is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with RASP.  If not, <http://www.gnu.org/licenses/>.
+"""
+
+
+import gzip
+
+import pytest
+
+import conftest
+
+conftest.add_script_dir('Preprocess')
+
+import stream_reads
+
+FASTQ_ENTRY = '@read{}\nACGT\n+\nIIII\n'
+
+
+def write_reads(fastq_fp, read_count):
+    with gzip.open(fastq_fp, 'wt') as out_fh:
+        for read_nbr in range(read_count):
+            out_fh.write(FASTQ_ENTRY.format(read_nbr))
+
+
+def test_stream_reads_counts_reads(tmp_path):
+
+    sample_fps = [str(tmp_path / 'a.fastq.gz'), str(tmp_path / 'b.fastq.gz')]
+    write_reads(sample_fps[0], 3)
+    write_reads(sample_fps[1], 2)
+
+    output_fp = str(tmp_path / 'reads.fasta')
+    input_counts, filtered_count = stream_reads.stream_reads(sample_fps, ['A', 'B'], ['cat'], output_fp)
+
+    assert input_counts == [3, 2]
+    assert filtered_count == 5
+    with open(output_fp) as in_fh:
+        assert in_fh.readline() == '>read0;label=A\n'
+
+
+def test_stream_reads_raises_feeder_errors(tmp_path):
+
+    sample_fps = [str(tmp_path / 'a.fastq.gz'), str(tmp_path / 'corrupt.fastq.gz')]
+    write_reads(sample_fps[0], 3)
+    with open(sample_fps[1], 'w') as out_fh:
+        out_fh.write('not compressed\n')
+
+    with pytest.raises(OSError):
+        stream_reads.stream_reads(sample_fps, ['A', 'B'], ['cat'], str(tmp_path / 'reads.fasta'))
+
+
+def test_native_filter_runs_with_the_given_processes(tmp_path):
+
+    sample_fps = [str(tmp_path / 'a.fastq.gz')]
+    write_reads(sample_fps[0], 3)
+
+    quality_filter_fp = conftest.get_script_fp('Preprocess', 'quality_filter.py')
+    qc_command = stream_reads.get_native_qc_stream_command(quality_filter_fp, 15, 4, 20, 0, processes=2)
+    assert qc_command[-2:] == ['--processes', '2']
+
+    output_fp = str(tmp_path / 'reads.fasta')
+    input_counts, filtered_count = stream_reads.stream_reads(sample_fps, ['A'], qc_command, output_fp)
+    assert input_counts == [3]
+    assert filtered_count == 3